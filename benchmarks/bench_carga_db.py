@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de carga y consulta contra una instancia local de PostgreSQL.
+
+Levanta un servidor desechable (tests/postgres_local.py), mide filas/segundo
+para las distintas formas de cargar movimientos con `DatabaseConnector` y la
+latencia de las vistas por mes. No toca la base de datos configurada en `.env`.
+
+Uso:
+    PG_BIN=/usr/lib/postgresql/16/bin python -m benchmarks.bench_carga_db --filas 10000 100000
+"""
+
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import psycopg2.extras
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.append(str(RAIZ / 'tests'))
+
+from postgres_local import PostgresLocal, disponible, crear_esquema_gastos, sentencias_vistas
+
+from benchmarks.bench_pipeline import commit_actual, DIRECTORIO_RESULTADOS
+from benchmarks.generar_exportacion import generar_movimientos
+
+COLUMNAS = ['Fecha_Operacion', 'Concepto', 'Fecha_Valor', 'Importe', 'Saldo', 'Referencia_1', 'Referencia_2']
+INSERT_GASTO = f"""
+INSERT INTO gastos_2025 ({', '.join(COLUMNAS)})
+VALUES ({', '.join(['%s'] * len(COLUMNAS))})
+"""
+
+
+def filas_sinteticas(filas: int) -> list:
+    """
+    Genera movimientos sintéticos como tuplas listas para insertar.
+    """
+    movimientos = generar_movimientos(filas)
+    return list(zip(
+        movimientos['fecha_operacion'].dt.strftime('%Y-%m-%d'),
+        movimientos['concepto'],
+        movimientos['fecha_valor'].dt.strftime('%Y-%m-%d'),
+        (movimientos['importe'] / 100).round(2),
+        (movimientos['saldo'] / 100).round(2),
+        movimientos['referencia_1'],
+        movimientos['referencia_2'],
+    ))
+
+
+def cargar_execute_command(db, datos):
+    """Un INSERT y un commit por fila."""
+    for fila in datos:
+        db.execute_command(INSERT_GASTO, fila)
+
+
+def cargar_execute_many(db, datos):
+    """executemany en una sola transacción (camino actual de DB_Gastos)."""
+    db.execute_many(INSERT_GASTO, datos)
+
+
+def cargar_execute_values(db, datos):
+    """INSERT multi-fila con psycopg2.extras.execute_values."""
+    with db.get_db_connection() as connection:
+        with connection.cursor() as cursor:
+            psycopg2.extras.execute_values(
+                cursor, f"INSERT INTO gastos_2025 ({', '.join(COLUMNAS)}) VALUES %s", datos, page_size=1000)
+        connection.commit()
+
+
+def cargar_copy(db, datos):
+    """COPY FROM STDIN con un buffer de texto."""
+    buffer = io.StringIO()
+    for fila in datos:
+        buffer.write('\t'.join(str(v) for v in fila) + '\n')
+    buffer.seek(0)
+    with db.get_db_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY gastos_2025 ({', '.join(COLUMNAS)}) FROM STDIN", buffer)
+        connection.commit()
+
+
+CAMINOS_CARGA = {
+    'execute_command': cargar_execute_command,
+    'execute_many': cargar_execute_many,
+    'execute_values': cargar_execute_values,
+    'copy': cargar_copy,
+}
+
+# Por encima de este tamaño el camino fila a fila tarda demasiado
+MAX_FILAS_EXECUTE_COMMAND = 20_000
+
+
+def bench_carga(db, datos: list) -> dict:
+    """
+    Mide filas/segundo de cada camino de carga partiendo de una tabla vacía.
+    """
+    resultados = {}
+    for nombre, cargar in CAMINOS_CARGA.items():
+        if nombre == 'execute_command' and len(datos) > MAX_FILAS_EXECUTE_COMMAND:
+            continue
+        db.execute_command("TRUNCATE gastos_2025")
+        inicio = time.perf_counter()
+        cargar(db, datos)
+        segundos = time.perf_counter() - inicio
+        cargadas = db.execute_query("SELECT COUNT(*) AS n FROM gastos_2025")[0]['n']
+        resultados[nombre] = {
+            'segundos': round(segundos, 6),
+            'filas_por_segundo': round(cargadas / segundos) if segundos > 0 else None,
+            'filas': cargadas,
+        }
+        print(f"   📥 {nombre:<16} {cargadas / segundos:12,.0f} filas/s")
+    return resultados
+
+
+def bench_vistas(db, repeticiones: int = 20) -> dict:
+    """
+    Mide la latencia (mediana y p95, en ms) de las consultas sobre las vistas por mes.
+    """
+    db.execute_command("ANALYZE gastos_2025")
+    resultados = {}
+    for sentencia in sentencias_vistas():
+        vista = sentencia.split()[4].split('.')[-1]
+        for tipo, consulta in [
+            ('listado', f"SELECT * FROM {vista} ORDER BY fecha_operacion ASC"),
+            ('agregado', f"SELECT COUNT(*) AS n, SUM(importe) AS total FROM {vista}"),
+        ]:
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                db.execute_query(consulta)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            tiempos.sort()
+            resultados[f"{vista}_{tipo}"] = {
+                'mediana_ms': round(statistics.median(tiempos), 3),
+                'p95_ms': round(tiempos[int(0.95 * (len(tiempos) - 1))], 3),
+            }
+            print(f"   🔍 {vista:<22} {tipo:<9} {statistics.median(tiempos):8.2f} ms")
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de carga en PostgreSQL local')
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--salida', type=Path, default=None)
+    args = parser.parse_args()
+
+    motivo = disponible()
+    if motivo:
+        print(f"⚠️ No se puede levantar PostgreSQL local: {motivo}")
+        sys.exit(0)
+
+    commit = commit_actual()
+    informe = {'commit': commit, 'fecha': datetime.now().isoformat(timespec='seconds'), 'resultados': {}}
+
+    with PostgresLocal() as pg:
+        with pg.conector() as db:
+            crear_esquema_gastos(db)
+            version = db.execute_query("SELECT version();")[0]['version']
+            informe['postgres'] = version
+            print(f"📋 {version}")
+            for filas in args.filas:
+                print(f"🚀 Carga de {filas:,} movimientos")
+                datos = filas_sinteticas(filas)
+                informe['resultados'][str(filas)] = {
+                    'carga': bench_carga(db, datos),
+                    'vistas': bench_vistas(db),
+                }
+
+    DIRECTORIO_RESULTADOS.mkdir(parents=True, exist_ok=True)
+    salida = args.salida or DIRECTORIO_RESULTADOS / f"carga_db_{commit}.json"
+    salida.write_text(json.dumps(informe, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"💾 Resultados guardados en {salida}")
+
+
+if __name__ == '__main__':
+    main()
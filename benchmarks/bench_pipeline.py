@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Benchmarks del pipeline ETL sobre exportaciones sintéticas.
+
+Mide `LoadData.load`, cada método de `TransformData` y
+`limpiar_dataframe_para_carga` a distintos tamaños y guarda los tiempos en
+JSON para poder compararlos entre commits.
+
+Uso:
+    python -m benchmarks.bench_pipeline --filas 10000 1000000
+    python -m benchmarks.bench_pipeline --comparar benchmarks/resultados/anterior.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+# Agregar el directorio src al path para importaciones
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.append(str(RAIZ / 'src'))
+
+from etl.load_data import LoadData
+from etl.recurring_data import RecurringData
+from etl.transform_data import TransformData
+from etl.logger import Logger
+
+from benchmarks.generar_exportacion import ruta_exportacion, TAMANOS_POR_DEFECTO
+
+COLUMNAS = [
+    'Fecha Operación',
+    'Concepto',
+    'Fecha Valor',
+    'Importe',
+    'Saldo',
+    'Referencia 1',
+    'Referencia 2'
+]
+
+DIRECTORIO_DATOS = Path(__file__).parent / 'datos'
+DIRECTORIO_RESULTADOS = Path(__file__).parent / 'resultados'
+
+
+def _logger_silencioso() -> Logger:
+    """
+    Logger del pipeline con el nivel subido a WARNING para que los mensajes
+    por operación no distorsionen las mediciones.
+    """
+    logger = Logger(log_file=str(DIRECTORIO_RESULTADOS / 'bench.log'))
+    logger.logger.setLevel(logging.WARNING)
+    return logger
+
+
+def medir(funcion, preparar=None, repeticiones: int = 3) -> float:
+    """
+    Ejecuta una función varias veces y devuelve el mejor tiempo.
+
+    Args:
+        funcion: Función a medir; recibe el resultado de `preparar`
+        preparar: Función sin argumentos que prepara la entrada (no se mide)
+        repeticiones: Número de ejecuciones
+
+    Returns:
+        float: Mejor tiempo en segundos
+    """
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        entrada = preparar() if preparar else None
+        inicio = time.perf_counter()
+        funcion(entrada)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def commit_actual() -> str:
+    """
+    Devuelve el hash corto del commit actual (o 'desconocido' fuera de git).
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return 'desconocido'
+
+
+def bench_tamano(filas: int, repeticiones: int) -> dict:
+    """
+    Ejecuta todos los benchmarks para una exportación de `filas` movimientos.
+
+    Returns:
+        dict: Segundos por operación
+    """
+    ruta = str(ruta_exportacion(DIRECTORIO_DATOS, filas))
+    logger = _logger_silencioso()
+    loader = LoadData(COLUMNAS, logger)
+    transformer = TransformData(logger=logger)
+
+    crudo = loader.load(ruta)
+    transformado = crudo.copy()
+    for campo, tipo in [('Importe', 'centimos'), ('Saldo', 'centimos'),
+                        ('Fecha Operación', 'datetime'), ('Fecha Valor', 'datetime'),
+                        ('Concepto', 'text')]:
+        transformado = transformer.transformar_campos(transformado, campo, tipo)
+
+    copia_crudo = crudo.copy
+    copia_transformado = transformado.copy
+    fecha_media = transformado['Fecha Operación'].quantile(0.5)
+
+    operaciones = {
+        'load': (lambda _: loader.load(ruta), None),
+        'eliminar_duplicados': (transformer.eliminar_duplicados, copia_crudo),
+        'transformar_campos_float': (lambda df: transformer.transformar_campos(df, 'Importe', 'float'), copia_crudo),
+        'transformar_campos_centimos': (lambda df: transformer.transformar_campos(df, 'Importe', 'centimos'), copia_crudo),
+        'transformar_campos_datetime': (lambda df: transformer.transformar_campos(df, 'Fecha Operación', 'datetime'), copia_crudo),
+        'transformar_campos_text': (lambda df: transformer.transformar_campos(df, 'Concepto', 'text'), copia_crudo),
+        'filtrar_por_fecha': (lambda df: transformer.filtrar_por_fecha(df, fecha_media, transformado['Fecha Operación'].max()), copia_transformado),
+        'filtrar_por_concepto': (lambda df: transformer.filtrar_por_concepto(df, 'BIZUM'), copia_transformado),
+        'filtrar_por_importe': (lambda df: transformer.filtrar_por_importe(df, -50.0, 50.0), copia_transformado),
+        'ordenar_por_fecha': (transformer.ordenar_por_fecha, copia_transformado),
+        'resumen': (transformer.resumen, copia_transformado),
+        'limpiar_dataframe_para_carga': (transformer.limpiar_dataframe_para_carga, copia_crudo),
+        'detectar_recurrentes': (RecurringData(logger).detectar, copia_transformado),
+    }
+
+    resultados = {}
+    for nombre, (funcion, preparar) in operaciones.items():
+        segundos = medir(funcion, preparar, repeticiones)
+        resultados[nombre] = {
+            'segundos': round(segundos, 6),
+            'filas_por_segundo': round(filas / segundos) if segundos > 0 else None,
+        }
+        print(f"   ⏱️ {nombre:<30} {segundos:10.4f} s")
+    return resultados
+
+
+def comparar(actual: dict, anterior: dict):
+    """
+    Muestra la relación de tiempos entre dos ficheros de resultados.
+    """
+    print(f"\n📊 Comparación {anterior.get('commit')} → {actual.get('commit')}")
+    for filas, operaciones in actual['resultados'].items():
+        previas = anterior.get('resultados', {}).get(filas, {})
+        print(f"  {int(filas):,} filas")
+        for nombre, medida in operaciones.items():
+            if nombre in previas:
+                ratio = previas[nombre]['segundos'] / medida['segundos'] if medida['segundos'] else float('inf')
+                print(f"   {nombre:<30} {previas[nombre]['segundos']:10.4f} s → {medida['segundos']:10.4f} s  (x{ratio:.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks del pipeline de gastos')
+    parser.add_argument('--filas', type=int, nargs='+', default=TAMANOS_POR_DEFECTO,
+                        help='Tamaños de exportación a medir')
+    parser.add_argument('--repeticiones', type=int, default=3,
+                        help='Ejecuciones por operación (se guarda el mejor tiempo)')
+    parser.add_argument('--salida', type=Path, default=None,
+                        help='Fichero JSON de resultados')
+    parser.add_argument('--comparar', type=Path, default=None,
+                        help='Fichero JSON de una ejecución anterior para comparar')
+    args = parser.parse_args()
+
+    DIRECTORIO_RESULTADOS.mkdir(parents=True, exist_ok=True)
+    commit = commit_actual()
+    informe = {
+        'commit': commit,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'resultados': {},
+    }
+
+    for filas in args.filas:
+        print(f"🚀 Benchmark con {filas:,} movimientos")
+        # Los tamaños grandes se miden una sola vez
+        repeticiones = args.repeticiones if filas <= 1_000_000 else 1
+        informe['resultados'][str(filas)] = bench_tamano(filas, repeticiones)
+
+    salida = args.salida or DIRECTORIO_RESULTADOS / f"pipeline_{commit}.json"
+    salida.write_text(json.dumps(informe, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"💾 Resultados guardados en {salida}")
+
+    if args.comparar:
+        comparar(informe, json.loads(args.comparar.read_text(encoding='utf-8')))
+
+
+if __name__ == '__main__':
+    main()
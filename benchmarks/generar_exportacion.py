@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Generador de exportaciones bancarias sintéticas para los benchmarks.
+
+Escribe ficheros con el mismo formato que las descargas reales de `data/`:
+preámbulo de 9 líneas, fechas `dd/mm/yyyy`, importes con separador de miles
+(`5,847.95`), conceptos de Bizum/transferencias/tarjeta y un saldo acumulado
+coherente con los importes. Los movimientos se escriben del más reciente al
+más antiguo, igual que los exporta el banco.
+"""
+
+import argparse
+import csv
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Tamaños por defecto de las exportaciones (número de movimientos)
+TAMANOS_POR_DEFECTO = [10_000, 1_000_000, 10_000_000]
+
+# Filas escritas por bloque para no materializar todo el texto en memoria
+FILAS_POR_BLOQUE = 500_000
+
+CONCEPTOS = [
+    'PAGO BIZUM {nombre}',
+    'ABONO BIZUM DE {nombre}',
+    'COMPRA BIZUM AMAZON MADRID ES',
+    'COMPRA BIZUM TEMU VIGO ES',
+    'TRANSFERENCIA A {nombre}',
+    'TRANSFERENCIA DE {nombre}',
+    'COMPRA TARJ. 5402XXXXXXXX{tarjeta} MERCADONA ILLESCAS-ILLESCAS',
+    'COMPRA TARJ. 5402XXXXXXXX{tarjeta} LEROY MERLIN LEGANES-LEGANES (MADR',
+    'COMPRA TARJ. 5402XXXXXXXX{tarjeta} PAYPAL *GOOGLE ELLATIO-4029357733',
+    'COMPRA TARJ. 5402XXXXXXXX{tarjeta} CARBURANTES Y SERVICIOS L-ALMUNECAR',
+    'ANUL COMPRA TARJ. 5402XXXXXXXX{tarjeta} PAYPAL *P3644D4359-35314369001',
+    'ADEUDO RECIBO IBERPROPANO, S.A.',
+    'GAS Naturgy Clientes, S.A.U.',
+    'ADEUDO RECIBO Gympass',
+    'REMUN. MES CTA ONLINE SABADELL',
+]
+
+NOMBRES = [
+    'LUCIA MARTIN PEREZ', 'JAVIER RUIZ GOMEZ', 'MARTA SANZ LOPEZ',
+    'PABLO ORTEGA DIAZ', 'ELENA NAVARRO GIL', 'DIEGO MORENO CANO',
+]
+
+# Rango de importes (en céntimos) por tipo de concepto: cargos negativos, abonos positivos
+RANGOS_CENTIMOS = {
+    'PAGO BIZUM': (-15_000, -500),
+    'ABONO BIZUM': (500, 15_000),
+    'COMPRA BIZUM': (-12_000, -300),
+    'TRANSFERENCIA A': (-50_000, -1_000),
+    'TRANSFERENCIA DE': (1_000, 50_000),
+    'COMPRA TARJ.': (-20_000, -100),
+    'ANUL COMPRA': (100, 5_000),
+    'ADEUDO RECIBO': (-30_000, -1_500),
+    'GAS': (-12_000, -3_000),
+    'REMUN.': (1, 500),
+}
+
+CABECERA = ['F. Operativa', 'Concepto', 'F. Valor', 'Importe', 'Saldo', 'Referencia 1', 'Referencia 2']
+
+
+def _catalogo_conceptos() -> pd.DataFrame:
+    """
+    Expande las plantillas de concepto en un catálogo con su rango de importes.
+
+    Returns:
+        pd.DataFrame: Columnas concepto, minimo y maximo (en céntimos)
+    """
+    filas = []
+    for plantilla in CONCEPTOS:
+        variantes = [plantilla.format(nombre=n, tarjeta='8018') for n in NOMBRES] if '{nombre}' in plantilla \
+            else [plantilla.format(tarjeta='8018')]
+        prefijo = next(p for p in RANGOS_CENTIMOS if plantilla.startswith(p))
+        minimo, maximo = RANGOS_CENTIMOS[prefijo]
+        for concepto in dict.fromkeys(variantes):
+            filas.append((concepto, minimo, maximo))
+    return pd.DataFrame(filas, columns=['concepto', 'minimo', 'maximo'])
+
+
+def _formatear_euros(centimos: np.ndarray) -> pd.Series:
+    """
+    Formatea céntimos como texto del banco: `-237.15`, `5,847.95`.
+    """
+    return pd.Series(centimos / 100.0).map('{:,.2f}'.format)
+
+
+def _formatear_fechas(fechas: np.ndarray) -> np.ndarray:
+    """
+    Formatea fechas como `dd/mm/yyyy` formateando cada día distinto una sola vez.
+    """
+    codigos, unicas = pd.factorize(fechas)
+    return pd.DatetimeIndex(unicas).strftime('%d/%m/%Y').to_numpy()[codigos]
+
+
+def generar_movimientos(filas: int, semilla: int = 42, fecha_fin: datetime = datetime(2025, 6, 30)) -> pd.DataFrame:
+    """
+    Genera movimientos sintéticos en orden cronológico con saldo coherente.
+
+    Args:
+        filas: Número de movimientos a generar
+        semilla: Semilla del generador aleatorio (resultados reproducibles)
+        fecha_fin: Fecha del movimiento más reciente
+
+    Returns:
+        pd.DataFrame: Movimientos con importes y saldos en céntimos (int64)
+    """
+    rng = np.random.default_rng(semilla)
+    catalogo = _catalogo_conceptos()
+
+    # Unos 3 movimientos por día, con un máximo de 10 años de historia
+    dias = int(min(max(filas // 3, 30), 3650))
+    desplazamiento = np.sort(rng.integers(0, dias, size=filas))[::-1]
+    fechas = np.datetime64(fecha_fin.date()) - desplazamiento.astype('timedelta64[D]')
+    # Fecha valor: mismo día o hasta 3 días después
+    fechas_valor = fechas + rng.integers(0, 4, size=filas).astype('timedelta64[D]')
+
+    indice = rng.integers(0, len(catalogo), size=filas)
+    minimo = catalogo['minimo'].to_numpy()[indice]
+    maximo = catalogo['maximo'].to_numpy()[indice]
+    importes = minimo + (rng.random(filas) * (maximo - minimo)).astype(np.int64)
+    # Escalar los abonos para que ingresos y gastos se compensen y el saldo no derive
+    abonos = importes > 0
+    if abonos.any():
+        factor = -importes[~abonos].sum() / importes[abonos].sum()
+        importes[abonos] = np.maximum((importes[abonos] * factor).astype(np.int64), 1)
+
+    # Saldo acumulado partiendo de un saldo inicial positivo
+    saldo_inicial = int(rng.integers(100_000, 1_000_000))
+    saldos = saldo_inicial + np.cumsum(importes)
+
+    referencias = rng.integers(100_000_000_000, 999_999_999_999, size=filas).astype(str)
+    con_referencia = rng.random(filas) < 0.4
+
+    return pd.DataFrame({
+        'fecha_operacion': fechas,
+        'concepto': catalogo['concepto'].to_numpy()[indice],
+        'fecha_valor': fechas_valor,
+        'importe': importes,
+        'saldo': saldos,
+        'referencia_1': '',
+        'referencia_2': np.where(con_referencia, referencias, ''),
+    })
+
+
+def escribir_exportacion(movimientos: pd.DataFrame, ruta: Path,
+                         iban: str = 'ES00 0000 0000 0000 0000 0000',
+                         titular: str = 'TITULAR*SINTETICO PRUEBAS') -> Path:
+    """
+    Escribe los movimientos con el formato de exportación del banco.
+
+    Args:
+        movimientos: DataFrame devuelto por generar_movimientos
+        ruta: Ruta del fichero CSV a escribir
+        iban: Cuenta que aparece en el preámbulo
+        titular: Titular que aparece en el preámbulo
+
+    Returns:
+        Path: Ruta del fichero escrito
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    desde = pd.Timestamp(movimientos['fecha_operacion'].min()).strftime('%d/%m/%Y')
+    hasta = pd.Timestamp(movimientos['fecha_operacion'].max()).strftime('%d/%m/%Y')
+    vacia = [''] * 7
+
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        writer.writerow(['Consulta de movimientos'] + vacia[1:])
+        writer.writerow([f'{hasta} 09:00:00'] + vacia[1:])
+        writer.writerow(vacia)
+        writer.writerow(['Cuenta: ', iban] + vacia[2:])
+        writer.writerow(['Divisa: ', 'EUR'] + vacia[2:])
+        writer.writerow(['Titular:', titular] + vacia[2:])
+        writer.writerow(['Selección:', f'Desde {desde} hasta {hasta}'] + vacia[2:])
+        writer.writerow(vacia)
+        writer.writerow(CABECERA)
+
+        # El banco exporta del movimiento más reciente al más antiguo
+        total = len(movimientos)
+        for fin in range(total, 0, -FILAS_POR_BLOQUE):
+            bloque = movimientos.iloc[max(fin - FILAS_POR_BLOQUE, 0):fin].iloc[::-1]
+            texto = pd.DataFrame({
+                0: _formatear_fechas(bloque['fecha_operacion'].to_numpy()),
+                1: bloque['concepto'].to_numpy(),
+                2: _formatear_fechas(bloque['fecha_valor'].to_numpy()),
+                3: _formatear_euros(bloque['importe'].to_numpy()),
+                4: _formatear_euros(bloque['saldo'].to_numpy()),
+                5: bloque['referencia_1'].to_numpy(),
+                6: bloque['referencia_2'].to_numpy(),
+            })
+            texto.to_csv(f, header=False, index=False, quoting=csv.QUOTE_ALL, lineterminator='\n')
+
+    return ruta
+
+
+def ruta_exportacion(directorio: Path, filas: int, semilla: int = 42) -> Path:
+    """
+    Devuelve la ruta de la exportación sintética, generándola si no existe.
+
+    Args:
+        directorio: Directorio donde se guardan los ficheros generados
+        filas: Número de movimientos
+        semilla: Semilla del generador
+
+    Returns:
+        Path: Ruta del fichero CSV
+    """
+    ruta = Path(directorio) / f'sintetico_{filas}_{semilla}.csv'
+    if not ruta.exists():
+        print(f"🏭 Generando exportación sintética de {filas:,} movimientos en {ruta}")
+        escribir_exportacion(generar_movimientos(filas, semilla), ruta)
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera exportaciones bancarias sintéticas')
+    parser.add_argument('--filas', type=int, nargs='+', default=TAMANOS_POR_DEFECTO,
+                        help='Número de movimientos de cada exportación')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', type=Path, default=Path(__file__).parent / 'datos')
+    args = parser.parse_args()
+
+    for filas in args.filas:
+        ruta = ruta_exportacion(args.salida, filas, args.semilla)
+        print(f"✅ {ruta} ({ruta.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
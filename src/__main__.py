@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+# Agregar el directorio src al path para importaciones
+sys.path.append(str(Path(__file__).parent))
+
+from cli import main
+
+sys.exit(main())
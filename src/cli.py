@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Línea de comandos del pipeline de gastos.
+
+    python -m src ingest      # carga, concilia y limpia las exportaciones
+    python -m src load        # ingesta y carga en la base de datos (PostgreSQL o SQLite)
+    python -m src watch       # vigila data/ y carga las exportaciones nuevas o cambiadas
+    python -m src report      # resumen de un mes desde la base de datos
+    python -m src charts      # gráficos de un mes
+    python -m src recurring   # pagos recurrentes y su próxima fecha
+    python -m src anomalies   # movimientos inusuales de la última carga
+    python -m src series      # ingresos/gastos por periodo, gasto móvil y variaciones
+    python -m src search Q    # busca movimientos por concepto (`BIZUM RAF*`)
+    python -m src status      # estado del directorio de datos y la caché
+    python -m src manifest    # manifiesto JSON de las exportaciones
+
+Las dependencias pesadas (pandas, psycopg2, matplotlib) se importan dentro de
+cada subcomando: `--help`, `status` y `manifest` solo usan la librería estándar
+(y PyYAML para leer config.yaml).
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# Agregar el directorio src al path para importaciones
+sys.path.append(str(Path(__file__).parent))
+
+from etl.exportaciones import directorio_datos, listar_exportaciones, manifiesto
+from etl.runtime_config import cargar_configuracion
+
+
+def cmd_ingest(args) -> int:
+    from etl.logger import Logger
+    from etl.pipeline import crear_cargador, guardar_cuentas, ingestar, ruta_datos_limpios, ruta_indice_conceptos
+    from etl.profile_data import ProfileData
+
+    logger = Logger()
+    logger.info("Iniciando pipeline de procesamiento de datos de gastos")
+    # El resumen se perfila durante la ingesta, sin volver a recorrer los movimientos
+    perfilador = ProfileData(logger) if args.resumen else None
+    loader = crear_cargador(args.cache_dir, logger)
+    df_clean = ingestar(args.data_dir, logger, loader=loader, configuracion=args.configuracion, perfilador=perfilador)
+    if df_clean.empty:
+        return 0
+
+    if perfilador is not None:
+        for mes, perfil in perfilador.por_mes().items():
+            perfilador.registrar(perfil, mes, conceptos=3)
+        perfilador.registrar(perfilador.total(), 'Total')
+    if not args.sin_cache:
+        from etl.anomaly_data import AnomalyData
+        from etl.cache import guardar_cache
+        guardar_cuentas(loader)
+        ruta = guardar_cache(df_clean, ruta_datos_limpios(args.cache_dir),
+                             {'archivos': [p.name for p in listar_exportaciones(args.data_dir)]})
+        print(f"💾 Movimientos limpios guardados en {ruta}")
+        indice = _indice_conceptos(args, logger)
+        indice.actualizar(df_clean['Concepto'], df_clean.get('Archivo'))
+        indice.guardar(ruta_indice_conceptos(args.cache_dir))
+        anomalias = AnomalyData(logger, directorio_cache=args.cache_dir).procesar(df_clean)
+        print(f"🚨 Movimientos inusuales en esta carga: {len(anomalias)}")
+        from etl.series_data import SeriesData
+        SeriesData(logger, directorio_cache=args.cache_dir).procesar(df_clean)
+    print(f"✅ Ingesta completada: {len(df_clean)} movimientos")
+    return 0
+
+
+def _movimientos_limpios(args, logger):
+    """
+    Movimientos limpios de la caché de `ingest` o, si no existe, de una ingesta nueva.
+    """
+    from etl.cache import leer_cache
+    from etl.pipeline import crear_cargador, guardar_cuentas, ingestar, ruta_datos_limpios
+
+    cache = leer_cache(ruta_datos_limpios(args.cache_dir))
+    if cache is not None:
+        return cache[0]
+    loader = crear_cargador(args.cache_dir, logger)
+    movimientos = ingestar(args.data_dir, logger, loader=loader, configuracion=args.configuracion)
+    guardar_cuentas(loader)
+    return movimientos
+
+
+def _indice_conceptos(args, logger):
+    """
+    Índice de conceptos guardado junto a la caché, o uno vacío si no existe.
+    """
+    from etl.concept_index import ConceptIndex
+    from etl.pipeline import ruta_indice_conceptos
+
+    return ConceptIndex.cargar(ruta_indice_conceptos(args.cache_dir), logger) or ConceptIndex(logger)
+
+
+def cmd_search(args) -> int:
+    from etl.dinero import centimos_a_euros
+    from etl.logger import Logger
+    from etl.pipeline import ruta_indice_conceptos
+
+    logger = Logger()
+    movimientos = _movimientos_limpios(args, logger)
+    indice = _indice_conceptos(args, logger)
+    # La huella detecta también cambios que no alteran el número de filas
+    huella = indice.huella
+    indice.actualizar(movimientos['Concepto'], movimientos.get('Archivo'))
+    if indice.huella != huella:
+        indice.guardar(ruta_indice_conceptos(args.cache_dir))
+
+    consulta = ' '.join(args.consulta)
+    encontrados = indice.filtrar(movimientos, consulta)
+    print(f"🔎 {len(encontrados)} movimientos para '{consulta}'")
+    if len(encontrados):
+        vista = (encontrados.assign(Importe=centimos_a_euros(encontrados['Importe']))
+                 .sort_values('Fecha Operación', kind='mergesort'))
+        columnas = [c for c in ('Fecha Operación', 'Concepto', 'Importe') if c in vista.columns]
+        print(vista[columnas].tail(args.limite).to_string(index=False))
+    return 0
+
+
+def cmd_recurring(args) -> int:
+    from etl.dinero import centimos_a_euros
+    from etl.logger import Logger
+    from etl.recurring_data import RecurringData
+
+    logger = Logger()
+    recurrentes = RecurringData(logger).detectar(_movimientos_limpios(args, logger))
+    if recurrentes.empty:
+        print("🔁 No se han encontrado pagos recurrentes")
+        return 0
+    recurrentes['Importe'] = centimos_a_euros(recurrentes['Importe'])
+    print(f"🔁 Pagos recurrentes: {len(recurrentes)}")
+    print(recurrentes.to_string(index=False))
+    return 0
+
+
+def cmd_anomalies(args) -> int:
+    from etl.anomaly_data import AnomalyData
+    from etl.dinero import centimos_a_euros
+
+    anomalias = AnomalyData(directorio_cache=args.cache_dir).ultimas_anomalias()
+    if anomalias.empty:
+        print("🚨 No hay movimientos inusuales en la última carga")
+        return 0
+    for columna in ('Importe', 'Importe_Esperado'):
+        anomalias[columna] = centimos_a_euros(anomalias[columna])
+    columnas = ['Fecha Operación', 'Concepto', 'Importe', 'Importe_Esperado', 'Puntuacion_Anomalia', 'Nivel_Anomalia']
+    print(f"🚨 Movimientos inusuales: {len(anomalias)}")
+    print(anomalias[[c for c in columnas if c in anomalias.columns]].to_string(index=False))
+    return 0
+
+
+def cmd_series(args) -> int:
+    from etl.dinero import centimos_a_euros, formatear_euros
+    from etl.logger import Logger
+    from etl.series_data import VENTANAS, SeriesData
+
+    logger = Logger()
+    series = SeriesData(logger, directorio_cache=args.cache_dir)
+    series.procesar(_movimientos_limpios(args, logger))
+    periodos = series.ingresos_gastos(args.frecuencia).tail(args.periodos)
+    if periodos.empty:
+        print("📈 No hay movimientos")
+        return 0
+    for columna in ('ingresos', 'gastos', 'neto'):
+        periodos[columna] = centimos_a_euros(periodos[columna])
+    print(f"📈 Ingresos y gastos por {args.frecuencia}:")
+    print(periodos.to_string())
+
+    movil = series.gasto_movil().iloc[-1]
+    saldo = series.saldo_acumulado()['total'].iloc[-1]
+    print("🔥 Gasto últimos 7/30/90 días: " + ' / '.join(formatear_euros(movil[f'gasto_{v}d']) for v in VENTANAS))
+    print(f"🔥 Ritmo de gasto (30 días): {formatear_euros(round(movil['ritmo_diario_30d']))}/día")
+    print(f"💰 Saldo al {movil.name:%Y-%m-%d}: {formatear_euros(saldo)}")
+
+    variaciones = series.variaciones_categoria()
+    ultimo = variaciones[variaciones['mes'] == variaciones['mes'].max()]
+    if not ultimo.empty:
+        ultimo = ultimo.sort_values('variacion_mes', key=lambda v: -v.abs().fillna(0), kind='stable').head(args.periodos)
+        for columna in ('gasto', 'variacion_mes', 'variacion_anio'):
+            ultimo[columna] = centimos_a_euros(ultimo[columna])
+        print(f"📊 Variaciones por categoría en {ultimo['mes'].iloc[0]}:")
+        print(ultimo.drop(columns='mes').to_string(index=False))
+    return 0
+
+
+def cmd_load(args) -> int:
+    from etl.DB_Gastos import main as cargar
+
+    return 0 if cargar(args.data_dir, args.configuracion, directorio_cache=args.cache_dir) else 1
+
+
+def cmd_watch(args) -> int:
+    from config.storage import abrir_almacen
+    from etl.anomaly_data import AnomalyData
+    from etl.DB_Gastos import cargar_cuentas, cargar_movimientos, crear_tablas
+    from etl.logger import Logger
+    from etl.pipeline import crear_cargador, guardar_cuentas, procesar_archivo
+    from etl.transform_data import TransformData
+    from etl.watch_folder import WatchFolder, crear_vigilante
+
+    logger = Logger()
+    configuracion = args.configuracion
+    directorio = directorio_datos(args.data_dir)
+    with abrir_almacen(configuracion) as db:
+        crear_tablas(db)
+        # Un solo cargador para todos los hilos: las claves de cuenta no se repiten
+        loader = crear_cargador(args.cache_dir, logger, cuentas=cargar_cuentas(db))
+        anomalias = AnomalyData(logger, directorio_cache=args.cache_dir)
+
+        def procesar(ruta):
+            return procesar_archivo(ruta, loader, TransformData(logger=logger))
+
+        def cargar(ruta, df_clean):
+            nuevos = cargar_movimientos(df_clean, 'gastos_2025', db, loader, configuracion.tamano_lote_bd())
+            guardar_cuentas(loader)
+            if not nuevos.empty:
+                inusuales = anomalias.procesar(nuevos)
+                print(f"🚨 Movimientos inusuales en {ruta.name}: {len(inusuales)}")
+            return True
+
+        vigilante = crear_vigilante(directorio, sondeo=args.sondeo, intervalo=args.intervalo, logger=logger)
+        daemon = WatchFolder(directorio, procesar, cargar, logger,
+                             directorio_cache=args.cache_dir,
+                             max_workers=args.workers or configuracion.workers,
+                             espera_estabilidad=args.espera,
+                             vigilante=vigilante)
+        daemon.ejecutar()
+    return 0
+
+
+def cmd_report(args) -> int:
+    from config.storage import abrir_almacen
+    from viz.analisis_abril import main as analizar
+
+    analizar(args.mes, graficos=False, almacen=abrir_almacen(args.configuracion))
+    return 0
+
+
+def cmd_charts(args) -> int:
+    from config.storage import abrir_almacen
+    from viz.analisis_abril import (cargar_gastos_mes, gastos_por_concepto,
+                                    gastos_por_dia, histograma_importes)
+
+    with abrir_almacen(args.configuracion) as db:
+        gastos = cargar_gastos_mes(db, args.mes)
+
+    directorio = Path(args.salida)
+    directorio.mkdir(parents=True, exist_ok=True)
+    for grafico in (histograma_importes, gastos_por_dia, gastos_por_concepto):
+        print(f"🖼️ {grafico(gastos, args.mes, directorio, mostrar=args.mostrar)}")
+    return 0
+
+
+def cmd_status(args) -> int:
+    directorio = directorio_datos(args.data_dir)
+    exportaciones = listar_exportaciones(args.data_dir)
+    print(f"📁 Directorio de datos: {directorio} ({len(exportaciones)} exportaciones)")
+    for ruta in exportaciones:
+        print(f"   - {ruta.name} ({ruta.stat().st_size} bytes)")
+
+    cache = Path(args.cache_dir)
+    entradas = sorted(cache.glob('*.json')) if cache.is_dir() else []
+    print(f"💾 Caché: {cache} ({len(entradas)} entradas)")
+
+    configuracion = args.configuracion
+    print(f"⚙️ Ejecución: modo {configuracion.elegir_modo(exportaciones)} "
+          f"(presupuesto {configuracion.memoria_mb} MB, {configuracion.workers} workers, "
+          f"lotes de {configuracion.tamano_lote_bd()} filas)")
+
+    if configuracion.motor_bd == 'sqlite':
+        print(f"🗄️ Base de datos: SQLite en {configuracion.ruta_sqlite}")
+    else:
+        configurada = all(os.getenv(v) for v in ('DB_HOST', 'DB_NAME', 'DB_USER'))
+        print(f"🗄️ Base de datos PostgreSQL configurada en el entorno: {'sí' if configurada else 'no (ver .env)'}")
+    return 0
+
+
+def cmd_manifest(args) -> int:
+    json.dump(manifiesto(args.data_dir), sys.stdout, indent=2, ensure_ascii=False)
+    print()
+    return 0
+
+
+def crear_parser() -> argparse.ArgumentParser:
+    """
+    Construye el parser con un subcomando por fase del pipeline.
+    """
+    parser = argparse.ArgumentParser(prog='python -m src', description="Pipeline ETL de gastos bancarios")
+    parser.add_argument('--config', default=None,
+                        help="Fichero de configuración de ejecución (por defecto config.yaml)")
+    parser.add_argument('--data-dir', default=None,
+                        help="Directorio de exportaciones (por defecto DATA_DIR, config.yaml o data/)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Directorio de la caché de datos limpios (por defecto CACHE_DIR, config.yaml o .cache/gastos)")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    ingest = subparsers.add_parser('ingest', help="Carga, concilia y limpia las exportaciones")
+    ingest.add_argument('--resumen', action='store_true', help="Muestra el resumen de los datos limpios")
+    ingest.add_argument('--sin-cache', action='store_true', help="No guarda los datos limpios en la caché")
+    ingest.set_defaults(func=cmd_ingest)
+
+    load = subparsers.add_parser('load', help="Ingesta las exportaciones y las carga en la base de datos")
+    load.set_defaults(func=cmd_load)
+
+    watch = subparsers.add_parser('watch', help="Vigila el directorio de datos y carga las exportaciones nuevas o cambiadas")
+    watch.add_argument('--workers', type=int, default=None,
+                       help="Hilos que leen y transforman exportaciones (por defecto, los de config.yaml)")
+    watch.add_argument('--espera', type=float, default=2.0,
+                       help="Segundos sin cambios antes de dar un fichero por terminado")
+    watch.add_argument('--sondeo', action='store_true', help="Vigila por sondeo en lugar de inotify")
+    watch.add_argument('--intervalo', type=float, default=2.0, help="Segundos entre sondeos")
+    watch.set_defaults(func=cmd_watch)
+
+    report = subparsers.add_parser('report', help="Resumen de un mes desde la base de datos")
+    report.add_argument('--mes', default='abril')
+    report.set_defaults(func=cmd_report)
+
+    charts = subparsers.add_parser('charts', help="Genera los gráficos de un mes")
+    charts.add_argument('--mes', default='abril')
+    charts.add_argument('--salida', default=str(Path(__file__).parent / 'viz'),
+                        help="Directorio donde guardar los gráficos")
+    charts.add_argument('--mostrar', action='store_true', help="Abre una ventana con cada gráfico")
+    charts.set_defaults(func=cmd_charts)
+
+    recurring = subparsers.add_parser('recurring', help="Detecta pagos recurrentes y su próxima fecha")
+    recurring.set_defaults(func=cmd_recurring)
+
+    search = subparsers.add_parser('search', help="Busca movimientos por concepto (términos con AND, `RAF*` por prefijo)")
+    search.add_argument('consulta', nargs='+')
+    search.add_argument('--limite', type=int, default=50, help="Movimientos a mostrar (los más recientes)")
+    search.set_defaults(func=cmd_search)
+
+    anomalies = subparsers.add_parser('anomalies', help="Movimientos inusuales de la última carga")
+    anomalies.set_defaults(func=cmd_anomalies)
+
+    series = subparsers.add_parser('series', help="Ingresos y gastos por periodo, gasto móvil, saldo y variaciones por categoría")
+    series.add_argument('--frecuencia', choices=['dia', 'semana', 'mes'], default='mes')
+    series.add_argument('--periodos', type=int, default=12, help="Periodos (y categorías) a mostrar")
+    series.set_defaults(func=cmd_series)
+
+    status = subparsers.add_parser('status', help="Estado del directorio de datos y la caché")
+    status.set_defaults(func=cmd_status)
+
+    manifest = subparsers.add_parser('manifest', help="Manifiesto JSON de las exportaciones")
+    manifest.set_defaults(func=cmd_manifest)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    try:
+        args.configuracion = cargar_configuracion(args.config)
+    except ValueError as e:
+        parser.error(f"configuración no válida: {e}")
+    # Las opciones de la línea de comandos tienen prioridad sobre la configuración
+    args.data_dir = args.data_dir or args.configuracion.directorio_datos
+    args.cache_dir = args.cache_dir or args.configuracion.directorio_cache
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
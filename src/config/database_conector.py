@@ -1,14 +1,29 @@
 import psycopg2
 import psycopg2.extras
 from psycopg2 import pool
+import io
 import logging
 from typing import Optional, List, Dict, Any, Tuple
 import os
 from contextlib import contextmanager
-from dotenv import load_dotenv
 
-# Cargar variables de entorno desde .env
-load_dotenv()
+from etl.runtime_config import cargar_entorno
+from .query_cache import QueryCache, es_cacheable, es_lectura, relaciones_leidas, tabla_escrita
+from .statement_cache import StatementCache, es_error_de_preparacion
+
+# Tipo de pandas para cada tipo de PostgreSQL (por OID) en query_to_dataframe.
+# NUMERIC llega como float64: para importes exactos pasar dtypes={'importe': str}.
+TIPOS_DATAFRAME = {
+    16: 'boolean',                                    # bool
+    700: 'float64', 701: 'float64', 1700: 'float64',  # float4, float8, numeric
+    19: 'str', 25: 'str', 1042: 'str', 1043: 'str',   # name, text, char, varchar
+}
+# Los enteros se dejan deducir al parser (int64, mucho más rápido que pedir
+# Int64) y solo pasan a Int64 si tienen nulos
+TIPOS_ENTEROS = {20, 21, 23}
+# Fechas: date, timestamp y timestamptz
+TIPOS_FECHA = {1082: False, 1114: False, 1184: True}
+
 
 class DatabaseConnector:
     """
@@ -18,35 +33,48 @@ class DatabaseConnector:
     
     def __init__(self, 
                  host: str = None,
-                 port: int = 5432,
+                 port: int = None,
                  database: str = None,
                  user: str = None,
                  password: str = None,
-                 min_connections: int = 1,
-                 max_connections: int = 10):
+                 min_connections: int = None,
+                 max_connections: int = None,
+                 query_cache: Optional[QueryCache] = None,
+                 prepare_statements: bool = True):
         """
         Inicializa el conector de base de datos.
         
         Args:
             host: Host de la base de datos
-            port: Puerto de la base de datos (default: 5432)
+            port: Puerto de la base de datos (default: DB_PORT o 5432)
             database: Nombre de la base de datos
             user: Usuario de la base de datos
             password: Contraseña de la base de datos
-            min_connections: Número mínimo de conexiones en el pool
-            max_connections: Número máximo de conexiones en el pool
+            min_connections: Número mínimo de conexiones en el pool (default: DB_MIN_CONNECTIONS o 1)
+            max_connections: Número máximo de conexiones en el pool (default: DB_MAX_CONNECTIONS o 10)
+            query_cache: Caché de resultados de execute_query (opcional, ver QueryCache)
+            prepare_statements: Preparar en cada conexión las sentencias que se repiten (ver StatementCache)
         """
+        cargar_entorno()
         self.host = host or os.getenv('DB_HOST', 'localhost')
         self.port = port or int(os.getenv('DB_PORT', 5432))
         self.database = database or os.getenv('DB_NAME', 'postgres')
         self.user = user or os.getenv('DB_USER', 'postgres')
         self.password = password or os.getenv('DB_PASSWORD', '')
         
-        self.min_connections = min_connections
-        self.max_connections = max_connections
+        self.min_connections = min_connections or int(os.getenv('DB_MIN_CONNECTIONS', 1))
+        self.max_connections = max_connections or int(os.getenv('DB_MAX_CONNECTIONS', 10))
         
         self.connection_pool = None
         self.logger = logging.getLogger(__name__)
+
+        # Caché de resultados y, para invalidarla, tablas base de cada relación (las vistas se expanden)
+        self.query_cache = query_cache
+        self._base_tables: Dict[str, frozenset] = {}
+
+        # Sentencias preparadas por conexión y metadatos del esquema, que se refrescan tras cada DDL
+        self.statement_cache = StatementCache() if prepare_statements else None
+        self._schema: Dict[str, Any] = {}
         
     def create_connection_pool(self) -> bool:
         """
@@ -128,6 +156,9 @@ class DatabaseConnector:
     def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
         """
         Ejecuta una consulta SELECT y retorna los resultados.
+
+        Con query_cache, las lecturas se sirven de la caché mientras no caduquen
+        ni se escriba en las tablas que consultan.
         
         Args:
             query: Consulta SQL a ejecutar
@@ -136,12 +167,181 @@ class DatabaseConnector:
         Returns:
             List[Dict[str, Any]]: Lista de diccionarios con los resultados
         """
+        if not es_cacheable(query):
+            # INSERT ... RETURNING y similares también escriben
+            results = self._fetch_all(query, params)
+            self._invalidate_cache(query)
+            return results
+
+        if self.query_cache is None:
+            return self._fetch_all(query, params)
+        key = QueryCache.key(query, params)
+        results = self.query_cache.get(key)
+        if results is None:
+            results = self._fetch_all(query, params)
+            self.query_cache.put(key, results, self._dependencies(query))
+        return results
+
+    def query_to_dataframe(self, query: str, params: tuple = None, dtypes: Dict[str, Any] = None):
+        """
+        Ejecuta una consulta y devuelve el resultado como DataFrame.
+
+        El servidor envía el resultado en CSV con `COPY (consulta) TO STDOUT`
+        y pandas lo parsea con su lector en C, sin crear un objeto de Python
+        por celda como pd.read_sql. Los tipos de las columnas se toman de la
+        propia consulta (ver TIPOS_DATAFRAME); solo NULL se lee como nulo (un
+        texto vacío sigue siendo '').
+        La conexión vuelve al pool al terminar.
+
+        Args:
+            query: Consulta SQL (SELECT, WITH o VALUES)
+            params: Parámetros para la consulta (opcional)
+            dtypes: Tipos de pandas por columna que sustituyen a los deducidos (opcional)
+
+        Returns:
+            pd.DataFrame: Resultado de la consulta
+        """
+        import pandas as pd
+
+        dtypes = dict(dtypes or {})
+        with self.get_db_connection() as connection:
+            encoding = psycopg2.extensions.encodings.get(connection.encoding, 'utf-8')
+            with connection.cursor() as cursor:
+                sql = cursor.mogrify(query, params).decode(encoding).strip().rstrip(';')
+                # Columnas y tipos sin traer filas
+                cursor.execute(f"SELECT * FROM ({sql}) AS consulta LIMIT 0")
+                columns = [(column.name, column.type_code) for column in cursor.description]
+                buffer = io.BytesIO()
+                cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true, NULL '\\N')", buffer)
+        buffer.seek(0)
+
+        types = {name: dtypes.get(name, TIPOS_DATAFRAME.get(oid)) for name, oid in columns}
+        dataframe = pd.read_csv(buffer, engine='c', encoding=encoding,
+                                dtype={name: t for name, t in types.items() if t is not None},
+                                keep_default_na=False, na_values=['\\N'],
+                                true_values=['t'], false_values=['f'])
+        for name, oid in columns:
+            if name in dtypes:
+                continue
+            if oid in TIPOS_FECHA:
+                dataframe[name] = pd.to_datetime(dataframe[name], format='ISO8601', utc=TIPOS_FECHA[oid])
+            elif oid in TIPOS_ENTEROS and dataframe[name].dtype.kind != 'i':
+                dataframe[name] = dataframe[name].astype('Int64')
+        return dataframe
+
+    def _fetch_all(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
         with self.get_db_connection() as connection:
             with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-                cursor.execute(query, params)
+                self._execute(connection, cursor, query, params)
                 results = cursor.fetchall()
                 return [dict(row) for row in results]
-    
+
+    def _execute(self, connection, cursor, sql: str, params=None, many: bool = False):
+        """
+        Ejecuta una sentencia (o la misma con varios juegos de parámetros si
+        `many`) a través de su sentencia preparada cuando la hay. Si PostgreSQL
+        no puede prepararla, se revierte y se ejecuta el texto original; los
+        demás errores (restricciones, bloqueos, timeouts) se propagan sin más.
+        """
+        if self.statement_cache is not None:
+            example = (params[0] if params else None) if many else params
+            # Dentro de una transacción con otras sentencias (execute_transaction)
+            # solo se revierte esta, no lo anterior: se marca antes del PREPARE
+            en_transaccion = (connection.info.transaction_status
+                              == psycopg2.extensions.TRANSACTION_STATUS_INTRANS)
+            savepoint = []
+
+            def marcar():
+                if en_transaccion:
+                    cursor.execute('SAVEPOINT sentencia_preparada')
+                    savepoint.append(True)
+
+            try:
+                prepared = self.statement_cache.plan(connection, cursor, sql, example,
+                                                     usos=len(params) if many else 1,
+                                                     antes_de_preparar=marcar)
+                if prepared is not None:
+                    if many:
+                        cursor.executemany(prepared, params)
+                    else:
+                        cursor.execute(prepared, params)
+                    if savepoint:
+                        cursor.execute('RELEASE SAVEPOINT sentencia_preparada')
+                    return
+            except psycopg2.Error as e:
+                if not es_error_de_preparacion(e.pgcode):
+                    raise
+                self.statement_cache.discard(connection, sql, e.pgcode)
+                if en_transaccion and not savepoint:
+                    # Falló el EXECUTE de una sentencia ya preparada: sin savepoint
+                    # no se puede revertir solo esta; execute_transaction la repite entera
+                    raise
+                self.logger.debug(f"Sentencia sin preparar ({e.pgcode}): {e}")
+                if savepoint:
+                    cursor.execute('ROLLBACK TO SAVEPOINT sentencia_preparada')
+                    cursor.execute('RELEASE SAVEPOINT sentencia_preparada')
+                else:
+                    connection.rollback()
+        if many:
+            cursor.executemany(sql, params)
+        else:
+            cursor.execute(sql, params)
+
+    def _dependencies(self, query: str) -> frozenset:
+        """
+        Tablas base de las que depende una consulta: las que lee y, si lee
+        vistas, las tablas sobre las que están definidas (consultado una vez
+        por relación en pg_rewrite/pg_depend).
+        """
+        tables = set()
+        pending = list(relaciones_leidas(query))
+        while pending:
+            relation = pending.pop()
+            if relation in tables:
+                continue
+            tables.add(relation)
+            if relation not in self._base_tables:
+                rows = self._fetch_all("""
+                SELECT DISTINCT t.relname AS tabla
+                FROM pg_class v
+                JOIN pg_rewrite r ON r.ev_class = v.oid
+                JOIN pg_depend d ON d.objid = r.oid AND d.classid = 'pg_rewrite'::regclass
+                JOIN pg_class t ON t.oid = d.refobjid
+                WHERE v.relname = %s AND t.oid <> v.oid
+                """, (relation,))
+                self._base_tables[relation] = frozenset(row['tabla'].lower() for row in rows)
+            pending.extend(self._base_tables[relation])
+        return frozenset(tables)
+
+    def _invalidate_cache(self, command: str):
+        """
+        Tras un comando, invalida lo que haya podido cambiar: en la caché de
+        resultados, las entradas que dependen de la tabla escrita; con DDL u
+        otro comando no reconocido, toda la caché, los metadatos del esquema y
+        las sentencias preparadas.
+        """
+        table = tabla_escrita(command)
+        if table is not None:
+            if self.query_cache is not None:
+                self.query_cache.invalidate([table])
+        elif not es_lectura(command):
+            self._schema.clear()
+            self._base_tables.clear()
+            if self.statement_cache is not None:
+                self.statement_cache.invalidate()
+            if self.query_cache is not None:
+                self.query_cache.invalidate()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Contadores de la caché de resultados (vacío si no está activada) y de
+        las sentencias preparadas (bajo la clave 'statements').
+        """
+        stats = self.query_cache.stats() if self.query_cache is not None else {}
+        if self.statement_cache is not None:
+            stats['statements'] = self.statement_cache.stats()
+        return stats
+
     def execute_command(self, command: str, params: tuple = None) -> int:
         """
         Ejecuta un comando INSERT, UPDATE, DELETE y retorna el número de filas afectadas.
@@ -155,9 +355,11 @@ class DatabaseConnector:
         """
         with self.get_db_connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(command, params)
+                self._execute(connection, cursor, command, params)
                 connection.commit()
-                return cursor.rowcount
+                rowcount = cursor.rowcount
+        self._invalidate_cache(command)
+        return rowcount
     
     def execute_many(self, command: str, params_list: List[tuple]) -> int:
         """
@@ -172,13 +374,69 @@ class DatabaseConnector:
         """
         with self.get_db_connection() as connection:
             with connection.cursor() as cursor:
-                cursor.executemany(command, params_list)
+                self._execute(connection, cursor, command, params_list, many=True)
                 connection.commit()
-                return cursor.rowcount
+                rowcount = cursor.rowcount
+        self._invalidate_cache(command)
+        return rowcount
     
+    def execute_transaction(self, statements: List[Tuple[str, List[tuple]]]) -> List[int]:
+        """
+        Ejecuta varios comandos (cada uno con su lista de parámetros) en una
+        sola transacción: o se confirman todos o ninguno.
+
+        Si a mitad de la transacción falla una sentencia ya preparada (su plan
+        ha caducado por un cambio de esquema hecho desde fuera), la transacción
+        se revierte y se repite una vez en la misma conexión, que vuelve a
+        preparar sus sentencias desde cero.
+
+        Args:
+            statements: Lista de (comando, lista de tuplas de parámetros)
+
+        Returns:
+            List[int]: Filas afectadas por cada comando
+        """
+        with self.get_db_connection() as connection:
+            for intento in range(2):
+                rowcounts = []
+                try:
+                    with connection.cursor() as cursor:
+                        for command, params_list in statements:
+                            self._execute(connection, cursor, command, params_list, many=True)
+                            rowcounts.append(cursor.rowcount)
+                        connection.commit()
+                    break
+                except psycopg2.Error as e:
+                    if intento or self.statement_cache is None or not es_error_de_preparacion(e.pgcode):
+                        raise
+                    self.logger.debug(f"Transacción repetida tras fallar una sentencia preparada ({e.pgcode}): {e}")
+                    connection.rollback()
+        for command, _ in statements:
+            self._invalidate_cache(command)
+        return rowcounts
+
+    def _schema_tables(self) -> set:
+        if 'tables' not in self._schema:
+            rows = self._fetch_all("""
+            SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'
+            """)
+            self._schema['tables'] = {row['table_name'] for row in rows}
+        return self._schema['tables']
+
+    def refresh_schema(self):
+        """
+        Descarta los metadatos del esquema (tablas, columnas, índices) guardados.
+        Se hace solo tras cada DDL lanzado con este conector; llamarlo si el
+        esquema lo cambia otro proceso.
+        """
+        self._schema.clear()
+
     def table_exists(self, table_name: str) -> bool:
         """
         Verifica si una tabla existe en la base de datos.
+
+        Se consulta la lista de tablas guardada; si la tabla no aparece se
+        vuelve a leer por si la ha creado otro proceso.
         
         Args:
             table_name: Nombre de la tabla a verificar
@@ -186,16 +444,37 @@ class DatabaseConnector:
         Returns:
             bool: True si la tabla existe, False en caso contrario
         """
-        query = """
-        SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = %s
-        );
+        if table_name in self._schema_tables():
+            return True
+        self._schema.pop('tables', None)
+        return table_name in self._schema_tables()
+
+    def get_columns(self, table_name: str) -> List[Tuple[str, str]]:
+        """
+        Columnas de una tabla como (nombre, tipo), en orden, desde los metadatos guardados.
         """
-        result = self.execute_query(query, (table_name,))
-        return result[0]['exists'] if result else False
-    
+        columns = self._schema.setdefault('columns', {})
+        if table_name not in columns:
+            rows = self._fetch_all("""
+            SELECT column_name, data_type FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = %s
+            ORDER BY ordinal_position
+            """, (table_name,))
+            columns[table_name] = [(row['column_name'], row['data_type']) for row in rows]
+        return list(columns[table_name])
+
+    def get_indexes(self, table_name: str) -> Dict[str, str]:
+        """
+        Índices de una tabla (nombre -> definición), desde los metadatos guardados.
+        """
+        indexes = self._schema.setdefault('indexes', {})
+        if table_name not in indexes:
+            rows = self._fetch_all("""
+            SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = 'public' AND tablename = %s
+            """, (table_name,))
+            indexes[table_name] = {row['indexname']: row['indexdef'] for row in rows}
+        return dict(indexes[table_name])
+
     def create_table(self, table_name: str, columns: List[Tuple[str, str]]) -> bool:
         """
         Crea una tabla en la base de datos.
@@ -0,0 +1,246 @@
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# Literales entre comillas simples (con '' escapado)
+PATRON_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+# Literales e identificadores entre comillas dobles (`"Importe"` no es `"importe"`):
+# se conservan tal cual al normalizar
+PATRON_LITERAL_O_IDENTIFICADOR = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+PATRON_IDENTIFICADOR = re.compile(r'"(?:[^"]|"")*"')
+
+# Palabra inmediatamente antes de un paréntesis
+PATRON_PALABRA_FINAL = re.compile(r'(\w+)\s*$')
+
+# Palabras tras las que un paréntesis no es una llamada a función (subconsultas,
+# listas y joins entre paréntesis)
+PALABRAS_CLAVE = frozenset({
+    'from', 'join', 'in', 'exists', 'any', 'all', 'some', 'as', 'lateral', 'on', 'where', 'and', 'or', 'not',
+    'select', 'union', 'intersect', 'except', 'using', 'values', 'with', 'having', 'by', 'then', 'else', 'when',
+    'case', 'is', 'like', 'between', 'distinct', 'returning', 'set', 'to',
+})
+
+# Relaciones leídas por una consulta: lo que sigue a FROM/JOIN hasta la siguiente
+# cláusula (puede ser una lista `a, b x`)
+PATRON_LECTURA = re.compile(
+    r'\b(?:from|join)\s+(.*?)(?=\b(?:where|group|order|limit|offset|having|window|union|intersect|except|'
+    r'join|inner|left|right|full|cross|natural|on|using|returning)\b|[;()]|$)',
+    re.IGNORECASE | re.DOTALL)
+
+# Tabla escrita por un comando DML
+PATRON_ESCRITURA = re.compile(
+    r'^\s*(?:insert\s+into|update(?:\s+only)?|delete\s+from(?:\s+only)?|copy|merge\s+into)\s+'
+    r'((?:"[^"]+"|\w+)(?:\.(?:"[^"]+"|\w+))?)', re.IGNORECASE)
+
+# Consultas que se pueden guardar: solo lecturas, sin funciones volátiles
+PATRON_CACHEABLE = re.compile(r'^\s*(?:select|with|values)\b', re.IGNORECASE)
+# COPY de una consulta: solo puede ser COPY (...) TO
+PATRON_COPIA_CONSULTA = re.compile(r'^\s*copy\s*\(', re.IGNORECASE)
+PATRON_ESCRITURA_ANIDADA = re.compile(r'\b(?:insert|update|delete|merge)\b', re.IGNORECASE)
+PATRON_NO_CACHEABLE = re.compile(
+    r'\b(?:insert|update|delete|merge|now|random|nextval|setval|clock_timestamp|statement_timestamp|'
+    r'timeofday|current_timestamp|current_time|localtime|localtimestamp|current_date|txid_current|pg_sleep)\b',
+    re.IGNORECASE)
+
+
+def normalizar_sql(sql: str) -> str:
+    """
+    Forma canónica de una sentencia para usarla como clave: espacios colapsados
+    y minúsculas fuera de los literales y de los identificadores entre
+    comillas dobles, sin `;` final.
+    """
+    partes, inicio = [], 0
+    for literal in PATRON_LITERAL_O_IDENTIFICADOR.finditer(sql):
+        partes.append(' '.join(sql[inicio:literal.start()].split()).lower())
+        partes.append(literal.group())
+        inicio = literal.end()
+    partes.append(' '.join(sql[inicio:].split()).lower())
+    return ' '.join(p for p in partes if p).rstrip(';').strip()
+
+
+def _relacion(nombre: str) -> str:
+    # `public.gastos_2025`, `"Gastos"` y `gastos_2025` se comparan por el nombre sin esquema
+    return nombre.split('.')[-1].strip('"').lower()
+
+
+def _en_llamadas(sql: str) -> List[bool]:
+    """
+    Para cada carácter, si el paréntesis más interno que lo contiene es el de
+    una llamada a función (`extract(year from fecha)`, `substring(x from 2)`),
+    cuyo FROM no es una relación.
+    """
+    texto = PATRON_IDENTIFICADOR.sub(lambda m: '_' * len(m.group()), sql)
+    dentro, pila = [], []
+    for i, caracter in enumerate(texto):
+        if caracter == '(':
+            palabra = PATRON_PALABRA_FINAL.search(texto[max(0, i - 64):i])
+            pila.append(bool(palabra) and palabra.group(1).lower() not in PALABRAS_CLAVE)
+        elif caracter == ')' and pila:
+            pila.pop()
+        dentro.append(bool(pila) and pila[-1])
+    return dentro
+
+
+def relaciones_leidas(sql: str) -> FrozenSet[str]:
+    """
+    Tablas y vistas que aparecen tras FROM o JOIN en una consulta (sin contar
+    el FROM de funciones como EXTRACT o SUBSTRING).
+    """
+    relaciones = set()
+    texto = PATRON_LITERAL.sub("''", sql)
+    en_llamada = _en_llamadas(texto)
+    for encontrada in PATRON_LECTURA.finditer(texto):
+        if en_llamada[encontrada.start()]:
+            continue
+        for elemento in encontrada.group(1).split(','):
+            if elemento.split():
+                relaciones.add(_relacion(elemento.split()[0]))
+    return frozenset(relaciones)
+
+
+def tabla_escrita(sql: str) -> Optional[str]:
+    """
+    Tabla que modifica un INSERT/UPDATE/DELETE/COPY, o None si no se reconoce
+    (también si el comando lleva varias sentencias).
+    """
+    sin_literales = PATRON_LITERAL.sub("''", sql)
+    if ';' in sin_literales.strip().rstrip(';'):
+        return None
+    encontrada = PATRON_ESCRITURA.match(sin_literales)
+    return _relacion(encontrada.group(1)) if encontrada else None
+
+
+def es_cacheable(sql: str) -> bool:
+    sin_literales = PATRON_LITERAL.sub("''", sql)
+    return bool(PATRON_CACHEABLE.match(sin_literales)) and not PATRON_NO_CACHEABLE.search(sin_literales)
+
+
+def es_lectura(sql: str) -> bool:
+    """
+    Indica si una sentencia solo lee (aunque use funciones volátiles),
+    incluido `COPY (consulta) TO`.
+    """
+    sin_literales = PATRON_LITERAL.sub("''", sql)
+    lee = PATRON_CACHEABLE.match(sin_literales) or PATRON_COPIA_CONSULTA.match(sin_literales)
+    return bool(lee) and not PATRON_ESCRITURA_ANIDADA.search(sin_literales)
+
+
+def tamano_resultado(filas: List[Dict[str, Any]]) -> int:
+    """
+    Estimación barata (bytes) de lo que ocupa en memoria un resultado de execute_query.
+    """
+    total = sys.getsizeof(filas)
+    for fila in filas:
+        total += sys.getsizeof(fila) + sum(sys.getsizeof(v) for v in fila.values())
+    return total
+
+
+class QueryCache:
+    """
+    Caché de resultados de consultas para DatabaseConnector (opcional).
+
+    La clave es la sentencia normalizada más sus parámetros. Las entradas
+    caducan a los `ttl` segundos y, si se supera `max_bytes`, se expulsan las
+    usadas hace más tiempo (LRU). Cada entrada recuerda las tablas de las que
+    depende (las de FROM/JOIN y, para las vistas, sus tablas base), y se
+    invalida cuando se escribe en alguna de ellas.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            ttl: Segundos de vida de cada entrada
+            max_bytes: Tamaño máximo estimado de todos los resultados guardados
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entradas: 'OrderedDict[tuple, Tuple[float, int, FrozenSet[str], list]]' = OrderedDict()
+        self._bytes = 0
+        self._bloqueo = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(sql: str, params=None) -> tuple:
+        if isinstance(params, dict):
+            params = tuple(sorted(params.items()))
+        elif isinstance(params, list):
+            params = tuple(params)
+        return normalizar_sql(sql), repr(params)
+
+    def get(self, key: tuple) -> Optional[List[Dict[str, Any]]]:
+        """
+        Resultado guardado (copia de cada fila) o None si no está o ha caducado.
+        """
+        with self._bloqueo:
+            entrada = self._entradas.get(key)
+            if entrada is not None and entrada[0] < time.monotonic():
+                self._quitar(key)
+                entrada = None
+            if entrada is None:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(key)
+            self.hits += 1
+            return [dict(fila) for fila in entrada[3]]
+
+    def put(self, key: tuple, filas: List[Dict[str, Any]], tablas: Iterable[str]):
+        """
+        Guarda un resultado con las tablas de las que depende.
+        """
+        tamano = tamano_resultado(filas)
+        if tamano > self.max_bytes:
+            return
+        with self._bloqueo:
+            if key in self._entradas:
+                self._quitar(key)
+            self._entradas[key] = (time.monotonic() + self.ttl, tamano, frozenset(tablas), [dict(f) for f in filas])
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                self._quitar(next(iter(self._entradas)))
+                self.evictions += 1
+
+    def _quitar(self, key):
+        _, tamano, _, _ = self._entradas.pop(key)
+        self._bytes -= tamano
+
+    def invalidate(self, tablas: Optional[Iterable[str]] = None) -> int:
+        """
+        Quita las entradas que dependen de alguna de las tablas (todas si es None).
+
+        Returns:
+            int: Número de entradas invalidadas
+        """
+        with self._bloqueo:
+            if tablas is None:
+                quitadas = list(self._entradas)
+            else:
+                tablas = {_relacion(t) for t in tablas}
+                quitadas = [k for k, (_, _, dependencias, _) in self._entradas.items() if dependencias & tablas]
+            for key in quitadas:
+                self._quitar(key)
+            self.invalidations += len(quitadas)
+            return len(quitadas)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores para monitorización: aciertos, fallos, expulsiones,
+        invalidaciones, entradas y bytes ocupados.
+        """
+        with self._bloqueo:
+            consultas = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / consultas if consultas else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entradas),
+                'bytes': self._bytes,
+            }
@@ -0,0 +1,200 @@
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, TYPE_CHECKING
+
+from .storage import COLUMNAS_CONTROL, COLUMNAS_FECHA, COLUMNAS_GASTOS, TABLA_CONTROL, StorageBackend
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Formato de las fechas guardadas: texto ISO, que ordena y compara igual que la fecha
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+# Esquema equivalente al de PostgreSQL (PostgresStorage.create_tables). Los importes se
+# guardan en céntimos enteros (SQLite no tiene DECIMAL exacto) y las fechas
+# como texto ISO.
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cuentas (
+    id INTEGER PRIMARY KEY NOT NULL,
+    iban TEXT UNIQUE,
+    titular TEXT
+);
+INSERT OR IGNORE INTO cuentas (id, iban, titular) VALUES (0, NULL, 'Cuenta desconocida');
+CREATE TABLE IF NOT EXISTS {tabla} (
+    id INTEGER PRIMARY KEY NOT NULL,
+    Fecha_Operacion TEXT NOT NULL,
+    Concepto TEXT,
+    Fecha_Valor TEXT,
+    Importe INTEGER,
+    Saldo INTEGER,
+    Referencia_1 TEXT,
+    Referencia_2 TEXT,
+    Cuenta_Id INTEGER NOT NULL DEFAULT 0 REFERENCES cuentas (id)
+);
+CREATE TABLE IF NOT EXISTS {control} (
+    tabla TEXT NOT NULL,
+    archivo TEXT NOT NULL,
+    huella TEXT NOT NULL,
+    lote INTEGER NOT NULL,
+    fila_hasta INTEGER NOT NULL,
+    filas INTEGER NOT NULL,
+    cargado_en TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tabla, archivo, huella, lote)
+);
+"""
+
+# Índices por cuenta y fecha, por fecha (periodos) y por concepto
+INDICES = {
+    'idx_{tabla}_cuenta_fecha': '{tabla} (Cuenta_Id, Fecha_Operacion)',
+    'idx_{tabla}_fecha': '{tabla} (Fecha_Operacion)',
+    'idx_{tabla}_concepto': '{tabla} (Concepto)',
+}
+
+# Una carga de al menos estas filas que además duplica la tabla se inserta sin
+# índices y los reconstruye al final (medido: 500k filas, 3,7 s -> 2,4 s; por
+# lotes con puntos de control, 3,1 s -> 2,6 s)
+FILAS_RECONSTRUIR_INDICES = 10_000
+
+# Caché de páginas (KiB, en negativo): las inserciones en los índices dejan de ir a disco
+CACHE_KIB = 64 * 1024
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Almacén en un fichero SQLite local: sin servidor ni configuración, para
+    analizar sin conexión y para las pruebas.
+
+    La base de datos se abre en modo WAL (las lecturas no bloquean la carga)
+    con `synchronous=NORMAL`, y cada inserción de movimientos va en una sola
+    transacción aunque se convierta por lotes.
+    """
+
+    nombre = 'sqlite'
+    marcador = '?'
+
+    def __init__(self, ruta=':memory:', tabla: str = 'gastos_2025'):
+        """
+        Args:
+            ruta: Fichero de la base de datos (se crea si no existe) o ':memory:'
+            tabla: Tabla de movimientos
+        """
+        self.ruta = str(ruta)
+        self.tabla = tabla
+        if self.ruta != ':memory:':
+            Path(self.ruta).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.ruta)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute(f"PRAGMA cache_size = -{CACHE_KIB}")
+
+    def _dataframe(self, sql: str, params: tuple = ()) -> 'pd.DataFrame':
+        import pandas as pd
+
+        cursor = self.connection.execute(sql, params)
+        return pd.DataFrame.from_records(cursor.fetchall(), columns=[c[0] for c in cursor.description])
+
+    def _centimos(self, expresion: str) -> str:
+        # Ya se guardan en céntimos
+        return expresion
+
+    def _periodo(self, agrupacion: str) -> str:
+        return f"substr(Fecha_Operacion, 1, {10 if agrupacion == 'dia' else 7})"
+
+    def _fecha(self, valor) -> Any:
+        import pandas as pd
+        return pd.Timestamp(valor).strftime(FORMATO_FECHA)
+
+    def version(self) -> str:
+        return f"SQLite {sqlite3.sqlite_version} ({self.ruta})"
+
+    def create_tables(self):
+        self.connection.executescript(ESQUEMA.format(tabla=self.tabla, control=TABLA_CONTROL))
+        self._crear_indices(self.tabla)
+
+    def _crear_indices(self, tabla: str):
+        for nombre, definicion in INDICES.items():
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS {nombre.format(tabla=tabla)} "
+                                    f"ON {definicion.format(tabla=tabla)}")
+
+    def _borrar_indices(self, tabla: str):
+        for nombre in INDICES:
+            self.connection.execute(f"DROP INDEX IF EXISTS {nombre.format(tabla=tabla)}")
+
+    def _reconstruir_indices(self, tabla: str, filas: int) -> bool:
+        """Si una carga de `filas` filas va más rápida sin índices y reconstruyéndolos al final."""
+        filas_en_tabla = self.connection.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabla}").fetchone()[0]
+        return filas >= max(FILAS_RECONSTRUIR_INDICES, filas_en_tabla)
+
+    def load_accounts(self) -> Dict[str, int]:
+        filas = self.connection.execute("SELECT iban, id FROM cuentas WHERE iban IS NOT NULL").fetchall()
+        return dict(filas)
+
+    def save_accounts(self, accounts: List[tuple]) -> int:
+        if not accounts:
+            return 0
+        with self.connection:
+            self.connection.executemany("""
+            INSERT INTO cuentas (id, iban, titular) VALUES (?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET titular = COALESCE(excluded.titular, cuentas.titular)
+            """, accounts)
+        return len(accounts)
+
+    @staticmethod
+    def _insert_command(table: str) -> str:
+        return (f"INSERT INTO {table} ({', '.join(COLUMNAS_GASTOS)}) "
+                f"VALUES ({', '.join(['?'] * len(COLUMNAS_GASTOS))})")
+
+    @staticmethod
+    def _filas(df: 'pd.DataFrame') -> List[tuple]:
+        """Tuplas de un lote con las fechas en texto ISO y None en los nulos."""
+        import pandas as pd
+
+        df = df.assign(**{c: pd.to_datetime(df[c]).dt.strftime(FORMATO_FECHA) for c in COLUMNAS_FECHA})
+        return [tuple(row) for row in df.astype(object).where(df.notna(), None).values]
+
+    def insert_movements(self, table: str, df: 'pd.DataFrame', rows_per_batch: int) -> int:
+        insert_command = self._insert_command(table)
+        reconstruir = self._reconstruir_indices(table, len(df))
+        # Toda la carga (también el DROP/CREATE INDEX) en una transacción: un
+        # solo fsync al final y, si algo falla, la tabla queda como estaba
+        with self.connection:
+            self.connection.execute("BEGIN")
+            if reconstruir:
+                self._borrar_indices(table)
+            for inicio in range(0, len(df), rows_per_batch):
+                self.connection.executemany(insert_command, self._filas(df.iloc[inicio:inicio + rows_per_batch]))
+            if reconstruir:
+                self._crear_indices(table)
+        return len(df)
+
+    @contextmanager
+    def bulk_load(self, table: str, rows: int) -> Iterator[None]:
+        """
+        Una carga por lotes grande (como en insert_movements) va sin índices:
+        se quitan antes del primer lote y se reconstruyen tras el último,
+        también si la carga falla a medias. Cada lote sigue confirmándose con
+        su punto de control.
+        """
+        if not self._reconstruir_indices(table, rows):
+            yield
+            return
+        with self.connection:
+            self._borrar_indices(table)
+        try:
+            yield
+        finally:
+            with self.connection:
+                self._crear_indices(table)
+
+    def insert_batch(self, table: str, df: 'pd.DataFrame', checkpoint: tuple) -> int:
+        with self.connection:
+            self.connection.execute("BEGIN")
+            filas_insertadas = self.connection.executemany(self._insert_command(table), self._filas(df)).rowcount
+            self.connection.execute(f"INSERT INTO {TABLA_CONTROL} ({', '.join(COLUMNAS_CONTROL)}) "
+                                    f"VALUES ({', '.join(['?'] * len(COLUMNAS_CONTROL))})", checkpoint)
+        return filas_insertadas
+
+    def close(self):
+        self.connection.close()
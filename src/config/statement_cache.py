@@ -0,0 +1,169 @@
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .query_cache import normalizar_sql
+
+# Sentencias que merece la pena preparar (las DDL no se pueden)
+PATRON_PREPARABLE = re.compile(r'^\s*(?:select|insert|update|delete|with|values)\b', re.IGNORECASE)
+
+# Literales y marcadores de psycopg2: %s, %%, los con nombre %(x)s y cualquier otro %
+PATRON_MARCADOR = re.compile(r"'(?:[^']|'')*'|%%|%s|%\(|%")
+
+# SQLSTATE de los errores de preparación. Con la clase 42 (sintaxis, tipos que
+# PREPARE no puede deducir...) la sentencia no se vuelve a preparar; con
+# 26000 (sentencia preparada inexistente) y 0A000 (el plan guardado ya no
+# vale tras un cambio de esquema) solo se olvida lo preparado en la conexión.
+CLASE_NO_PREPARABLE = '42'
+ERRORES_SENTENCIA_PERDIDA = ('26000', '0A000')
+
+
+def es_error_de_preparacion(pgcode: Optional[str]) -> bool:
+    """
+    Indica si un error de PostgreSQL viene de preparar o ejecutar la sentencia
+    preparada, y no de la sentencia en sí (violaciones de restricciones,
+    bloqueos, timeouts...), que deben propagarse tal cual.
+    """
+    return bool(pgcode) and (pgcode.startswith(CLASE_NO_PREPARABLE) or pgcode in ERRORES_SENTENCIA_PERDIDA)
+
+
+def convertir_marcadores(sql: str) -> Optional[Tuple[str, int]]:
+    """
+    Pasa los `%s` de psycopg2 a los `$1, $2...` de PREPARE.
+
+    psycopg2 sustituye los marcadores también dentro de los literales, pero en
+    PREPARE un `$1` entre comillas es texto: una sentencia con `%` en algún
+    literal no se prepara, para que signifique lo mismo preparada o no.
+
+    Returns:
+        Optional[Tuple[str, int]]: Sentencia convertida y número de parámetros,
+        o None si usa parámetros con nombre, `%` en un literal u otro `%` suelto
+    """
+    partes, inicio, n = [], 0, 0
+    for marcador in PATRON_MARCADOR.finditer(sql):
+        texto = marcador.group()
+        if texto.startswith("'"):
+            if '%' in texto:
+                return None
+            continue
+        if texto not in ('%s', '%%'):
+            return None
+        partes.append(sql[inicio:marcador.start()])
+        if texto == '%%':
+            partes.append('%')
+        else:
+            n += 1
+            partes.append(f'${n}')
+        inicio = marcador.end()
+    partes.append(sql[inicio:])
+    return ''.join(partes).strip().rstrip(';'), n
+
+
+class StatementCache:
+    """
+    Sentencias preparadas (PREPARE/EXECUTE) por conexión del pool.
+
+    Una sentencia se prepara en una conexión la `preparar_tras`-ésima vez que
+    se usa; desde entonces esa conexión solo envía `EXECUTE nombre (params)` y
+    PostgreSQL reutiliza el análisis y el plan. Tras un cambio de esquema
+    (DDL) las conexiones descartan sus sentencias antes de volver a usarse.
+    """
+
+    def __init__(self, preparar_tras: int = 2, max_por_conexion: int = 100):
+        """
+        Args:
+            preparar_tras: Usos de una sentencia antes de prepararla
+            max_por_conexion: Sentencias preparadas por conexión (se descartan las menos usadas)
+        """
+        self.preparar_tras = preparar_tras
+        self.max_por_conexion = max_por_conexion
+        # conexión -> (generación del esquema, sentencia normalizada -> nombre)
+        self._conexiones: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+        self._usos: Dict[str, int] = {}
+        self._no_preparables = set()
+        self._generacion = 0
+        self._siguiente = 0
+        self._bloqueo = threading.Lock()
+        self.prepared = 0
+        self.executions = 0
+        self.deallocations = 0
+
+    def plan(self, connection, cursor, sql: str, params=None, usos: int = 1,
+             antes_de_preparar: Optional[Callable[[], None]] = None) -> Optional[str]:
+        """
+        Sentencia a ejecutar en lugar de `sql` (un EXECUTE con tantos `%s`
+        como parámetros), preparándola si hace falta; None para ejecutar `sql` tal cual.
+
+        Args:
+            usos: Veces que se va a ejecutar (executemany con varias filas cuenta cada una)
+            antes_de_preparar: Se llama justo antes de enviar el PREPARE
+        """
+        # Sin parámetros psycopg2 envía el texto tal cual, con sus `%`
+        if isinstance(params, dict) or (params is None and '%' in sql) or not PATRON_PREPARABLE.match(sql):
+            return None
+        clave = normalizar_sql(sql)
+        with self._bloqueo:
+            if clave in self._no_preparables:
+                return None
+            if len(self._usos) > 10_000:
+                self._usos.clear()
+            self._usos[clave] = self._usos.get(clave, 0) + usos
+            if self._usos[clave] < self.preparar_tras:
+                return None
+            generacion, nombres = self._conexiones.get(connection, (self._generacion, OrderedDict()))
+            self._siguiente += 1
+            candidato = f'stmt_{self._siguiente}'
+
+        if generacion != self._generacion:
+            cursor.execute('DEALLOCATE ALL')
+            self.deallocations += len(nombres)
+            generacion, nombres = self._generacion, OrderedDict()
+
+        if clave in nombres:
+            nombres.move_to_end(clave)
+            nombre, n = nombres[clave]
+        else:
+            convertida = convertir_marcadores(sql)
+            if convertida is None:
+                self._no_preparables.add(clave)
+                return None
+            texto, n = convertida
+            if antes_de_preparar is not None:
+                antes_de_preparar()
+            cursor.execute(f'PREPARE {candidato} AS {texto}')
+            nombre = candidato
+            nombres[clave] = (nombre, n)
+            self.prepared += 1
+            if len(nombres) > self.max_por_conexion:
+                _, (antiguo, _) = nombres.popitem(last=False)
+                cursor.execute(f'DEALLOCATE {antiguo}')
+                self.deallocations += 1
+        self._conexiones[connection] = (generacion, nombres)
+        self.executions += 1
+        return f"EXECUTE {nombre} ({', '.join(['%s'] * n)})" if n else f'EXECUTE {nombre}'
+
+    def discard(self, connection, sql: str, pgcode: Optional[str] = None):
+        """
+        Tras un error de preparación, olvida lo preparado en la conexión, que
+        se ha revertido, y, si la sentencia no se puede preparar (p. ej.
+        PREPARE no ha podido deducir los tipos), la marca como no preparable.
+        """
+        with self._bloqueo:
+            if pgcode not in ERRORES_SENTENCIA_PERDIDA:
+                self._no_preparables.add(normalizar_sql(sql))
+            # Tras el ROLLBACK no se sabe qué quedó preparado: se empieza de cero
+            self._conexiones[connection] = (self._generacion - 1, OrderedDict())
+
+    def invalidate(self):
+        """
+        Cambio de esquema: cada conexión descartará sus sentencias al volver a usarse.
+        """
+        with self._bloqueo:
+            self._generacion += 1
+            self._usos.clear()
+            self._no_preparables.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'prepared': self.prepared, 'executions': self.executions, 'deallocations': self.deallocations}
@@ -0,0 +1,399 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .database_conector import DatabaseConnector
+
+# Este módulo no importa psycopg2 ni pandas al cargarse: el motor elegido
+# (PostgreSQL o SQLite) solo importa lo suyo al abrirse.
+
+# Tabla de movimientos por defecto
+TABLA_GASTOS = 'gastos_2025'
+
+# Columnas de la tabla de movimientos, en el orden de inserción
+COLUMNAS_GASTOS = [
+    'Fecha_Operacion',
+    'Concepto',
+    'Fecha_Valor',
+    'Importe',
+    'Saldo',
+    'Referencia_1',
+    'Referencia_2',
+    'Cuenta_Id'
+]
+
+# Importes que entran y salen del almacén como céntimos enteros
+COLUMNAS_CENTIMOS = ['Importe', 'Saldo']
+COLUMNAS_FECHA = ['Fecha_Operacion', 'Fecha_Valor']
+
+# Tabla de control de las cargas por lotes: un punto de control por fichero y lote
+TABLA_CONTROL = 'cargas_control'
+COLUMNAS_CONTROL = ['tabla', 'archivo', 'huella', 'lote', 'fila_hasta', 'filas']
+
+# Agrupaciones de StorageBackend.totals
+AGRUPACIONES = ('dia', 'mes', 'concepto', 'cuenta')
+
+
+class StorageBackend(ABC):
+    """
+    Almacén de los movimientos cargados.
+
+    La carga (etl/DB_Gastos.py) y el análisis (viz/) solo usan estos métodos,
+    así que funcionan igual contra PostgreSQL que contra un fichero SQLite
+    local. Los importes se reciben y se devuelven en céntimos enteros y las
+    consultas de periodos y agregados son las mismas en los dos motores; cada
+    uno solo aporta su dialecto (marcadores, fechas, céntimos).
+    """
+
+    nombre = ''
+
+    # --- Dialecto de cada motor -------------------------------------------
+
+    # Marcador de parámetro de la librería cliente
+    marcador = '%s'
+
+    @abstractmethod
+    def _dataframe(self, sql: str, params: tuple = ()) -> 'pd.DataFrame':
+        """Ejecuta una lectura y devuelve el resultado como DataFrame."""
+
+    @abstractmethod
+    def _centimos(self, expresion: str) -> str:
+        """Expresión SQL que pasa un importe guardado a céntimos enteros."""
+
+    @abstractmethod
+    def _periodo(self, agrupacion: str) -> str:
+        """Expresión SQL 'YYYY-MM-DD' (dia) o 'YYYY-MM' (mes) de Fecha_Operacion."""
+
+    @abstractmethod
+    def _fecha(self, valor) -> Any:
+        """Parámetro de fecha en el formato que compara el motor."""
+
+    def _en(self, valores: List[Any]) -> Tuple[str, list]:
+        """Condición `IN` y sus parámetros para una lista de valores."""
+        return f"IN ({', '.join([self.marcador] * len(valores))})", list(valores)
+
+    # --- Operaciones ------------------------------------------------------
+
+    @abstractmethod
+    def version(self) -> str:
+        """Versión del motor, para comprobar la conexión."""
+
+    @abstractmethod
+    def create_tables(self):
+        """Crea (o actualiza) las tablas cuentas y gastos_2025 y sus índices."""
+
+    @abstractmethod
+    def load_accounts(self) -> Dict[str, int]:
+        """Registro IBAN -> clave entera de las cuentas ya guardadas."""
+
+    @abstractmethod
+    def save_accounts(self, accounts: List[tuple]) -> int:
+        """
+        Guarda cuentas (id, iban, titular); si ya existen, completa el titular.
+
+        Returns:
+            int: Número de cuentas insertadas o actualizadas
+        """
+
+    @abstractmethod
+    def insert_movements(self, table: str, df: 'pd.DataFrame', rows_per_batch: int) -> int:
+        """
+        Inserta movimientos con las columnas de COLUMNAS_GASTOS (importes en céntimos).
+
+        Args:
+            table: Tabla destino
+            df: Movimientos en el orden de COLUMNAS_GASTOS
+            rows_per_batch: Filas convertidas a tuplas en cada lote (acota la memoria)
+
+        Returns:
+            int: Número de filas insertadas
+        """
+
+    @abstractmethod
+    def insert_batch(self, table: str, df: 'pd.DataFrame', checkpoint: tuple) -> int:
+        """
+        Inserta un lote de movimientos y su punto de control en TABLA_CONTROL
+        en la misma transacción: si el lote no llega a confirmarse, tampoco
+        queda el punto de control.
+
+        Args:
+            table: Tabla destino
+            df: Movimientos del lote en el orden de COLUMNAS_GASTOS
+            checkpoint: Valores de COLUMNAS_CONTROL del lote
+
+        Returns:
+            int: Número de filas insertadas
+        """
+
+    @contextmanager
+    def bulk_load(self, table: str, rows: int) -> Iterator[None]:
+        """
+        Envuelve una carga de `rows` filas en varias llamadas a insert_batch
+        para que el motor la prepare una sola vez (por ejemplo, quitando los
+        índices durante una carga inicial grande). Por defecto no hace nada.
+        """
+        yield
+
+    def checkpoints(self, table: str) -> 'pd.DataFrame':
+        """
+        Progreso de las cargas por lotes en una tabla: por fichero (y huella de
+        su contenido), último lote, última fila confirmada y filas cargadas.
+        """
+        return self._tipar(self._dataframe(f"""
+        SELECT archivo, huella, MAX(lote) AS lote, MAX(fila_hasta) AS fila_hasta, SUM(filas) AS filas
+        FROM {TABLA_CONTROL}
+        WHERE tabla = {self.marcador}
+        GROUP BY archivo, huella
+        """, (table,)))
+
+    def count_movements(self, table: str, accounts: Optional[List[int]] = None, start=None, end=None) -> int:
+        """
+        Número de movimientos guardados en la tabla o, con `accounts`, solo los
+        de esas cuentas entre dos fechas (incluidas), que usa el índice por
+        cuenta y fecha en lugar de recorrer la tabla.
+        """
+        if accounts is None:
+            return int(self._dataframe(f"SELECT COUNT(*) AS filas FROM {table}")['filas'].iloc[0])
+        condicion, params = self._en(accounts)
+        return int(self._dataframe(f"""
+        SELECT COUNT(*) AS filas FROM {table}
+        WHERE Cuenta_Id {condicion} AND Fecha_Operacion BETWEEN {self.marcador} AND {self.marcador}
+        """, tuple(params) + (self._fecha(start), self._fecha(end)))['filas'].iloc[0])
+
+    def existing_movements(self, table: str, accounts: List[int], start, end) -> 'pd.DataFrame':
+        """
+        Clave natural (cuenta, fecha, concepto, importe, saldo) de los
+        movimientos guardados de unas cuentas entre dos fechas (incluidas).
+        """
+        condicion, params = self._en(accounts)
+        return self._tipar(self._dataframe(f"""
+        SELECT Cuenta_Id AS cuenta, Fecha_Operacion AS fecha, Concepto AS concepto,
+               {self._centimos('Importe')} AS importe, {self._centimos('Saldo')} AS saldo
+        FROM {table}
+        WHERE Cuenta_Id {condicion} AND Fecha_Operacion BETWEEN {self.marcador} AND {self.marcador}
+        """, tuple(params) + (self._fecha(start), self._fecha(end))))
+
+    def movements(self, start, end, table: str = TABLA_GASTOS) -> 'pd.DataFrame':
+        """
+        Movimientos con fecha de operación en [start, end), ordenados por fecha.
+
+        Returns:
+            pd.DataFrame: Columnas de la tabla en minúsculas; importe y saldo en céntimos
+        """
+        return self._tipar(self._dataframe(f"""
+        SELECT id, Fecha_Operacion AS fecha_operacion, Concepto AS concepto, Fecha_Valor AS fecha_valor,
+               {self._centimos('Importe')} AS importe, {self._centimos('Saldo')} AS saldo,
+               Referencia_1 AS referencia_1, Referencia_2 AS referencia_2, Cuenta_Id AS cuenta_id
+        FROM {table}
+        WHERE Fecha_Operacion >= {self.marcador} AND Fecha_Operacion < {self.marcador}
+        ORDER BY Fecha_Operacion, id
+        """, (self._fecha(start), self._fecha(end))))
+
+    def totals(self, start, end, by: str = 'dia', table: str = TABLA_GASTOS) -> 'pd.DataFrame':
+        """
+        Número de movimientos, ingresos, gastos y neto (céntimos) por día, mes,
+        concepto o cuenta, con fecha de operación en [start, end).
+
+        Returns:
+            pd.DataFrame: Columnas `by`, movimientos, ingresos, gastos y total
+        """
+        if by not in AGRUPACIONES:
+            raise ValueError(f"Agrupación no válida: {by} ({', '.join(AGRUPACIONES)})")
+        clave = {'concepto': 'Concepto', 'cuenta': 'Cuenta_Id'}.get(by) or self._periodo(by)
+        totales = self._tipar(self._dataframe(f"""
+        SELECT {clave} AS {by}, COUNT(*) AS movimientos,
+               {self._centimos('SUM(CASE WHEN Importe > 0 THEN Importe ELSE 0 END)')} AS ingresos,
+               {self._centimos('SUM(CASE WHEN Importe < 0 THEN Importe ELSE 0 END)')} AS gastos,
+               {self._centimos('SUM(Importe)')} AS total
+        FROM {table}
+        WHERE Fecha_Operacion >= {self.marcador} AND Fecha_Operacion < {self.marcador}
+        GROUP BY {clave}
+        """, (self._fecha(start), self._fecha(end))))
+        if by in ('dia', 'mes'):
+            import pandas as pd
+            totales[by] = pd.to_datetime(totales[by], format='%Y-%m-%d' if by == 'dia' else '%Y-%m')
+        # Se ordena aquí y no con ORDER BY: la intercalación de los textos depende del motor
+        return totales.sort_values(by, kind='mergesort', ignore_index=True)
+
+    def _tipar(self, df: 'pd.DataFrame') -> 'pd.DataFrame':
+        """
+        Mismos tipos con los dos motores: fechas datetime64, enteros int64
+        (Int64 si hay nulos) y textos str.
+        """
+        import pandas as pd
+
+        for columna in df.columns:
+            if columna.startswith('fecha'):
+                df[columna] = pd.to_datetime(df[columna], format='ISO8601')
+            elif columna in ('id', 'cuenta', 'cuenta_id', 'importe', 'saldo', 'movimientos',
+                             'ingresos', 'gastos', 'total', 'lote', 'fila_hasta', 'filas'):
+                if df[columna].dtype.kind != 'i':
+                    df[columna] = df[columna].astype('Int64')
+            elif df[columna].dtype == object:
+                # Los NULL siguen siendo nulos (con pandas 2, astype('str') los pasaría a 'None')
+                df[columna] = df[columna].astype('str').where(df[columna].notna())
+        return df
+
+    def close(self):
+        """Libera las conexiones del motor."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class PostgresStorage(StorageBackend):
+    """
+    Almacén sobre PostgreSQL a través de DatabaseConnector (pool, cachés y
+    COPY para leer DataFrames).
+    """
+
+    nombre = 'postgres'
+
+    def __init__(self, db: 'DatabaseConnector'):
+        """
+        Args:
+            db: Conector a la base de datos configurada en .env
+        """
+        self.db = db
+
+    def _dataframe(self, sql: str, params: tuple = ()) -> 'pd.DataFrame':
+        return self.db.query_to_dataframe(sql, params)
+
+    def _centimos(self, expresion: str) -> str:
+        return f"({expresion} * 100)::bigint"
+
+    def _periodo(self, agrupacion: str) -> str:
+        return f"to_char(Fecha_Operacion, '{'YYYY-MM-DD' if agrupacion == 'dia' else 'YYYY-MM'}')"
+
+    def _fecha(self, valor) -> Any:
+        import pandas as pd
+        return pd.Timestamp(valor).to_pydatetime()
+
+    def _en(self, valores: List[Any]) -> Tuple[str, list]:
+        # Un solo parámetro (array): la sentencia es la misma con cualquier número de cuentas
+        return f"= ANY({self.marcador})", [list(valores)]
+
+    def version(self) -> str:
+        return self.db.execute_query("SELECT version();")[0]['version']
+
+    def create_tables(self):
+        self.db.execute_command("""
+        CREATE TABLE IF NOT EXISTS cuentas (
+            id SMALLINT PRIMARY KEY NOT NULL,
+            iban VARCHAR(34) UNIQUE,
+            titular VARCHAR(255)
+        );
+        """)
+        self.db.execute_command("""
+        INSERT INTO cuentas (id, iban, titular) VALUES (0, NULL, 'Cuenta desconocida')
+        ON CONFLICT (id) DO NOTHING;
+        """)
+        self.db.execute_command("""
+        CREATE TABLE IF NOT EXISTS gastos_2025 (
+            id SERIAL PRIMARY KEY NOT NULL,
+            Fecha_Operacion TIMESTAMP NOT NULL,
+            Concepto VARCHAR(255),
+            Fecha_Valor TIMESTAMP,
+            Importe DECIMAL(10, 2),
+            Saldo DECIMAL(10, 2),
+            Referencia_1 VARCHAR(255),
+            Referencia_2 VARCHAR(255),
+            Cuenta_Id SMALLINT NOT NULL DEFAULT 0 REFERENCES cuentas (id)
+        );
+        """)
+        # Tablas creadas antes de añadir la cuenta: se asignan a la cuenta desconocida
+        self.db.execute_command("""
+        ALTER TABLE gastos_2025 ADD COLUMN IF NOT EXISTS Cuenta_Id SMALLINT NOT NULL DEFAULT 0 REFERENCES cuentas (id);
+        """)
+        self.db.execute_command("""
+        CREATE INDEX IF NOT EXISTS idx_gastos_2025_cuenta_fecha ON gastos_2025 (Cuenta_Id, Fecha_Operacion);
+        """)
+        self.db.execute_command(f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_CONTROL} (
+            tabla VARCHAR(63) NOT NULL,
+            archivo VARCHAR(255) NOT NULL,
+            huella VARCHAR(40) NOT NULL,
+            lote INTEGER NOT NULL,
+            fila_hasta BIGINT NOT NULL,
+            filas INTEGER NOT NULL,
+            cargado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (tabla, archivo, huella, lote)
+        );
+        """)
+
+    def load_accounts(self) -> Dict[str, int]:
+        filas = self.db.execute_query("SELECT id, iban FROM cuentas WHERE iban IS NOT NULL;")
+        return {fila['iban']: fila['id'] for fila in filas}
+
+    def save_accounts(self, accounts: List[tuple]) -> int:
+        if not accounts:
+            return 0
+        return self.db.execute_many("""
+        INSERT INTO cuentas (id, iban, titular) VALUES (%s, %s, %s)
+        ON CONFLICT (id) DO UPDATE SET titular = COALESCE(EXCLUDED.titular, cuentas.titular);
+        """, accounts)
+
+    @staticmethod
+    def _insert_command(table: str) -> str:
+        # Los importes viajan como enteros: PostgreSQL calcula el NUMERIC exacto
+        # sin crear un Decimal por valor en Python
+        placeholders = ', '.join('%s::bigint / 100.0' if c in COLUMNAS_CENTIMOS else '%s' for c in COLUMNAS_GASTOS)
+        return f"""
+        INSERT INTO {table} ({', '.join(COLUMNAS_GASTOS)})
+        VALUES ({placeholders})
+        """
+
+    def insert_movements(self, table: str, df: 'pd.DataFrame', rows_per_batch: int) -> int:
+        insert_command = self._insert_command(table)
+        filas_insertadas = 0
+        for inicio in range(0, len(df), rows_per_batch):
+            lote = df.iloc[inicio:inicio + rows_per_batch]
+            lote = lote.astype(object).where(lote.notna(), None)
+            filas_insertadas += self.db.execute_many(insert_command, [tuple(row) for row in lote.values])
+        return filas_insertadas
+
+    def insert_batch(self, table: str, df: 'pd.DataFrame', checkpoint: tuple) -> int:
+        lote = df.astype(object).where(df.notna(), None)
+        filas_insertadas, _ = self.db.execute_transaction([
+            (self._insert_command(table), [tuple(row) for row in lote.values]),
+            (f"INSERT INTO {TABLA_CONTROL} ({', '.join(COLUMNAS_CONTROL)}) "
+             f"VALUES ({', '.join(['%s'] * len(COLUMNAS_CONTROL))})", [checkpoint]),
+        ])
+        return filas_insertadas
+
+    def close(self):
+        self.db.close_pool()
+
+
+def como_almacen(db) -> StorageBackend:
+    """
+    Acepta un almacén o un DatabaseConnector (que se envuelve en PostgresStorage).
+    """
+    return db if isinstance(db, StorageBackend) else PostgresStorage(db)
+
+
+def abrir_almacen(configuracion=None) -> StorageBackend:
+    """
+    Abre el almacén elegido en la configuración de ejecución (base_datos.motor
+    en config.yaml o DB_MOTOR): PostgreSQL según .env o un fichero SQLite.
+
+    Args:
+        configuracion: RuntimeConfig (por defecto, la de config.yaml y el entorno)
+
+    Returns:
+        StorageBackend: Almacén listo para usar (también como context manager)
+    """
+    if configuracion is None:
+        from etl.runtime_config import cargar_configuracion
+        configuracion = cargar_configuracion()
+    if configuracion.motor_bd == 'sqlite':
+        from .sqlite_storage import SQLiteStorage
+        return SQLiteStorage(configuracion.ruta_sqlite)
+    from .database_conector import DatabaseConnector
+    return PostgresStorage(DatabaseConnector(min_connections=configuracion.db_min_conexiones,
+                                             max_connections=configuracion.db_max_conexiones))
@@ -1,58 +1,66 @@
-from src.config.database_conector import DatabaseConnector
+import hashlib
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
-import sys
-from pathlib import Path
-from .load_data import LoadData
-from .transform_data import TransformData
+from typing import List, Dict, Any, Optional, Union, TYPE_CHECKING
+from config.storage import COLUMNAS_CENTIMOS, COLUMNAS_GASTOS, StorageBackend, abrir_almacen, como_almacen
+from .anomaly_data import AnomalyData
+from .dinero import a_centimos
+from .duplicate_data import DuplicateData
+from .load_data import COLUMNAS_ORIGEN, LoadData
+from .pipeline import COLUMNAS, crear_cargador, guardar_cuentas, ingestar
+from .runtime_config import RuntimeConfig, cargar_configuracion
 
-# Agregar el directorio src al path para importaciones
-sys.path.append(str(Path(__file__).parent))
+if TYPE_CHECKING:
+    from config.database_conector import DatabaseConnector
 
-# Directorio de datos
-data_dir = Path("D:\WORKSPACE\data-gastos-pipeline\data")
 # Definir columnas esperadas en los datos
-columns = [
-    'Fecha_Operacion', 
-    'Concepto', 
-    'Fecha_Valor', 
-    'Importe', 
-    'Saldo', 
-    'Referencia_1',
-    'Referencia_2'
-]
-loader = LoadData()
-transformer = TransformData()
-
-def cargar_dataframe_a_tabla(df: pd.DataFrame, tabla: str, db: DatabaseConnector) -> bool:
-    """
-    Carga un DataFrame a una tabla de PostgreSQL.
+columns = COLUMNAS_GASTOS
+
+# Columna del DataFrame del pipeline -> columna de la tabla
+COLUMNAS_BD = dict(zip(COLUMNAS + ['Cuenta_Id'], columns))
+
+# Filas por lote de inserción si no se indica otra cosa (ver RuntimeConfig.tamano_lote_bd)
+FILAS_POR_LOTE = 10_000
+
+# Las funciones de carga aceptan un almacén (PostgreSQL o SQLite, ver
+# config/storage.py) o directamente un DatabaseConnector
+Almacen = Union[StorageBackend, 'DatabaseConnector']
+
+def _columnas_tabla(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Columnas en el orden de la tabla, con los importes en céntimos enteros.
+    """
+    df = df.rename(columns=COLUMNAS_BD)[columns]
+    return df.assign(**{c: a_centimos(df[c]) for c in COLUMNAS_CENTIMOS})
+
+
+def cargar_dataframe_a_tabla(df: pd.DataFrame, tabla: str, db: Almacen,
+                             filas_por_lote: int = FILAS_POR_LOTE,
+                             huellas: Optional[Dict[str, str]] = None) -> bool:
+    """
+    Carga un DataFrame a la tabla de movimientos del almacén.
+
+    Con `huellas` (y las columnas de origen de LoadData) la carga va por lotes
+    confirmados uno a uno, con un punto de control por fichero y lote (ver
+    cargar_por_lotes): si falla a medias, lo confirmado se queda y la
+    siguiente ejecución sigue desde ahí.
     
     Args:
         df: DataFrame de pandas a cargar
         tabla: Nombre de la tabla destino
-        db: Instancia de DatabaseConnector
+        db: Almacén (o DatabaseConnector de PostgreSQL)
+        filas_por_lote: Filas convertidas a tuplas y enviadas en cada lote,
+            para acotar la memoria con DataFrames grandes
+        huellas: Huella de cada fichero de origen (ver huellas_archivos)
         
     Returns:
         bool: True si se cargó exitosamente
     """
     try:
-        # Preparar los datos para inserción
-        columnas = columns
-        placeholders = ', '.join(['%s'] * len(columnas))
-        columnas_str = ', '.join(columnas)
-        
-        # Crear comando INSERT
-        insert_command = f"""
-        INSERT INTO {tabla} ({columnas_str})
-        VALUES ({placeholders})
-        """
-        
-        # Convertir DataFrame a lista de tuplas
-        datos = [tuple(row) for row in df.values]
-        
-        # Insertar datos
-        filas_insertadas = db.execute_many(insert_command, datos)
+        if huellas is not None:
+            filas_insertadas = cargar_por_lotes(df, tabla, db, huellas, filas_por_lote)
+        else:
+            filas_insertadas = como_almacen(db).insert_movements(tabla, _columnas_tabla(df), filas_por_lote)
         print(f"✅ {filas_insertadas} filas insertadas en la tabla {tabla}")
         return True
         
@@ -61,55 +69,276 @@ def cargar_dataframe_a_tabla(df: pd.DataFrame, tabla: str, db: DatabaseConnector
         return False
 
 
-try:
-    with DatabaseConnector() as db:
-        # Probar conexión básica
-        result = db.execute_query("SELECT version();")
-        print("✅ Conexión exitosa!")
-        print(f"📋 Versión de PostgreSQL: {result[0]['version']}")
+def huellas_archivos(df: pd.DataFrame) -> Dict[str, str]:
+    """
+    Huella (SHA-1) de las filas de cada fichero de origen tal como llegan a
+    la carga: los puntos de control de una exportación no valen para otra
+    distinta con el mismo nombre.
+    """
+    archivo, fila = COLUMNAS_ORIGEN
+    contenido = df[[c for c in COLUMNAS_BD if c in df.columns] + [fila]]
+    hashes = pd.util.hash_pandas_object(contenido, index=False).to_numpy()
+    return {nombre: hashlib.sha1(hashes[posiciones].tobytes()).hexdigest()
+            for nombre, posiciones in df.groupby(archivo, sort=False).indices.items()}
 
-        # Crear tabla de gastos
-        if db.table_exists('gastos_2025'):
-            print("✅ Tabla gastos_2025 ya existe")
-        else:
-            db.execute_command("""
-            CREATE TABLE IF NOT EXISTS gastos_2025 (
-                id SERIAL PRIMARY KEY NOT NULL,
-                Fecha_Operacion TIMESTAMP NOT NULL, 
-                Concepto VARCHAR(255), 
-                Fecha_Valor TIMESTAMP, 
-                Importe DECIMAL(10, 2), 
-                Saldo DECIMAL(10, 2), 
-                Referencia_1 VARCHAR(255),
-                Referencia_2 VARCHAR(255)
-            );
-            """)
-            print("✅ Tabla gastos_2025 creada exitosamente")
-
-
-        for file_path in data_dir.glob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in ['.csv', '.txt', '.xls', '.xlsx']:
-                print(f"📋 Procesando archivo: {file_path}")
-                
-                # Cargar datos del archivo
-                gastos_2025 = loader.load(str(file_path))
-                # Aplicar transformaciones básicas
-                df_clean = transformer.eliminar_duplicados(gastos_2025)
-                df_clean = transformer.transformar_campos(df_clean, 0, 'datetime')
-                df_clean = transformer.transformar_campos(df_clean, 1, 'text')
-                df_clean = transformer.transformar_campos(df_clean, 2, 'datetime')
-                df_clean = transformer.transformar_campos(df_clean, 3, 'float')
-                df_clean = transformer.transformar_campos(df_clean, 4, 'float')
-                df_clean = transformer.transformar_campos(df_clean, 5 ,'text')
-                df_clean = transformer.transformar_campos(df_clean, 6 ,'text')
-                df_clean = transformer.eliminar_duplicados(df_clean)
-                # df_clean = transformer.limpiar_dataframe_para_carga(df_clean)
-                
-                # Agregar al DataFrame acumulado
-                # argar_dataframe_a_tabla(df_clean, 'gastos_2025', db)
-    
 
-except Exception as e:
-    print(f"❌ Error de conexión: {e}")
+def _progreso(almacen: StorageBackend, tabla: str, huellas: Dict[str, str]) -> pd.DataFrame:
+    """
+    Puntos de control de la tabla que corresponden a los ficheros de `huellas`
+    (por nombre de fichero).
+    """
+    control = almacen.checkpoints(tabla)
+    vigentes = control['huella'].to_numpy() == control['archivo'].map(huellas).to_numpy()
+    return control[vigentes].set_index('archivo')
+
+
+def pendientes_de_carga(df: pd.DataFrame, tabla: str, db: Almacen, huellas: Dict[str, str]) -> pd.DataFrame:
+    """
+    Quita las filas que ya confirmó una carga por lotes anterior del mismo
+    fichero (con la misma huella): todas hasta la última fila de su último
+    punto de control, sin tener que leerlas de la tabla.
+
+    Si la tabla tiene, en las cuentas y fechas de esos ficheros, menos filas
+    de las que recogen sus puntos de control (se ha vaciado o borrado a
+    mano), no se usan: filtrar_ya_cargados evita igualmente los duplicados.
+    """
+    archivo, fila = COLUMNAS_ORIGEN
+    almacen = como_almacen(db)
+    progreso = _progreso(almacen, tabla, huellas)
+    if progreso.empty:
+        return df
+    # Recuento acotado a las cuentas y fechas de los ficheros con progreso (por índice)
+    con_progreso = df[df[archivo].isin(progreso.index)]
+    fechas = pd.to_datetime(con_progreso['Fecha Operación'])
+    cuentas = sorted(int(c) for c in con_progreso['Cuenta_Id'].unique())
+    if almacen.count_movements(tabla, cuentas, fechas.min(), fechas.max()) < progreso['filas'].sum():
+        print(f"⚠️ {tabla} tiene menos filas que sus puntos de control: se carga sin reanudar")
+        return df
+    hasta = df[archivo].map(progreso['fila_hasta']).fillna(-1).to_numpy()
+    pendientes = df[df[fila].to_numpy() > hasta]
+    print(f"⏩ {len(df) - len(pendientes)} movimientos confirmados en cargas anteriores "
+          f"({', '.join(f'{a}: lote {l}' for a, l in progreso['lote'].items())})")
+    return pendientes
+
+
+def cargar_por_lotes(df: pd.DataFrame, tabla: str, db: Almacen, huellas: Dict[str, str],
+                     filas_por_lote: int = FILAS_POR_LOTE) -> int:
+    """
+    Inserta los movimientos fichero a fichero, en el orden de sus filas y en
+    lotes de `filas_por_lote` filas. Cada lote se confirma junto con su punto
+    de control (tabla, fichero, huella, lote, última fila y filas) en la
+    tabla de control; los lotes siguen la numeración de cargas anteriores.
+
+    Al terminar se comprueba que cada lote ha insertado todas sus filas y
+    que la tabla de control recoge exactamente los lotes y filas de esta
+    carga. No se cuenta la tabla entera: sería un recorrido completo en
+    PostgreSQL y fallaría si otra carga (watch) escribe a la vez.
+
+    Returns:
+        int: Número de filas insertadas
+
+    Raises:
+        RuntimeError: Si los recuentos no cuadran
+    """
+    archivo, fila = COLUMNAS_ORIGEN
+    almacen = como_almacen(db)
+    previo = _progreso(almacen, tabla, huellas)
+
+    enviadas, lotes, insertadas = {}, {}, 0
+    # Una carga inicial grande puede ir sin índices (SQLite): se quitan una vez
+    # para todos los lotes, no en cada uno
+    with almacen.bulk_load(tabla, len(df)):
+        for nombre, grupo in df.groupby(archivo, sort=False):
+            grupo = grupo.sort_values(fila, kind='stable')
+            filas_origen = grupo[fila].to_numpy()
+            datos = _columnas_tabla(grupo)
+            lote = int(previo['lote'].get(nombre, 0))
+            for inicio in range(0, len(grupo), filas_por_lote):
+                fin = min(inicio + filas_por_lote, len(grupo))
+                lote += 1
+                punto_control = (tabla, nombre, huellas[nombre], lote, int(filas_origen[fin - 1]), fin - inicio)
+                insertadas += almacen.insert_batch(tabla, datos.iloc[inicio:fin], punto_control)
+            enviadas[nombre], lotes[nombre] = len(grupo), lote
+            print(f"💾 {nombre}: {len(grupo)} filas confirmadas (hasta el lote {lote})")
+
+    # Recuentos: lo insertado y la tabla de control frente a lo enviado
+    if insertadas != sum(enviadas.values()):
+        raise RuntimeError(f"Se insertaron {insertadas} filas en {tabla} y se enviaron {sum(enviadas.values())}")
+    control = _progreso(almacen, tabla, huellas)
+    for nombre, filas in enviadas.items():
+        esperadas = int(previo['filas'].get(nombre, 0)) + filas
+        registradas = int(control['filas'].get(nombre, 0))
+        if registradas != esperadas or int(control['lote'].get(nombre, 0)) != lotes[nombre]:
+            raise RuntimeError(f"Puntos de control de {nombre}: {registradas} filas hasta el lote "
+                               f"{int(control['lote'].get(nombre, 0))}, se esperaban {esperadas} hasta el {lotes[nombre]}")
+    return insertadas
+
+
+def crear_tablas(db: Almacen):
+    """
+    Crea (o actualiza) las tablas cuentas y gastos_2025 con la clave de cuenta
+    y los índices para las consultas por cuenta y fecha.
+    """
+    como_almacen(db).create_tables()
+
+
+def cargar_cuentas(db: Almacen) -> Dict[str, int]:
+    """
+    Devuelve el registro IBAN -> clave entera de las cuentas ya guardadas.
+    """
+    return como_almacen(db).load_accounts()
+
+
+def registrar_cuentas(db: Almacen, cargador: LoadData) -> int:
+    """
+    Guarda en la tabla cuentas las cuentas detectadas por el cargador.
+
+    Returns:
+        int: Número de cuentas insertadas o actualizadas
+    """
+    datos = [(cuenta_id, iban, cargador.titulares.get(cuenta_id)) for iban, cuenta_id in cargador.cuentas.items()]
+    return como_almacen(db).save_accounts(datos)
+
+
+def _claves_movimiento(cuenta, fecha, concepto, importe, saldo) -> np.ndarray:
+    """
+    Hash de la clave natural de cada movimiento (cuenta, fecha, concepto,
+    importe y saldo), calculado igual para el DataFrame y para la tabla.
+    """
+    nulo = np.iinfo(np.int64).min
+    claves = pd.DataFrame({
+        'cuenta': pd.Series(cuenta).astype('int64').to_numpy(),
+        'fecha': pd.to_datetime(pd.Series(fecha)).to_numpy(dtype='datetime64[s]').astype(np.int64),
+        'concepto': pd.Series(concepto).astype(object).fillna('').astype(str).to_numpy(dtype=object),
+        'importe': a_centimos(pd.Series(importe)).to_numpy(dtype=np.int64, na_value=nulo),
+        'saldo': a_centimos(pd.Series(saldo)).to_numpy(dtype=np.int64, na_value=nulo),
+    })
+    return pd.util.hash_pandas_object(claves, index=False).to_numpy()
+
+
+def filtrar_ya_cargados(df: pd.DataFrame, tabla: str, db: Almacen) -> pd.DataFrame:
+    """
+    Quita del DataFrame los movimientos que ya están en la tabla, para que
+    volver a cargar una exportación (o una que solapa con otra) no duplique filas.
+    También los que están guardados con un concepto algo distinto (ver DuplicateData).
+
+    Solo se leen de la tabla las cuentas y el rango de fechas del DataFrame.
+    """
+    if df.empty:
+        return df
+    fechas = pd.to_datetime(df['Fecha Operación'])
+    cuentas = sorted(int(c) for c in df['Cuenta_Id'].unique())
+    existentes = como_almacen(db).existing_movements(tabla, cuentas, fechas.min(), fechas.max())
+    if existentes.empty:
+        return df
+
+    en_tabla = _claves_movimiento(existentes['cuenta'], existentes['fecha'], existentes['concepto'],
+                                  existentes['importe'], existentes['saldo'])
+    claves = _claves_movimiento(df['Cuenta_Id'], fechas, df['Concepto'], df['Importe'], df['Saldo'])
+    nuevos = df[~np.isin(claves, en_tabla)]
+    # Los que ya están guardados con el concepto algo distinto (exportaciones solapadas)
+    nuevos, _ = DuplicateData().filtrar_existentes(nuevos, existentes.rename(columns={
+        'cuenta': 'Cuenta_Id', 'fecha': 'Fecha Operación', 'concepto': 'Concepto',
+        'importe': 'Importe', 'saldo': 'Saldo'}))
+    print(f"🔁 {len(df) - len(nuevos)} movimientos ya estaban en {tabla}")
+    return nuevos
+
+
+def cargar_movimientos(df: pd.DataFrame, tabla: str, db: Almacen, cargador: LoadData,
+                       filas_por_lote: int = FILAS_POR_LOTE) -> pd.DataFrame:
+    """
+    Registra las cuentas del cargador y carga en la tabla los movimientos que
+    aún no estaban.
+
+    Si los movimientos traen su fichero de origen (LoadData con
+    incluir_origen=True), la carga es por lotes con puntos de control: tras
+    un fallo, volver a llamarla con los mismos datos continúa desde el
+    último lote confirmado de cada fichero.
+
+    Returns:
+        pd.DataFrame: Movimientos insertados (vacío si no había ninguno nuevo)
+
+    Raises:
+        RuntimeError: Si la inserción falla
+    """
+    registrar_cuentas(db, cargador)
+    huellas = None
+    if set(COLUMNAS_ORIGEN) <= set(df.columns) and not df.empty:
+        huellas = huellas_archivos(df)
+        df = pendientes_de_carga(df, tabla, db, huellas)
+    nuevos = filtrar_ya_cargados(df, tabla, db)
+    if nuevos.empty:
+        print(f"⚠️ No hay movimientos nuevos para {tabla}")
+        return nuevos
+    if not cargar_dataframe_a_tabla(nuevos, tabla, db, filas_por_lote, huellas):
+        raise RuntimeError(f"No se han podido cargar los movimientos en {tabla}")
+    return nuevos
+
+
+def cargar_directorio(db: Almacen, data_dir=None, tabla: str = 'gastos_2025',
+                      configuracion: Optional[RuntimeConfig] = None, directorio_cache=None) -> bool:
+    """
+    Ingesta todas las exportaciones del directorio de datos y las carga en la tabla.
+
+    Args:
+        db: Almacén (o DatabaseConnector de PostgreSQL)
+        data_dir: Directorio de exportaciones
+        tabla: Nombre de la tabla destino
+        configuracion: Configuración de ejecución (modo de ingesta y tamaño de los lotes)
+        directorio_cache: Caché del registro de cuentas, los libros Excel y el estado de
+            anomalías (por defecto, la de la configuración)
+
+    Returns:
+        bool: True si se cargó exitosamente
+    """
+    # Crear tablas de cuentas y gastos
+    crear_tablas(db)
+    print("✅ Tablas cuentas y gastos_2025 preparadas")
+
+    # Reutilizar las claves de cuenta ya registradas
+    configuracion = configuracion or cargar_configuracion()
+    directorio_cache = directorio_cache or configuracion.directorio_cache
+    loader = crear_cargador(directorio_cache, cuentas=cargar_cuentas(db))
+    df_clean = ingestar(data_dir, loader=loader, configuracion=configuracion)
+    if df_clean.empty:
+        print("⚠️ No hay movimientos que cargar")
+        return True
+
+    try:
+        nuevos = cargar_movimientos(df_clean, tabla, db, loader, configuracion.tamano_lote_bd())
+    except RuntimeError:
+        return False
+    guardar_cuentas(loader)
+    if nuevos.empty:
+        return True
+
+    # Puntuar los movimientos recién insertados para tener las anomalías nada más cargar
+    anomalias = AnomalyData(directorio_cache=directorio_cache).procesar(nuevos)
+    print(f"🚨 Movimientos inusuales en esta carga: {len(anomalias)} (python -m src anomalies)")
+    return True
+
+
+def main(data_dir=None, configuracion: Optional[RuntimeConfig] = None, directorio_cache=None) -> bool:
+    """
+    Abre el almacén configurado (PostgreSQL según .env o SQLite, ver
+    base_datos.motor en config.yaml) y carga las exportaciones.
+    """
+    configuracion = configuracion or cargar_configuracion()
+    try:
+        with abrir_almacen(configuracion) as almacen:
+            # Probar conexión básica
+            version = almacen.version()
+            print("✅ Conexión exitosa!")
+            print(f"📋 Versión de la base de datos: {version}")
+
+            return cargar_directorio(almacen, data_dir, configuracion=configuracion,
+                                     directorio_cache=directorio_cache)
+
+    except Exception as e:
+        print(f"❌ Error de conexión: {e}")
+        return False
+
 
-    
\ No newline at end of file
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,320 @@
+from pathlib import Path
+
+from .cache import DIRECTORIO_CACHE, guardar_cache, leer_cache
+from .dinero import a_centimos
+from .load_data import COLUMNA_CUENTA
+from .logger import Logger
+from .recurring_data import RecurringData
+import numpy as np
+import pandas as pd
+
+# Niveles de estadísticas, del más específico al más general. La categoría son
+# las dos primeras palabras del concepto normalizado (`COMPRA TARJ`, `PAGO BIZUM`...)
+# y se usa mientras el concepto no tiene suficientes observaciones.
+NIVELES = ('concepto', 'categoria')
+
+# Columnas del estado persistido
+COLUMNAS_ESTADO = ['nivel', 'cuenta', 'clave', 'suma', 'suma_cuadrados', 'peso', 'n']
+
+
+def _a_logaritmo(centimos: np.ndarray) -> np.ndarray:
+    return np.sign(centimos) * np.log1p(np.abs(centimos))
+
+
+def _desde_logaritmo(valores: np.ndarray) -> np.ndarray:
+    return np.sign(valores) * np.expm1(np.abs(valores))
+
+
+class AnomalyData:
+    """
+    Puntúa cada movimiento nuevo frente a las estadísticas móviles (media y
+    varianza con suavizado exponencial, EWMA) de su concepto o categoría.
+
+    Los importes se comparan en escala logarítmica con signo, log(1 + |céntimos|):
+    las desviaciones son relativas (un café de 99 € destaca; una compra de 66 €
+    en vez de 60 € en el supermercado, no).
+
+    El estado (medias por clave y las huellas de los movimientos ya
+    puntuados) se guarda en la caché, así que cada carga solo procesa los
+    movimientos nuevos y nunca se recorre el histórico completo. Lo que
+    decide si un movimiento es nuevo es su huella, no su fecha: una
+    exportación atrasada que llega después de otra más reciente también se
+    puntúa (frente al estado actual, no al de su fecha).
+    """
+
+    def __init__(self, logger=None,
+                 alpha=0.1,
+                 umbral=3.5,
+                 minimo_observaciones=5,
+                 desviacion_minima=0.25,
+                 directorio_cache=None,
+                 columna_fecha='Fecha Operación',
+                 columna_concepto='Concepto',
+                 columna_importe='Importe',
+                 columna_saldo='Saldo',
+                 columna_cuenta=COLUMNA_CUENTA):
+        """
+        Args:
+            logger: Logger del pipeline
+            alpha: Peso de cada movimiento nuevo en la media exponencial
+            umbral: Puntuación (desviaciones respecto a la media) a partir de la que se marca
+            minimo_observaciones: Observaciones previas necesarias para puntuar con un nivel
+            desviacion_minima: Desviación mínima en escala logarítmica (0.25 ≈ ±28 %),
+                para conceptos de importe casi constante
+            directorio_cache: Directorio donde se persiste el estado
+        """
+        self.logger = logger or Logger()
+        self.alpha = alpha
+        self.umbral = umbral
+        self.minimo_observaciones = minimo_observaciones
+        self.desviacion_minima = desviacion_minima
+        self.directorio_cache = Path(directorio_cache or DIRECTORIO_CACHE)
+        self.columna_fecha = columna_fecha
+        self.columna_concepto = columna_concepto
+        self.columna_importe = columna_importe
+        self.columna_saldo = columna_saldo
+        self.columna_cuenta = columna_cuenta
+
+        self.estado = pd.DataFrame(columns=COLUMNAS_ESTADO)
+        # Huellas (ordenadas) de los movimientos ya puntuados
+        self.puntuadas = np.array([], dtype=np.uint64)
+        # Por cuenta: fecha del movimiento puntuado más reciente, para avisar de
+        # los que llegan atrasados
+        self.marcas = {}
+
+    @property
+    def ruta_estado(self) -> Path:
+        return self.directorio_cache / 'anomalias_estado'
+
+    @property
+    def ruta_huellas(self) -> Path:
+        return self.directorio_cache / 'anomalias_huellas'
+
+    @property
+    def ruta_anomalias(self) -> Path:
+        return self.directorio_cache / 'anomalias'
+
+    def cargar_estado(self) -> bool:
+        """
+        Carga el estado persistido. Devuelve False si todavía no hay estado.
+        """
+        cache, huellas = leer_cache(self.ruta_estado), leer_cache(self.ruta_huellas)
+        if cache is None:
+            return False
+        if huellas is None:
+            # Estado de una versión que decidía por fecha: sin las huellas no se
+            # sabe qué se puntuó, así que se reconstruye desde cero
+            self.logger.warning("⚠️ Estado de anomalías sin huellas de movimientos: se reconstruye")
+            return False
+        self.estado, metadatos = cache
+        self.puntuadas = huellas[0]['huella'].to_numpy(dtype=np.uint64)
+        self.marcas = {int(cuenta): marca for cuenta, marca in metadatos.get('marcas', {}).items()}
+        self.logger.info(f"Estado de anomalías cargado: {len(self.estado)} claves, "
+                         f"{len(self.puntuadas)} movimientos puntuados")
+        return True
+
+    def guardar_estado(self):
+        guardar_cache(self.estado.reset_index(drop=True), self.ruta_estado,
+                      {'alpha': self.alpha, 'marcas': self.marcas})
+        guardar_cache(pd.DataFrame({'huella': self.puntuadas}), self.ruta_huellas, {'movimientos': len(self.puntuadas)})
+
+    def _columnas(self, df):
+        """
+        Extrae cuenta, fecha, claves de concepto y categoría e importe en escala
+        logarítmica con signo, con un índice posicional respecto a `df`.
+
+        Returns:
+            Tuple[pd.DataFrame, Dict[str, pd.Index]]: Datos con las claves como
+            códigos enteros y, por nivel, el texto de cada código
+        """
+        n = len(df)
+        fechas = df[self.columna_fecha]
+        if not pd.api.types.is_datetime64_any_dtype(fechas):
+            fechas = pd.to_datetime(fechas, dayfirst=True, errors='coerce')
+        codigos, normalizados = RecurringData.normalizar_conceptos(df[self.columna_concepto])
+        categorias = pd.Series(normalizados, dtype=object).str.split(' ').str[:2].str.join(' ')
+        codigos_categoria, claves_categoria = pd.factorize(categorias)
+        cuenta = (df[self.columna_cuenta].to_numpy(dtype=np.int64) if self.columna_cuenta in df.columns
+                  else np.zeros(n, dtype=np.int64))
+
+        datos = pd.DataFrame({
+            'cuenta': cuenta,
+            'fecha': fechas.dt.normalize().to_numpy(),
+            'concepto': codigos,
+            'categoria': np.where(codigos >= 0, codigos_categoria[np.maximum(codigos, 0)], -1)
+                         if len(codigos_categoria) else codigos,
+            'x': _a_logaritmo(a_centimos(df[self.columna_importe]).to_numpy(dtype='float64', na_value=np.nan)),
+        })
+        huella = [c for c in (self.columna_cuenta, self.columna_fecha, self.columna_concepto,
+                              self.columna_importe, self.columna_saldo) if c in df.columns]
+        datos['huella'] = pd.util.hash_pandas_object(df[huella], index=False).to_numpy()
+        return datos, {'concepto': pd.Index(normalizados), 'categoria': pd.Index(claves_categoria)}
+
+    def _nuevos(self, datos) -> np.ndarray:
+        """
+        Máscara de los movimientos que no se han puntuado todavía: los que
+        tienen una huella que no está entre las ya puntuadas.
+        """
+        return ~np.isin(datos['huella'].to_numpy(dtype=np.uint64), self.puntuadas)
+
+    def _pasada(self, datos, nivel, claves) -> pd.DataFrame:
+        """
+        Actualiza la EWMA de un nivel con los movimientos nuevos (en orden
+        cronológico) y devuelve, para cada uno, la media, la varianza y el
+        número de observaciones de su clave justo antes de él.
+
+        Por clave se guardan las sumas exponenciales de x, x² y de los pesos;
+        media = suma / peso corrige el sesgo de las primeras observaciones
+        (equivale a ewm(adjust=True)) y permite continuar la recurrencia en la
+        siguiente carga exactamente donde se dejó.
+        """
+        m = len(datos)
+        cuenta = datos['cuenta'].to_numpy()
+        codigo = datos[nivel].to_numpy()
+
+        # Cada (cuenta, clave) se identifica con un entero
+        base = len(claves) + 1
+        grupo_lote = cuenta * base + codigo
+
+        # Semilla de cada clave del lote: su estado anterior o ceros si es nueva;
+        # el estado de las claves sin movimientos en el lote se conserva tal cual
+        estado = self.estado[self.estado['nivel'] == nivel]
+        codigo_estado = claves.get_indexer(estado['clave'])
+        grupo_estado = estado['cuenta'].to_numpy(dtype=np.int64) * base + codigo_estado
+        en_lote = (codigo_estado >= 0) & np.isin(grupo_estado, grupo_lote)
+        sin_cambios = estado[~en_lote]
+        previas = pd.DataFrame({
+            'grupo': grupo_estado[en_lote],
+            'suma': estado.loc[en_lote, 'suma'].to_numpy(dtype='float64'),
+            'suma_cuadrados': estado.loc[en_lote, 'suma_cuadrados'].to_numpy(dtype='float64'),
+            'peso': estado.loc[en_lote, 'peso'].to_numpy(dtype='float64'),
+            'n': estado.loc[en_lote, 'n'].to_numpy(dtype=np.int64),
+        })
+        semillas = pd.DataFrame({'grupo': np.unique(grupo_lote)}).merge(previas, on='grupo', how='left').fillna(0)
+
+        # La semilla va primero en su grupo; después, los movimientos en orden
+        todo = pd.DataFrame({
+            'grupo': np.concatenate([semillas['grupo'].to_numpy(dtype=np.int64), grupo_lote]),
+            'x': np.concatenate([semillas['suma'].to_numpy(), datos['x'].to_numpy()]),
+            'x2': np.concatenate([semillas['suma_cuadrados'].to_numpy(), datos['x'].to_numpy() ** 2]),
+            'uno': np.concatenate([semillas['peso'].to_numpy(), np.ones(m)]),
+            'n': np.concatenate([semillas['n'].to_numpy(dtype=np.int64), np.ones(m, dtype=np.int64)]),
+            'posicion': np.concatenate([np.full(len(semillas), -1), np.arange(m)]),
+        })
+        todo = todo.iloc[np.lexsort((todo['posicion'].to_numpy(), todo['grupo'].to_numpy()))].reset_index(drop=True)
+
+        sumas = (todo.groupby('grupo', sort=False)[['x', 'x2', 'uno']]
+                 .ewm(alpha=self.alpha, adjust=False).mean()
+                 .reset_index(level=0, drop=True).sort_index())
+        todo[['suma', 'suma_cuadrados', 'peso']] = sumas[['x', 'x2', 'uno']].to_numpy()
+        todo['n'] = todo.groupby('grupo', sort=False)['n'].cumsum()
+
+        # Valores antes de cada movimiento: los de la fila anterior del mismo grupo
+        previa = todo[['suma', 'suma_cuadrados', 'peso', 'n']].shift().where(todo['grupo'].eq(todo['grupo'].shift()))
+        peso = previa['peso'].where(previa['peso'] > 0)
+        todo['media_previa'] = previa['suma'] / peso
+        varianza = (previa['suma_cuadrados'] / peso - todo['media_previa'] ** 2).clip(lower=0)
+        # Corrección de muestra pequeña, como en la varianza muestral
+        todo['n_previo'] = previa['n'].fillna(0)
+        todo['varianza_previa'] = varianza * todo['n_previo'] / (todo['n_previo'] - 1).clip(lower=1)
+
+        # Nuevo estado del nivel: última fila de cada grupo más las claves sin movimientos
+        ultimas = todo[~todo['grupo'].eq(todo['grupo'].shift(-1))]
+        estado = pd.DataFrame({
+            'nivel': nivel,
+            'cuenta': ultimas['grupo'].to_numpy() // base,
+            'clave': claves[ultimas['grupo'].to_numpy() % base],
+            'suma': ultimas['suma'].to_numpy(),
+            'suma_cuadrados': ultimas['suma_cuadrados'].to_numpy(),
+            'peso': ultimas['peso'].to_numpy(),
+            'n': ultimas['n'].to_numpy(dtype=np.int64),
+        })
+        self.estado = pd.concat([self.estado[self.estado['nivel'] != nivel], sin_cambios, estado], ignore_index=True)
+
+        movimientos = todo[todo['posicion'] >= 0].sort_values('posicion')
+        return movimientos[['media_previa', 'varianza_previa', 'n_previo']].reset_index(drop=True)
+
+    def puntuar(self, df) -> pd.DataFrame:
+        """
+        Puntúa los movimientos nuevos de `df` y actualiza el estado en memoria.
+
+        Args:
+            df: Movimientos limpios (importes en céntimos o euros)
+
+        Returns:
+            pd.DataFrame: Movimientos nuevos con las columnas Puntuacion_Anomalia
+            (desviaciones respecto a la media esperada), Importe_Esperado
+            (céntimos), Nivel_Anomalia y Anomalia
+        """
+        self.logger.info("Puntuando anomalías")
+        datos, claves = self._columnas(df)
+        nuevos = (self._nuevos(datos) & datos['x'].notna().to_numpy() & datos['fecha'].notna().to_numpy()
+                  & (datos['concepto'] >= 0).to_numpy())
+        datos = datos[nuevos].sort_values('fecha', kind='mergesort')
+
+        puntuacion = np.full(len(datos), np.nan)
+        esperado = np.full(len(datos), np.nan)
+        nivel_usado = np.full(len(datos), None, dtype=object)
+        for nivel in NIVELES:
+            previos = self._pasada(datos, nivel, claves[nivel])
+            escala = np.maximum(np.sqrt(previos['varianza_previa'].to_numpy()), self.desviacion_minima)
+            z = (datos['x'].to_numpy() - previos['media_previa'].to_numpy()) / escala
+            # Se usa el nivel más específico con suficientes observaciones
+            usar = np.isnan(puntuacion) & (previos['n_previo'].to_numpy() >= self.minimo_observaciones)
+            puntuacion[usar] = z[usar]
+            esperado[usar] = previos['media_previa'].to_numpy()[usar]
+            nivel_usado[usar] = nivel
+
+        self._avisar_atrasados(datos)
+        self._actualizar_marcas(datos)
+
+        resultado = df.iloc[datos.index].copy()
+        resultado['Puntuacion_Anomalia'] = np.round(puntuacion, 2)
+        resultado['Importe_Esperado'] = pd.array(np.round(_desde_logaritmo(esperado)), dtype='Int64')
+        resultado['Nivel_Anomalia'] = nivel_usado
+        resultado['Anomalia'] = np.abs(np.nan_to_num(puntuacion)) >= self.umbral
+        self.logger.info(f"Movimientos puntuados: {len(resultado)}, anomalías: {int(resultado['Anomalia'].sum())}")
+        return resultado
+
+    def _avisar_atrasados(self, datos):
+        """Avisa de los movimientos nuevos anteriores a los ya puntuados de su cuenta."""
+        if datos.empty or not self.marcas:
+            return
+        marca = pd.to_datetime(datos['cuenta'].map(self.marcas))
+        atrasados = datos['fecha'] < marca
+        if atrasados.any():
+            self.logger.warning(f"⚠️ {int(atrasados.sum())} movimientos anteriores a los ya puntuados "
+                                f"(exportación atrasada, desde {datos.loc[atrasados, 'fecha'].min():%Y-%m-%d}): "
+                                f"se puntúan con las estadísticas actuales")
+
+    def _actualizar_marcas(self, datos):
+        if datos.empty:
+            return
+        self.puntuadas = np.union1d(self.puntuadas, datos['huella'].to_numpy(dtype=np.uint64))
+        for cuenta, fecha in datos.groupby('cuenta')['fecha'].max().items():
+            fecha = fecha.strftime('%Y-%m-%d')
+            self.marcas[int(cuenta)] = max(self.marcas.get(int(cuenta), fecha), fecha)
+
+    def procesar(self, df) -> pd.DataFrame:
+        """
+        Carga el estado, puntúa los movimientos nuevos, guarda el estado y las
+        anomalías detectadas en esta carga.
+
+        Returns:
+            pd.DataFrame: Movimientos marcados como anomalía en esta carga
+        """
+        self.cargar_estado()
+        puntuados = self.puntuar(df)
+        anomalias = puntuados[puntuados['Anomalia']]
+        self.guardar_estado()
+        # Si no había nada nuevo se conservan las anomalías de la carga anterior
+        if len(puntuados):
+            guardar_cache(anomalias.reset_index(drop=True), self.ruta_anomalias, {'puntuados': len(puntuados)})
+        return anomalias
+
+    def ultimas_anomalias(self) -> pd.DataFrame:
+        """
+        Anomalías marcadas en la última carga (vacío si no hay ninguna guardada).
+        """
+        cache = leer_cache(self.ruta_anomalias)
+        return cache[0] if cache is not None else pd.DataFrame()
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+# Directorio por defecto de la caché de datos limpios (relativo al directorio de trabajo)
+DIRECTORIO_CACHE = Path('.cache') / 'gastos'
+
+
+def _formato_columnar() -> str:
+    """
+    Parquet si hay motor disponible (pyarrow); si no, pickle de pandas.
+    """
+    try:
+        import pyarrow  # noqa: F401
+        return 'parquet'
+    except ImportError:
+        return 'pkl'
+
+
+def clave_archivo(file_path) -> str:
+    """
+    Clave de caché de un fichero de origen: nombre, tamaño y fecha de modificación.
+    Si el fichero cambia, la clave cambia y la caché antigua deja de usarse.
+    """
+    estado = os.stat(file_path)
+    firma = f"{os.path.abspath(file_path)}|{estado.st_size}|{estado.st_mtime_ns}"
+    return f"{Path(file_path).stem}_{hashlib.sha1(firma.encode('utf-8')).hexdigest()[:12]}"
+
+
+def ruta_cache(file_path, directorio_cache=None) -> Path:
+    """
+    Ruta base (sin extensión) de la caché de un fichero de origen.
+    """
+    return Path(directorio_cache or DIRECTORIO_CACHE) / clave_archivo(file_path)
+
+
+def guardar_cache(df: pd.DataFrame, ruta_base: Path, metadatos: Optional[dict] = None) -> Path:
+    """
+    Guarda un DataFrame en formato columnar junto a sus metadatos en JSON.
+
+    Args:
+        df: DataFrame a guardar
+        ruta_base: Ruta sin extensión (ver ruta_cache)
+        metadatos: Datos adicionales, por ejemplo el preámbulo de la exportación
+
+    Returns:
+        Path: Ruta del fichero de datos escrito
+    """
+    ruta_base = Path(ruta_base)
+    ruta_base.parent.mkdir(parents=True, exist_ok=True)
+    formato = _formato_columnar()
+    ruta = ruta_base.with_suffix(f'.{formato}')
+    if formato == 'parquet':
+        df.to_parquet(ruta, index=False)
+    else:
+        df.to_pickle(ruta)
+    ruta_base.with_suffix('.json').write_text(
+        json.dumps(metadatos or {}, ensure_ascii=False, default=str), encoding='utf-8')
+    return ruta
+
+
+def leer_cache(ruta_base: Path) -> Optional[Tuple[pd.DataFrame, dict]]:
+    """
+    Lee un DataFrame de la caché si existe.
+
+    Returns:
+        Optional[Tuple[pd.DataFrame, dict]]: DataFrame y metadatos, o None si no hay caché
+    """
+    ruta_base = Path(ruta_base)
+    metadatos_ruta = ruta_base.with_suffix('.json')
+    if not metadatos_ruta.exists():
+        return None
+    for formato in ('parquet', 'pkl'):
+        ruta = ruta_base.with_suffix(f'.{formato}')
+        if ruta.exists():
+            df = pd.read_parquet(ruta) if formato == 'parquet' else pd.read_pickle(ruta)
+            return df, json.loads(metadatos_ruta.read_text(encoding='utf-8'))
+    return None
+
+
+def ruta_registro_cuentas(directorio_cache=None) -> Path:
+    """
+    Ruta del registro IBAN -> clave entera de las cuentas vistas en la caché.
+    """
+    return Path(directorio_cache or DIRECTORIO_CACHE) / 'cuentas.json'
+
+
+def leer_registro_cuentas(directorio_cache=None) -> Dict[str, int]:
+    """
+    Lee el registro de cuentas de la caché (vacío si aún no existe).
+    """
+    ruta = ruta_registro_cuentas(directorio_cache)
+    if not ruta.exists():
+        return {}
+    return {iban: int(cuenta_id) for iban, cuenta_id in json.loads(ruta.read_text(encoding='utf-8')).items()}
+
+
+def guardar_registro_cuentas(cuentas: Dict[str, int], directorio_cache=None) -> Path:
+    """
+    Guarda el registro de cuentas en la caché (se reemplaza de una vez, sin
+    dejar un fichero a medias si otro proceso lo lee a la vez).
+    """
+    ruta = ruta_registro_cuentas(directorio_cache)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_suffix('.json.tmp')
+    temporal.write_text(json.dumps(dict(sorted(cuentas.items(), key=lambda c: c[1])), ensure_ascii=False),
+                        encoding='utf-8')
+    os.replace(temporal, ruta)
+    return ruta
+
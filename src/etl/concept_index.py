@@ -0,0 +1,319 @@
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .logger import Logger
+import numpy as np
+import pandas as pd
+
+# Número de segmentos añadidos a partir del cual se fusionan en uno solo
+MAX_SEGMENTOS = 8
+
+
+def normalizar_texto(serie: pd.Series) -> pd.Series:
+    """
+    Pasa los conceptos a mayúsculas sin acentos y deja solo letras y números
+    separados por un espacio: `Compra Tarj. 5402XXXX8018 CAFÉ-ILLESCAS` pasa a
+    `COMPRA TARJ 5402XXXX8018 CAFE ILLESCAS`.
+    """
+    return (serie.astype(object).fillna('').astype(str)
+            .str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
+            .str.upper()
+            .str.replace(r'[^A-Z0-9]+', ' ', regex=True)
+            .str.strip())
+
+
+def _huella(archivo: str, hashes: np.ndarray) -> str:
+    """
+    Huella de las filas de una exportación (su nombre y el hash del concepto
+    de cada fila), para saber si lo ya indexado de ella sigue igual.
+    """
+    sha1 = hashlib.sha1(archivo.encode('utf-8'))
+    sha1.update(np.ascontiguousarray(hashes).tobytes())
+    return sha1.hexdigest()
+
+
+def _tramos(archivos: Optional[pd.Series], n: int) -> List[Tuple[str, int, int]]:
+    """
+    Tramos consecutivos de filas de una misma exportación: (archivo, inicio, fin).
+    Sin columna de procedencia todas las filas forman un solo tramo.
+    """
+    if n == 0:
+        return []
+    if archivos is None:
+        return [('', 0, n)]
+    valores = archivos.astype(object).fillna('').astype(str).to_numpy()
+    cortes = np.flatnonzero(valores[1:] != valores[:-1]) + 1
+    inicios, fines = np.r_[0, cortes], np.r_[cortes, n]
+    return [(valores[i], int(i), int(f)) for i, f in zip(inicios, fines)]
+
+
+def _unir(segmentos, num_conceptos: int):
+    """
+    Une varios segmentos (offsets, filas) en uno, manteniendo las filas ordenadas.
+    """
+    ids, filas = [], []
+    for offsets, filas_segmento in segmentos:
+        ids.append(np.repeat(np.arange(len(offsets) - 1), np.diff(offsets)))
+        filas.append(filas_segmento)
+    ids, filas = np.concatenate(ids), np.concatenate(filas)
+    orden = np.lexsort((filas, ids))
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(ids, minlength=num_conceptos))))
+    return offsets, filas[orden]
+
+
+@dataclass
+class _Parte:
+    """
+    Filas indexadas de una exportación: segmentos (offsets, filas) con las
+    filas contadas desde el comienzo de la exportación.
+    """
+    archivo: str
+    huella: str
+    num_filas: int
+    segmentos: list = field(default_factory=list)
+
+
+def _rangos(inicios: np.ndarray, fines: np.ndarray) -> np.ndarray:
+    """
+    Concatena los rangos [inicio, fin) sin bucles de Python.
+    """
+    longitudes = fines - inicios
+    total = int(longitudes.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    desplazamiento = np.repeat(inicios - np.concatenate(([0], np.cumsum(longitudes)[:-1])), longitudes)
+    return desplazamiento + np.arange(total)
+
+
+class ConceptIndex:
+    """
+    Índice invertido de los conceptos de los movimientos limpios.
+
+    Dos niveles de listas de apariciones (posting lists) en formato CSR:
+    token -> conceptos normalizados que lo contienen, y concepto -> filas
+    (posición en el DataFrame de movimientos limpios). Como los conceptos se
+    repiten mucho, una consulta cruza primero conjuntos pequeños de conceptos
+    y solo al final expande sus filas.
+
+    Las filas se indexan por exportación, cada una con su huella: una
+    exportación nueva (esté donde esté en el orden de los ficheros) o las
+    filas añadidas al final de una ya indexada se indexan sin reconstruir
+    lo demás.
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger or Logger()
+        self.ids_conceptos = {}
+        self.conceptos: List[str] = []
+        # Exportaciones indexadas, en el orden de las filas
+        self.partes: List[_Parte] = []
+        self.num_filas = 0
+        self.huella = self._huella_indice()
+        self._vocabulario = None
+
+    def _huella_indice(self) -> str:
+        return hashlib.sha1('\n'.join(parte.huella for parte in self.partes).encode('ascii')).hexdigest()
+
+    def _segmento(self, conceptos: pd.Series, inicio: int):
+        """
+        Listas de apariciones de unas filas, numeradas a partir de `inicio`.
+        """
+        codigos, unicos = pd.factorize(conceptos)
+        ids = np.empty(len(unicos), dtype=np.int64)
+        for i, texto in enumerate(normalizar_texto(pd.Series(unicos, dtype=object))):
+            ids[i] = self.ids_conceptos.setdefault(texto, len(self.ids_conceptos))
+            if ids[i] == len(self.conceptos):
+                self.conceptos.append(texto)
+        self._vocabulario = None
+
+        validas = codigos >= 0
+        concepto_fila = ids[codigos[validas]] if len(ids) else np.zeros(0, dtype=np.int64)
+        filas = np.arange(inicio, inicio + len(codigos))[validas]
+        orden = np.argsort(concepto_fila, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(concepto_fila, minlength=len(self.conceptos)))))
+        return offsets, filas[orden]
+
+    def agregar(self, conceptos: pd.Series, archivo: str = '') -> int:
+        """
+        Indexa las filas de una exportación a continuación de las ya indexadas.
+
+        Args:
+            conceptos: Columna Concepto de las filas nuevas
+            archivo: Exportación de la que vienen
+
+        Returns:
+            int: Número total de filas indexadas
+        """
+        hashes = pd.util.hash_pandas_object(conceptos, index=False).to_numpy()
+        self.partes.append(_Parte(archivo, _huella(archivo, hashes), len(conceptos),
+                                  [self._segmento(conceptos, 0)]))
+        self.num_filas += len(conceptos)
+        self.huella = self._huella_indice()
+        return self.num_filas
+
+    def actualizar(self, conceptos: pd.Series, archivos: Optional[pd.Series] = None) -> bool:
+        """
+        Pone el índice al día con la columna Concepto de los movimientos limpios.
+
+        Las exportaciones cuya huella no ha cambiado se reutilizan tal cual y
+        de las que han crecido solo se indexan las filas nuevas; el resto se
+        indexa de nuevo.
+
+        Args:
+            conceptos: Columna Concepto de los movimientos limpios
+            archivos: Exportación de cada fila (columna Archivo); sin ella,
+                todas las filas cuentan como una sola exportación
+
+        Returns:
+            bool: True si se ha aprovechado algo de lo ya indexado
+        """
+        hashes = pd.util.hash_pandas_object(conceptos, index=False).to_numpy()
+        tramos = _tramos(archivos, len(conceptos))
+
+        # Cada tramo reutiliza, como mucho, una parte del mismo archivo que sea su comienzo
+        disponibles = {}
+        for parte in self.partes:
+            disponibles.setdefault(parte.archivo, []).append(parte)
+        reutilizadas = []
+        for archivo, inicio, fin in tramos:
+            candidatas = disponibles.get(archivo, [])
+            parte = next((p for p in candidatas if p.num_filas <= fin - inicio
+                          and _huella(archivo, hashes[inicio:inicio + p.num_filas]) == p.huella), None)
+            if parte is not None:
+                candidatas.remove(parte)
+            reutilizadas.append(parte)
+
+        incremental = any(parte is not None for parte in reutilizadas)
+        if not incremental:
+            self.__init__(self.logger)
+        partes, nuevas = [], 0
+        for (archivo, inicio, fin), parte in zip(tramos, reutilizadas):
+            if parte is None:
+                parte = _Parte(archivo, '', 0)
+            if parte.num_filas < fin - inicio:
+                parte.segmentos.append(self._segmento(conceptos.iloc[inicio + parte.num_filas:fin], parte.num_filas))
+                nuevas += fin - inicio - parte.num_filas
+                parte.num_filas, parte.huella = fin - inicio, _huella(archivo, hashes[inicio:fin])
+                if len(parte.segmentos) > MAX_SEGMENTOS:
+                    parte.segmentos = [_unir(parte.segmentos, len(self.conceptos))]
+            partes.append(parte)
+
+        self.partes = partes
+        self.num_filas = len(conceptos)
+        self.huella = self._huella_indice()
+        self.logger.info(f"Índice de conceptos {'actualizado' if incremental else 'reconstruido'}: "
+                         f"{nuevas} filas nuevas, {self.num_filas} en total")
+        return incremental
+
+    def _tokens(self):
+        """
+        Vocabulario ordenado y, por token, los conceptos que lo contienen (CSR).
+        Se reconstruye solo cuando han entrado conceptos nuevos.
+        """
+        if self._vocabulario is None:
+            tokens = pd.Series(self.conceptos, dtype=object).str.split().explode().dropna()
+            pares = pd.DataFrame({'token': tokens.to_numpy(dtype=str), 'concepto': tokens.index.to_numpy()})
+            pares = pares.drop_duplicates().sort_values(['token', 'concepto'], kind='mergesort')
+            vocabulario, inicios = np.unique(pares['token'].to_numpy(), return_index=True)
+            offsets = np.concatenate((inicios, [len(pares)]))
+            self._vocabulario = (vocabulario, offsets, pares['concepto'].to_numpy(dtype=np.int64))
+        return self._vocabulario
+
+    def conceptos_de(self, termino: str) -> np.ndarray:
+        """
+        Conceptos que contienen un término; `RAF*` busca los tokens que empiezan por RAF.
+        """
+        prefijo = termino.endswith('*')
+        termino = normalizar_texto(pd.Series([termino.rstrip('*')])).iloc[0]
+        vocabulario, offsets, conceptos = self._tokens()
+        if not termino:
+            # Un término sin letras ni números (`-`, `*`) no restringe la búsqueda
+            return np.arange(len(self.conceptos))
+        if ' ' in termino:
+            # Un término con puntuación interna (`AMAZON.ES`) se trata como varios
+            return self._interseccion([t + ('*' if prefijo else '') for t in termino.split()])
+        inicio = np.searchsorted(vocabulario, termino, side='left')
+        fin = np.searchsorted(vocabulario, termino + '\uffff' if prefijo else termino, side='right')
+        return np.unique(conceptos[_rangos(offsets[inicio:fin], offsets[inicio + 1:fin + 1])])
+
+    def _interseccion(self, terminos: List[str]) -> np.ndarray:
+        resultado = None
+        for termino in terminos:
+            ids = self.conceptos_de(termino)
+            resultado = ids if resultado is None else np.intersect1d(resultado, ids, assume_unique=True)
+            if len(resultado) == 0:
+                break
+        return resultado if resultado is not None else np.zeros(0, dtype=np.int64)
+
+    def buscar(self, consulta: str) -> np.ndarray:
+        """
+        Filas cuyo concepto contiene todos los términos de la consulta (AND).
+        Sin distinguir mayúsculas ni acentos; `*` al final de un término busca
+        por prefijo: `BIZUM RAF*`.
+
+        Returns:
+            np.ndarray: Posiciones de las filas, ordenadas
+        """
+        ids = self._interseccion(consulta.split())
+        if len(ids) == 0:
+            return np.zeros(0, dtype=np.int64)
+        partes, inicio = [], 0
+        for parte in self.partes:
+            for offsets, filas in parte.segmentos:
+                # Los segmentos antiguos no conocen los conceptos que entraron después
+                presentes = ids[ids < len(offsets) - 1]
+                partes.append(filas[_rangos(offsets[presentes], offsets[presentes + 1])] + inicio)
+            inicio += parte.num_filas
+        return np.sort(np.concatenate(partes)) if partes else np.zeros(0, dtype=np.int64)
+
+    def guardar(self, ruta_base) -> Path:
+        """
+        Guarda el índice (un segmento por exportación) en `ruta_base`.npz.
+        """
+        for parte in self.partes:
+            if len(parte.segmentos) > 1:
+                parte.segmentos = [_unir(parte.segmentos, len(self.conceptos))]
+        offsets = [parte.segmentos[0][0] if parte.segmentos else np.zeros(1, dtype=np.int64) for parte in self.partes]
+        filas = [parte.segmentos[0][1] if parte.segmentos else np.zeros(0, dtype=np.int64) for parte in self.partes]
+        ruta = Path(ruta_base).with_suffix('.npz')
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(ruta, conceptos=np.array(self.conceptos, dtype=str),
+                 archivos=np.array([parte.archivo for parte in self.partes], dtype=str),
+                 huellas=np.array([parte.huella for parte in self.partes], dtype=str),
+                 filas_por_parte=np.array([parte.num_filas for parte in self.partes], dtype=np.int64),
+                 tamanos_offsets=np.array([len(o) for o in offsets], dtype=np.int64),
+                 tamanos_filas=np.array([len(f) for f in filas], dtype=np.int64),
+                 offsets=np.concatenate(offsets) if offsets else np.zeros(0, dtype=np.int64),
+                 filas=np.concatenate(filas) if filas else np.zeros(0, dtype=np.int64))
+        return ruta
+
+    @classmethod
+    def cargar(cls, ruta_base, logger=None) -> Optional['ConceptIndex']:
+        """
+        Carga un índice guardado, o None si no existe (o es de un formato anterior).
+        """
+        ruta = Path(ruta_base).with_suffix('.npz')
+        if not ruta.exists():
+            return None
+        indice = cls(logger)
+        with np.load(ruta) as datos:
+            if 'huellas' not in datos:
+                return None
+            indice.conceptos = datos['conceptos'].tolist()
+            offsets = np.split(datos['offsets'], np.cumsum(datos['tamanos_offsets'])[:-1])
+            filas = np.split(datos['filas'], np.cumsum(datos['tamanos_filas'])[:-1])
+            indice.partes = [_Parte(str(archivo), str(huella), int(n), [(o, f)])
+                             for archivo, huella, n, o, f in zip(datos['archivos'], datos['huellas'],
+                                                                 datos['filas_por_parte'], offsets, filas)]
+        indice.ids_conceptos = {texto: i for i, texto in enumerate(indice.conceptos)}
+        indice.num_filas = sum(parte.num_filas for parte in indice.partes)
+        indice.huella = indice._huella_indice()
+        return indice
+
+    def filtrar(self, df: pd.DataFrame, consulta: str) -> pd.DataFrame:
+        """
+        Movimientos de `df` (el DataFrame indexado) que cumplen la consulta.
+        """
+        return df.iloc[self.buscar(consulta)]
@@ -0,0 +1,97 @@
+import pandas as pd
+from pandas.api.types import is_float_dtype, is_integer_dtype
+
+# Los importes se representan como céntimos enteros (int64): las sumas y
+# comparaciones son exactas y vectorizadas, sin errores de redondeo de float.
+
+# Columnas con importes en euros de las exportaciones del banco
+COLUMNAS_DINERO = ('Importe', 'Saldo')
+
+# Importe en texto tal y como lo exporta el banco: `-237.15`, `5,847.95`
+# (las comas de miles se eliminan antes de aplicar el patrón)
+PATRON_IMPORTE = r'^(?P<signo>[+-]?)(?P<euros>\d+)(?:\.(?P<centimos>\d{0,2}))?$'
+
+
+def texto_a_centimos(serie: pd.Series) -> pd.Series:
+    """
+    Convierte importes en texto a céntimos enteros sin pasar por float.
+
+    Los valores que no siguen el formato del banco (más de dos decimales,
+    notación científica...) se convierten redondeando su valor numérico; los
+    que no son números quedan como nulos.
+
+    Args:
+        serie: Importes en texto (`-237.15`, `5,847.95`)
+
+    Returns:
+        pd.Series: Céntimos en int64, o Int64 si hay valores nulos
+    """
+    texto = serie.astype(str).str.strip().str.replace(',', '', regex=False)
+    partes = texto.str.extract(PATRON_IMPORTE)
+
+    euros = pd.to_numeric(partes['euros'], errors='coerce')
+    centimos = pd.to_numeric(partes['centimos'].fillna('').str.ljust(2, '0'), errors='coerce')
+    resultado = euros * 100 + centimos
+    resultado = resultado.where(partes['signo'] != '-', -resultado)
+
+    pendientes = resultado.isna() & serie.notna()
+    if pendientes.any():
+        resultado[pendientes] = _float_a_centimos(pd.to_numeric(texto[pendientes], errors='coerce'))
+    return _entero(resultado)
+
+
+def _float_a_centimos(serie: pd.Series) -> pd.Series:
+    return (serie * 100).round()
+
+
+def _entero(serie: pd.Series) -> pd.Series:
+    """
+    int64 si no hay nulos; Int64 (entero con nulos) en caso contrario.
+    """
+    return serie.astype('int64' if serie.notna().all() else 'Int64')
+
+
+def a_centimos(serie: pd.Series) -> pd.Series:
+    """
+    Convierte una columna de importes a céntimos enteros.
+
+    - Enteros: se asume que ya están en céntimos y se dejan igual.
+    - Float (por ejemplo, celdas numéricas de Excel): euros redondeados al céntimo.
+    - Texto u objetos (Decimal de PostgreSQL): se parsean como texto.
+    """
+    if is_integer_dtype(serie):
+        return serie
+    if is_float_dtype(serie):
+        return _entero(_float_a_centimos(serie))
+    return texto_a_centimos(serie)
+
+
+def euros_a_centimos(importe) -> int:
+    """
+    Céntimos de un importe escalar en euros (float, Decimal, int o texto).
+    """
+    return int(texto_a_centimos(pd.Series([str(importe)])).iloc[0])
+
+
+def centimos_a_euros(serie):
+    """
+    Importes en euros (float) para mostrar o dibujar; los cálculos se hacen en céntimos.
+    """
+    return serie / 100
+
+
+def formatear_euros(centimos: int) -> str:
+    """
+    Formatea céntimos como `-1,234.56 €` sin pasar por float.
+    """
+    centimos = int(centimos)
+    signo = '-' if centimos < 0 else ''
+    euros, resto = divmod(abs(centimos), 100)
+    return f"{signo}{euros:,}.{resto:02d} €"
+
+
+def es_columna_centimos(df: pd.DataFrame, columna: str) -> bool:
+    """
+    Indica si una columna de importes ya está en céntimos enteros.
+    """
+    return columna in df.columns and is_integer_dtype(df[columna])
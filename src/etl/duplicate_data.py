@@ -0,0 +1,234 @@
+from difflib import SequenceMatcher
+from typing import Optional, Tuple
+
+from .concept_index import normalizar_texto
+from .dinero import a_centimos, formatear_euros
+from .load_data import COLUMNA_CUENTA, COLUMNAS_ORIGEN
+from .logger import Logger
+import numpy as np
+import pandas as pd
+
+# Columnas que se completan en el movimiento conservado con las del duplicado
+COLUMNAS_COMPLETAR = ['Concepto', 'Fecha Valor', 'Referencia 1', 'Referencia 2']
+
+# Fusiones que se muestran una a una en el log (el resto solo se cuentan)
+MAX_FUSIONES_LOG = 20
+
+
+def similitud_conceptos(a: str, b: str) -> float:
+    """
+    Similitud (0 a 1) entre dos conceptos ya normalizados. Si uno es el
+    comienzo del otro (el banco recorta los conceptos largos) cuenta como 1.
+    """
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    if a.startswith(b) or b.startswith(a):
+        return 1.0
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+class DuplicateData:
+    """
+    Resuelve duplicados difusos: el mismo movimiento repetido en dos
+    exportaciones solapadas con el concepto algo distinto o con una referencia
+    que el banco rellenó después, que eliminar_duplicados no detecta.
+
+    Los candidatos se agrupan en bloques por (cuenta, fecha, importe, saldo)
+    con un hash join, y solo dentro de cada bloque se comparan los conceptos
+    normalizados. Como el saldo cambia con cada movimiento, casi todos los
+    bloques tienen una fila y el coste es prácticamente lineal en lugar de
+    comparar todas las parejas.
+    """
+
+    def __init__(self, logger=None,
+                 similitud_minima=0.8,
+                 columna_fecha='Fecha Operación',
+                 columna_concepto='Concepto',
+                 columna_importe='Importe',
+                 columna_saldo='Saldo',
+                 columna_cuenta=COLUMNA_CUENTA):
+        """
+        Args:
+            logger: Logger del pipeline
+            similitud_minima: Similitud de conceptos a partir de la cual dos movimientos del mismo bloque son el mismo
+        """
+        self.logger = logger or Logger()
+        self.similitud_minima = similitud_minima
+        self.columna_fecha = columna_fecha
+        self.columna_concepto = columna_concepto
+        self.columna_importe = columna_importe
+        self.columna_saldo = columna_saldo
+        self.columna_cuenta = columna_cuenta
+
+    def _bloques(self, df) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Hash de la clave de bloque de cada fila y máscara de las filas que
+        entran en algún bloque: los movimientos sin importe no se agrupan (no
+        mueven el saldo y pueden repetirse de verdad).
+        """
+        nulo = np.iinfo(np.int64).min
+        importe = a_centimos(df[self.columna_importe]).to_numpy(dtype=np.int64, na_value=nulo)
+        clave = pd.DataFrame({
+            'cuenta': (df[self.columna_cuenta].astype('int64').to_numpy()
+                       if self.columna_cuenta in df.columns else np.zeros(len(df), dtype=np.int64)),
+            'fecha': pd.to_datetime(df[self.columna_fecha]).dt.normalize()
+                       .to_numpy(dtype='datetime64[s]').astype(np.int64),
+            'importe': importe,
+            'saldo': a_centimos(df[self.columna_saldo]).to_numpy(dtype=np.int64, na_value=nulo),
+        })
+        validos = (importe != 0) & (importe != nulo)
+        return pd.util.hash_pandas_object(clave, index=False).to_numpy(), validos
+
+    def parejas(self, izquierda: pd.DataFrame, derecha: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Parejas de movimientos del mismo bloque con conceptos parecidos.
+
+        Args:
+            izquierda: Movimientos
+            derecha: Otros movimientos con los que comparar (por defecto, los
+                de `izquierda` entre sí)
+
+        Returns:
+            pd.DataFrame: Posiciones `i` (en izquierda) y `j` (en derecha) y su similitud
+        """
+        propia = derecha is None
+        derecha = izquierda if propia else derecha
+        (h_izq, validos_izq), (h_der, validos_der) = self._bloques(izquierda), self._bloques(derecha)
+        # Solo entran en el join los hashes que aparecen en más de una fila
+        if propia:
+            repetidos = pd.Series(h_izq).duplicated(keep=False).to_numpy() & validos_izq
+            en_izq = en_der = repetidos
+        else:
+            en_izq = np.isin(h_izq, h_der[validos_der]) & validos_izq
+            en_der = np.isin(h_der, h_izq[en_izq]) & validos_der
+        candidatos = pd.DataFrame({'h': h_izq[en_izq], 'i': np.flatnonzero(en_izq)}).merge(
+            pd.DataFrame({'h': h_der[en_der], 'j': np.flatnonzero(en_der)}), on='h')
+        if propia:
+            candidatos = candidatos[candidatos['i'] < candidatos['j']]
+        if candidatos.empty:
+            return pd.DataFrame({'i': np.array([], dtype=np.int64), 'j': np.array([], dtype=np.int64),
+                                 'similitud': np.array([], dtype=float)})
+
+        # Normalizar solo los conceptos que aparecen en alguna pareja
+        texto_izq = normalizar_texto(izquierda[self.columna_concepto].iloc[candidatos['i']]).to_numpy()
+        texto_der = normalizar_texto(derecha[self.columna_concepto].iloc[candidatos['j']]).to_numpy()
+        similitud = np.fromiter((similitud_conceptos(a, b) for a, b in zip(texto_izq, texto_der)),
+                                dtype=float, count=len(candidatos))
+        parejas = pd.DataFrame({'i': candidatos['i'].to_numpy(), 'j': candidatos['j'].to_numpy(),
+                                'similitud': similitud})
+        return parejas[parejas['similitud'] >= self.similitud_minima].reset_index(drop=True)
+
+    def _preferencia(self, df) -> np.ndarray:
+        """
+        Puntuación para elegir qué movimiento de un grupo se conserva: el que
+        tiene más campos rellenos y, a igualdad, el concepto más largo.
+        """
+        columnas = [c for c in COLUMNAS_COMPLETAR if c in df.columns]
+        rellenos = df[columnas].notna().sum(axis=1).to_numpy() if columnas else np.zeros(len(df))
+        largo = df[self.columna_concepto].astype(object).fillna('').astype(str).str.len().to_numpy()
+        return rellenos * 10_000 + np.minimum(largo, 9_999)
+
+    def resolver(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Fusiona los duplicados difusos: de cada grupo se conserva un
+        movimiento, con los campos vacíos completados con los de sus duplicados.
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: Movimientos sin duplicados e
+            informe con una fila por movimiento eliminado
+        """
+        parejas = self.parejas(df)
+        if parejas.empty:
+            return df, self._informe(df, np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([]))
+
+        # Grupos: componentes conexas de las parejas (union-find sobre pocas filas)
+        padre = {}
+
+        def raiz(x):
+            while padre.setdefault(x, x) != x:
+                padre[x] = padre[padre[x]]
+                x = padre[x]
+            return x
+
+        for i, j in zip(parejas['i'], parejas['j']):
+            padre[raiz(i)] = raiz(j)
+        filas = np.fromiter(padre, dtype=np.int64)
+        grupos = np.fromiter((raiz(x) for x in filas), dtype=np.int64, count=len(filas))
+
+        # Conservado: mayor preferencia y, a igualdad, la primera fila
+        preferencia = self._preferencia(df.iloc[filas])
+        orden = np.lexsort((filas, -preferencia, grupos))
+        filas, grupos = filas[orden], grupos[orden]
+        primero = np.r_[True, grupos[1:] != grupos[:-1]]
+        conservada = filas[primero][np.cumsum(primero) - 1]
+        eliminadas, conservadas = filas[~primero], conservada[~primero]
+        similitud = self._similitud_de(parejas, conservadas, eliminadas)
+
+        resultado = df.copy()
+        columnas = [c for c in COLUMNAS_COMPLETAR if c in df.columns]
+        if columnas:
+            # Cada hueco del conservado se rellena con el primer duplicado que tenga el dato
+            grupo = df[columnas].iloc[filas].set_axis(conservada, axis=0)
+            completado = grupo.groupby(level=0, sort=False).first()
+            posiciones = completado.index.to_numpy()
+            for columna in columnas:
+                resultado.iloc[posiciones, resultado.columns.get_loc(columna)] = completado[columna].to_numpy()
+
+        informe = self._informe(df, conservadas, eliminadas, similitud)
+        self._registrar(informe)
+        return resultado[~np.isin(np.arange(len(df)), eliminadas)], informe
+
+    def filtrar_existentes(self, nuevos: pd.DataFrame, existentes: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Quita de `nuevos` los movimientos que son duplicados difusos de alguno
+        de `existentes` (por ejemplo, los ya guardados en la base de datos).
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: Movimientos nuevos de verdad e informe
+        """
+        parejas = self.parejas(nuevos, existentes).drop_duplicates('i')
+        informe = pd.DataFrame({
+            'Fecha Operación': nuevos[self.columna_fecha].iloc[parejas['i']].to_numpy(),
+            'Importe': nuevos[self.columna_importe].iloc[parejas['i']].to_numpy(),
+            'Concepto_Conservado': existentes[self.columna_concepto].iloc[parejas['j']].to_numpy(),
+            'Concepto_Eliminado': nuevos[self.columna_concepto].iloc[parejas['i']].to_numpy(),
+            'Similitud': parejas['similitud'].to_numpy(),
+        })
+        self._registrar(informe)
+        return nuevos[~np.isin(np.arange(len(nuevos)), parejas['i'].to_numpy())], informe
+
+    @staticmethod
+    def _similitud_de(parejas, conservadas, eliminadas) -> np.ndarray:
+        """
+        Similitud de cada eliminado con su conservado (la máxima de sus parejas
+        si no se compararon directamente, en grupos de más de dos).
+        """
+        directa = {}
+        for i, j, s in zip(parejas['i'], parejas['j'], parejas['similitud']):
+            directa[(i, j)] = directa[(j, i)] = s
+        maxima = pd.concat([parejas[['i', 'similitud']].rename(columns={'i': 'fila'}),
+                            parejas[['j', 'similitud']].rename(columns={'j': 'fila'})]).groupby('fila')['similitud'].max()
+        return np.array([directa.get((c, e), maxima.get(e, np.nan)) for c, e in zip(conservadas, eliminadas)])
+
+    def _informe(self, df, conservadas, eliminadas, similitud) -> pd.DataFrame:
+        """Una fila por movimiento eliminado, con el concepto que lo sustituye."""
+        return pd.DataFrame({
+            'Fecha Operación': df[self.columna_fecha].iloc[eliminadas].to_numpy(),
+            'Importe': df[self.columna_importe].iloc[eliminadas].to_numpy(),
+            'Concepto_Conservado': df[self.columna_concepto].iloc[conservadas].to_numpy(),
+            'Concepto_Eliminado': df[self.columna_concepto].iloc[eliminadas].to_numpy(),
+            'Similitud': np.asarray(similitud, dtype=float),
+            **{columna: df[columna].iloc[eliminadas].to_numpy() for columna in COLUMNAS_ORIGEN if columna in df.columns},
+        })
+
+    def _registrar(self, informe: pd.DataFrame):
+        """Resume las fusiones en el log."""
+        if informe.empty:
+            return
+        self.logger.info(f"🔀 Duplicados difusos fusionados: {len(informe)}")
+        importes = a_centimos(informe['Importe'].head(MAX_FUSIONES_LOG))
+        for fila, importe in zip(informe.head(MAX_FUSIONES_LOG).itertuples(index=False), importes):
+            self.logger.info(f"   {fila[0]:%Y-%m-%d} {formatear_euros(importe)}: '{fila.Concepto_Eliminado}' -> "
+                             f"'{fila.Concepto_Conservado}' ({fila.Similitud:.2f})")
@@ -0,0 +1,147 @@
+from typing import Iterator, List
+
+import pandas as pd
+
+from .dinero import texto_a_centimos
+from .transform_data import NOMBRES_CABECERAS
+
+# Filas que se examinan buscando la cabecera antes de asumir que no hay preámbulo
+MAX_FILAS_PREAMBULO = 50
+
+# Posición de las columnas de la exportación del banco según su tipo
+COLUMNAS_FECHA = (0, 2)
+COLUMNAS_IMPORTE = (3, 4)
+
+
+def _filas_xlsx(file_path) -> Iterator[list]:
+    """
+    Itera las filas de la primera hoja de un .xlsx en modo solo lectura, sin
+    cargar el documento completo en memoria.
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ImportError("Se necesita openpyxl para leer ficheros .xlsx (pip install openpyxl)") from e
+
+    libro = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        for fila in hoja.iter_rows(values_only=True):
+            yield list(fila)
+    finally:
+        libro.close()
+
+
+def _filas_xls(file_path) -> Iterator[list]:
+    """
+    Itera las filas de la primera hoja de un .xls cargando las hojas bajo demanda.
+    """
+    try:
+        import xlrd
+    except ImportError as e:
+        raise ImportError("Se necesita xlrd para leer ficheros .xls (pip install xlrd)") from e
+
+    libro = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        hoja = libro.sheet_by_index(0)
+        for fila in hoja.get_rows():
+            valores = []
+            for celda in fila:
+                if celda.ctype == xlrd.XL_CELL_DATE:
+                    valores.append(xlrd.xldate_as_datetime(celda.value, libro.datemode))
+                elif celda.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                    valores.append(None)
+                else:
+                    valores.append(celda.value)
+            yield valores
+    finally:
+        libro.release_resources()
+
+
+def iterar_filas_excel(file_path) -> Iterator[list]:
+    """
+    Itera las filas de un libro Excel (.xlsx o .xls) en streaming.
+    """
+    if str(file_path).lower().endswith('.xls'):
+        return _filas_xls(file_path)
+    return _filas_xlsx(file_path)
+
+
+def es_cabecera(fila: list) -> bool:
+    """
+    Indica si una fila es la cabecera de la exportación (F. Operativa, Concepto...).
+    """
+    return bool(fila) and fila[0] is not None and str(fila[0]).strip().lower() in NOMBRES_CABECERAS
+
+
+def _fila_vacia(fila: list) -> bool:
+    return all(v is None or (isinstance(v, str) and not v.strip()) for v in fila)
+
+
+def separar_preambulo(filas: Iterator[list]):
+    """
+    Consume el preámbulo de un iterador de filas hasta la cabecera.
+
+    Returns:
+        Tuple[List[list], Iterator[list]]: Filas del preámbulo y un iterador
+        con las filas de datos restantes. Si no se encuentra cabecera en las
+        primeras MAX_FILAS_PREAMBULO filas, se asume que no hay preámbulo.
+    """
+    leidas: List[list] = []
+    for fila in filas:
+        if es_cabecera(fila):
+            return leidas, filas
+        leidas.append(fila)
+        if len(leidas) >= MAX_FILAS_PREAMBULO:
+            break
+
+    def resto():
+        yield from leidas
+        yield from filas
+    return [], resto()
+
+
+def tipar_bloque(bloque: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte las columnas de un bloque a sus tipos: fechas `dd/mm/yyyy`,
+    importes a céntimos enteros y el resto como texto.
+
+    Los importes no pasan por float: las celdas numéricas se leen por su
+    representación decimal (`5847.95`) y las de texto con separador de
+    miles (`5,847.95`), igual que en la exportación CSV.
+    """
+    for i, col in enumerate(bloque.columns):
+        serie = bloque[col]
+        if i in COLUMNAS_FECHA:
+            if not pd.api.types.is_datetime64_any_dtype(serie):
+                # Las celdas pueden venir como fecha de Excel o como texto `dd/mm/yyyy`
+                serie = pd.to_datetime(serie, dayfirst=True, errors='coerce', format='mixed')
+        elif i in COLUMNAS_IMPORTE:
+            serie = texto_a_centimos(serie)
+        else:
+            # Las referencias numéricas de Excel llegan como float: 152350149.0 -> '152350149'
+            if pd.api.types.is_float_dtype(serie) and (serie.dropna() % 1 == 0).all():
+                serie = serie.astype('Int64')
+            serie = serie.astype(str).where(serie.notna())
+        bloque[col] = serie
+    return bloque
+
+
+def bloques_excel(filas: Iterator[list], num_columnas: int, filas_por_bloque: int) -> Iterator[pd.DataFrame]:
+    """
+    Agrupa filas de datos en DataFrames tipados de `filas_por_bloque` filas,
+    descartando las filas vacías. Una exportación sin movimientos (solo
+    preámbulo y cabecera) da un único bloque vacío con las columnas tipadas.
+    """
+    bloque = []
+    alguno = False
+    for fila in filas:
+        if _fila_vacia(fila):
+            continue
+        fila = (list(fila) + [None] * num_columnas)[:num_columnas]
+        bloque.append(fila)
+        if len(bloque) >= filas_por_bloque:
+            yield tipar_bloque(pd.DataFrame(bloque))
+            bloque, alguno = [], True
+    if bloque or not alguno:
+        yield tipar_bloque(pd.DataFrame(bloque, columns=range(num_columnas)))
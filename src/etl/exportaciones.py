@@ -0,0 +1,57 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import List
+
+# Este módulo solo usa la librería estándar para que los comandos de estado y
+# manifiesto de la CLI arranquen sin importar pandas.
+
+# Extensiones de las exportaciones del banco que procesa el pipeline
+EXTENSIONES = ('.csv', '.txt', '.xls', '.xlsx')
+
+# Directorio de datos por defecto: data/ en la raíz del repositorio
+DIRECTORIO_DATOS = Path(__file__).resolve().parent.parent.parent / 'data'
+
+
+def directorio_datos(data_dir=None) -> Path:
+    """
+    Directorio de exportaciones: el indicado, la variable DATA_DIR o data/ del repositorio.
+    """
+    return Path(data_dir or os.getenv('DATA_DIR') or DIRECTORIO_DATOS)
+
+
+def listar_exportaciones(data_dir=None) -> List[Path]:
+    """
+    Lista, ordenadas por nombre, las exportaciones del directorio de datos.
+    """
+    directorio = directorio_datos(data_dir)
+    if not directorio.is_dir():
+        return []
+    return sorted(p for p in directorio.iterdir() if p.is_file() and p.suffix.lower() in EXTENSIONES)
+
+
+def huella_archivo(file_path, tamano_bloque: int = 1 << 20) -> str:
+    """
+    SHA-1 del contenido de un fichero, para detectar exportaciones nuevas o cambiadas.
+    """
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b''):
+            sha1.update(bloque)
+    return sha1.hexdigest()
+
+
+def manifiesto(data_dir=None) -> List[dict]:
+    """
+    Describe las exportaciones del directorio: nombre, tamaño, modificación y huella.
+    """
+    entradas = []
+    for ruta in listar_exportaciones(data_dir):
+        estado = ruta.stat()
+        entradas.append({
+            'archivo': ruta.name,
+            'bytes': estado.st_size,
+            'modificado': estado.st_mtime,
+            'sha1': huella_archivo(ruta),
+        })
+    return entradas
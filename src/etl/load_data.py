@@ -1,33 +1,236 @@
+import csv
+import os
+import threading
+import numpy as np
 import pandas as pd
+from typing import Dict
 from .logger import Logger
 
+# Columnas de procedencia añadidas con incluir_origen=True: fichero y posición de la fila en él
+COLUMNAS_ORIGEN = ['Archivo', 'Fila_Archivo']
+
+# Clave entera de la cuenta (IBAN del preámbulo); 0 si el fichero no la indica
+COLUMNA_CUENTA = 'Cuenta_Id'
+CUENTA_DESCONOCIDA = 0
+
+# Líneas de preámbulo de la exportación del banco (la última es la cabecera)
+LINEAS_PREAMBULO = 9
+
+# Filas por bloque en las lecturas en streaming
+FILAS_POR_BLOQUE = 100_000
+
+# Etiquetas del preámbulo (primera celda, en minúsculas y sin ':') y la clave con la que se guardan
+ETIQUETAS_PREAMBULO = {
+    'cuenta': 'cuenta',
+    'titular': 'titular',
+    'divisa': 'divisa',
+    'selección': 'seleccion',
+    'seleccion': 'seleccion',
+}
+
+
+def parsear_preambulo(filas) -> Dict[str, str]:
+    """
+    Extrae los datos del preámbulo de una exportación (Cuenta, Titular, Divisa, Selección).
+
+    Args:
+        filas: Filas del preámbulo como listas de celdas
+
+    Returns:
+        Dict[str, str]: Valores encontrados por clave ('cuenta', 'titular', ...)
+    """
+    datos = {}
+    for fila in filas:
+        if len(fila) < 2 or fila[0] is None:
+            continue
+        etiqueta = str(fila[0]).strip().rstrip(':').strip().lower()
+        if etiqueta in ETIQUETAS_PREAMBULO and fila[1] is not None and str(fila[1]).strip():
+            datos[ETIQUETAS_PREAMBULO[etiqueta]] = str(fila[1]).strip()
+    if 'cuenta' in datos:
+        # El IBAN se guarda sin espacios para que la misma cuenta tenga siempre la misma clave
+        datos['cuenta'] = datos['cuenta'].replace(' ', '').upper()
+    return datos
+
+
+def leer_preambulo(file_path) -> Dict[str, str]:
+    """
+    Lee y parsea las primeras líneas de una exportación CSV del banco.
+    """
+    with open(file_path, newline='', encoding='utf-8', errors='replace') as f:
+        lector = csv.reader(f)
+        filas = [fila for _, fila in zip(range(LINEAS_PREAMBULO), lector)]
+    return parsear_preambulo(filas)
+
+
+def preambulo_exportacion(file_path) -> Dict[str, str]:
+    """
+    Lee el preámbulo de una exportación CSV o Excel sin leer sus movimientos.
+    """
+    if str(file_path).endswith(('.xlsx', '.xls')):
+        from .excel_stream import iterar_filas_excel, separar_preambulo
+        return parsear_preambulo(separar_preambulo(iterar_filas_excel(str(file_path)))[0])
+    return leer_preambulo(file_path)
+
+
 class LoadData:
-    def __init__(self,columns=None,logger=None):
+    def __init__(self,columns=None,logger=None,incluir_origen=False,incluir_cuenta=True,cuentas=None,
+                 directorio_cache=None):
         self.logger = logger or Logger()
         self.columns = columns
+        self.incluir_origen = incluir_origen
+        self.incluir_cuenta = incluir_cuenta
+        # Si se indica, cada libro Excel se convierte una sola vez a formato columnar en este directorio
+        self.directorio_cache = directorio_cache
+        # IBAN -> clave entera; se puede inicializar con las cuentas ya registradas en la base de datos
+        self.cuentas: Dict[str, int] = dict(cuentas or {})
+        self.titulares: Dict[int, str] = {}
+        # Varios hilos pueden cargar ficheros con el mismo cargador (python -m src watch)
+        self._bloqueo = threading.Lock()
         self.df = pd.DataFrame([],columns=self.columns)
 
+    def registrar_cuenta(self, iban, titular=None) -> int:
+        """
+        Devuelve la clave entera de una cuenta, asignando la siguiente libre si es nueva.
+        """
+        if not iban:
+            return CUENTA_DESCONOCIDA
+        with self._bloqueo:
+            if iban not in self.cuentas:
+                self.cuentas[iban] = max(self.cuentas.values(), default=CUENTA_DESCONOCIDA) + 1
+                self.logger.info(f"Nueva cuenta registrada: {iban} -> {self.cuentas[iban]}")
+            cuenta_id = self.cuentas[iban]
+            if titular:
+                self.titulares[cuenta_id] = titular
+        return cuenta_id
+
+    def registrar_cuentas_de(self, archivos):
+        """
+        Registra, en el orden indicado, las cuentas de varias exportaciones
+        leyendo solo su preámbulo. Antes de cargarlas en paralelo, así las
+        claves nuevas no dependen de qué fichero termina antes.
+        """
+        if not self.incluir_cuenta:
+            return
+        for file_path in archivos:
+            preambulo = preambulo_exportacion(file_path)
+            self.registrar_cuenta(preambulo.get('cuenta'), preambulo.get('titular'))
+
     def load(self, file_path):
         self.logger.info(f"Cargando archivo: {file_path}")
         if file_path.endswith(('.csv', '.txt')):
-            data = pd.read_csv(file_path, sep=',', header=None, skiprows=9)
+            data = pd.read_csv(file_path, sep=',', header=None, skiprows=LINEAS_PREAMBULO, dtype=str)
             if self.columns:
                 data.columns = self.columns
+            if self.incluir_cuenta:
+                preambulo = leer_preambulo(file_path)
+                cuenta_id = self.registrar_cuenta(preambulo.get('cuenta'), preambulo.get('titular'))
+                data[COLUMNA_CUENTA] = np.int16(cuenta_id)
          
         elif file_path.endswith(('.xlsx', '.xls')):
-            data = pd.read_excel(file_path, header=None)
-            if self.columns:
-                data.columns = self.columns
+            data = pd.concat(list(self.load_excel_por_bloques(file_path, directorio_cache=self.directorio_cache)),
+                             ignore_index=True)
         else:
             self.logger.error(f"Formato de archivo no soportado: {file_path}")
             raise ValueError(f"Formato de archivo no soportado: {file_path}")
+        if self.incluir_origen and COLUMNAS_ORIGEN[0] not in data.columns:
+            data[COLUMNAS_ORIGEN[0]] = os.path.basename(file_path)
+            data[COLUMNAS_ORIGEN[1]] = range(len(data))
         self.logger.info(f"Archivo cargado correctamente: {file_path}")
         return data
+
+    def _completar_bloque(self, bloque, file_path, cuenta_id, inicio):
+        """
+        Nombra las columnas de un bloque y le añade la cuenta y la procedencia.
+        """
+        # Los bloques de la caché son vistas del DataFrame completo: se copian antes de añadir columnas
+        bloque = bloque.copy()
+        if self.columns:
+            bloque.columns = self.columns
+        if self.incluir_cuenta:
+            bloque[COLUMNA_CUENTA] = np.int16(cuenta_id)
+        if self.incluir_origen:
+            bloque[COLUMNAS_ORIGEN[0]] = os.path.basename(file_path)
+            bloque[COLUMNAS_ORIGEN[1]] = range(inicio, inicio + len(bloque))
+        bloque.index = range(inicio, inicio + len(bloque))
+        return bloque
+
+    def load_excel_por_bloques(self, file_path, filas_por_bloque=FILAS_POR_BLOQUE, directorio_cache=None):
+        """
+        Lee una exportación Excel (.xlsx/.xls) en streaming y la devuelve por bloques.
+
+        Las filas se recorren en modo solo lectura sin cargar el libro entero;
+        el preámbulo se separa igual que en el CSV (cuenta y titular incluidos)
+        y cada bloque sale con las fechas ya tipadas y los importes en céntimos.
+        Una exportación sin movimientos da un bloque vacío con las columnas.
+
+        Args:
+            file_path: Ruta del fichero Excel
+            filas_por_bloque: Número máximo de filas de cada bloque
+            directorio_cache: Si se indica, el libro se convierte una sola vez a
+                formato columnar en ese directorio y las siguientes lecturas
+                no vuelven a parsear el Excel
+
+        Yields:
+            pd.DataFrame: Bloques de movimientos
+        """
+        from .cache import ruta_cache, leer_cache, guardar_cache
+        from .excel_stream import iterar_filas_excel, separar_preambulo, bloques_excel
+
+        num_columnas = len(self.columns) if self.columns else 7
+        ruta_base = ruta_cache(file_path, directorio_cache) if directorio_cache else None
+        en_cache = leer_cache(ruta_base) if ruta_base else None
+
+        if en_cache is not None:
+            self.logger.info(f"Leyendo {file_path} desde la caché columnar")
+            datos, preambulo = en_cache
+            datos.columns = range(len(datos.columns))
+            bloques = (datos.iloc[i:i + filas_por_bloque] for i in range(0, max(len(datos), 1), filas_por_bloque))
+        else:
+            filas_preambulo, filas = separar_preambulo(iterar_filas_excel(file_path))
+            preambulo = parsear_preambulo(filas_preambulo)
+            bloques = bloques_excel(filas, num_columnas, filas_por_bloque)
+            if ruta_base is not None:
+                # Primera lectura: se materializa una vez para dejarla en caché
+                datos = pd.concat(list(bloques), ignore_index=True)
+                guardar_cache(datos.rename(columns=str), ruta_base, preambulo)
+                self.logger.info(f"Caché columnar creada para {file_path}")
+                bloques = (datos.iloc[i:i + filas_por_bloque] for i in range(0, max(len(datos), 1), filas_por_bloque))
+
+        cuenta_id = self.registrar_cuenta(preambulo.get('cuenta'), preambulo.get('titular'))
+        inicio = 0
+        for bloque in bloques:
+            bloque = self._completar_bloque(bloque, file_path, cuenta_id, inicio)
+            inicio += len(bloque)
+            yield bloque
+
+    def load_por_bloques(self, file_path, filas_por_bloque=FILAS_POR_BLOQUE):
+        """
+        Lee una exportación (CSV o Excel) por bloques de `filas_por_bloque` filas.
+
+        Yields:
+            pd.DataFrame: Bloques de movimientos con las mismas columnas que load()
+        """
+        self.logger.info(f"Cargando archivo por bloques: {file_path}")
+        if file_path.endswith(('.csv', '.txt')):
+            preambulo = leer_preambulo(file_path)
+            cuenta_id = self.registrar_cuenta(preambulo.get('cuenta'), preambulo.get('titular'))
+            inicio = 0
+            for bloque in pd.read_csv(file_path, sep=',', header=None, skiprows=LINEAS_PREAMBULO,
+                                      chunksize=filas_por_bloque, dtype=str):
+                bloque = self._completar_bloque(bloque, file_path, cuenta_id, inicio)
+                inicio += len(bloque)
+                yield bloque
+        elif file_path.endswith(('.xlsx', '.xls')):
+            yield from self.load_excel_por_bloques(file_path, filas_por_bloque, self.directorio_cache)
+        else:
+            self.logger.error(f"Formato de archivo no soportado: {file_path}")
+            raise ValueError(f"Formato de archivo no soportado: {file_path}")
     
  
     def agregar_datos_al_dataframe(self, data):
         self.logger.info(f"Agregando nuevos datos al DataFrame")
-        self.df = pd.concat([self.df, data], ignore_index=True)
+        # Con el acumulado vacío se toma el nuevo bloque tal cual para conservar sus tipos
+        self.df = data.reset_index(drop=True) if self.df.empty else pd.concat([self.df, data], ignore_index=True)
         return self.df
 
     def view_data(self):
@@ -4,11 +4,14 @@ import os
 class Logger:
     def __init__(self, log_file: str = 'app.log'):
         self.logger = logging.getLogger('DataGastosLogger')
+        # Todas las instancias comparten el mismo logger: los handlers se añaden una sola vez
+        if self.logger.handlers:
+            return
         self.logger.setLevel(logging.INFO)
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
-        # Handler para archivo
-        file_handler = logging.FileHandler(log_file)
+        # Handler para archivo (el fichero no se crea hasta el primer mensaje)
+        file_handler = logging.FileHandler(log_file, delay=True)
         file_handler.setFormatter(formatter)
         self.logger.addHandler(file_handler)
 
@@ -0,0 +1,201 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from .cache import guardar_registro_cuentas, leer_registro_cuentas
+from .exportaciones import listar_exportaciones
+from .load_data import LoadData
+from .logger import Logger
+from .profile_data import ProfileData
+from .reconcile_data import ReconcileData
+from .runtime_config import RuntimeConfig, cargar_configuracion
+from .transform_data import TransformData
+
+# Columnas de las exportaciones del banco en el DataFrame
+COLUMNAS = [
+    'Fecha Operación',
+    'Concepto',
+    'Fecha Valor',
+    'Importe',
+    'Saldo',
+    'Referencia 1',
+    'Referencia 2'
+]
+
+# Tipo de cada columna en la fase de transformación (importes en céntimos int64)
+TIPOS = [
+    ('Importe', 'centimos'),
+    ('Saldo', 'centimos'),
+    ('Fecha Operación', 'datetime'),
+    ('Fecha Valor', 'datetime'),
+    ('Concepto', 'text'),
+    ('Referencia 1', 'text'),
+    ('Referencia 2', 'text'),
+]
+
+
+def transformar(df: pd.DataFrame, transformer: TransformData, deduplicar: bool = True) -> pd.DataFrame:
+    """
+    Aplica las transformaciones básicas: limpieza, tipos y eliminación de
+    duplicados (exactos y, ya con los tipos, difusos).
+
+    Con `deduplicar=False` (bloques sueltos de una lectura por bloques) los
+    duplicados se quitan después, sobre todos los bloques juntos.
+    """
+    df_clean = transformer.limpiar_dataframe_para_carga(df)
+    if deduplicar:
+        df_clean = transformer.eliminar_duplicados(df_clean)
+    # Copia explícita: transformar_campos modifica las columnas en sitio
+    df_clean = df_clean.copy()
+    for campo, tipo in TIPOS:
+        df_clean = transformer.transformar_campos(df_clean, campo, tipo)
+    if deduplicar:
+        df_clean = transformer.resolver_duplicados(df_clean)
+    return df_clean
+
+
+def crear_cargador(directorio_cache=None, logger: Optional[Logger] = None, cuentas=None) -> LoadData:
+    """
+    Cargador de exportaciones con el registro de cuentas compartido de la
+    caché, para que la misma cuenta tenga la misma clave en `ingest`,
+    `search`, `load` o `watch` (y en el estado de anomalías, que la usa).
+
+    Args:
+        directorio_cache: Caché del registro de cuentas y de los libros Excel
+        logger: Logger del pipeline
+        cuentas: Cuentas ya guardadas en la base de datos; mandan sobre las de
+            la caché, que solo aportan las cuentas y claves que no chocan con ellas
+    """
+    registro = dict(cuentas or {})
+    usadas = set(registro.values())
+    for iban, cuenta_id in sorted(leer_registro_cuentas(directorio_cache).items(), key=lambda c: c[1]):
+        if iban not in registro and cuenta_id not in usadas:
+            registro[iban] = cuenta_id
+            usadas.add(cuenta_id)
+    return LoadData(COLUMNAS, logger, incluir_origen=True, cuentas=registro, directorio_cache=directorio_cache)
+
+
+def guardar_cuentas(loader: LoadData) -> None:
+    """
+    Guarda en la caché del cargador las cuentas que conoce (ver crear_cargador).
+    """
+    if loader.directorio_cache is not None:
+        guardar_registro_cuentas(loader.cuentas, loader.directorio_cache)
+
+
+def procesar_archivo(file_path, loader: LoadData, transformer: TransformData) -> pd.DataFrame:
+    """
+    Carga y transforma una sola exportación.
+    """
+    return transformar(loader.load(str(file_path)), transformer)
+
+
+def _cargar_en_paralelo(archivos, loader: LoadData, transformer: TransformData, workers: int) -> None:
+    """
+    Lee las exportaciones con un pool de hilos y las acumula tipadas en el
+    cargador en el orden de `archivos`, igual que la lectura secuencial.
+    """
+    loader.registrar_cuentas_de(archivos)
+    with ThreadPoolExecutor(max_workers=min(workers, len(archivos))) as pool:
+        for data in pool.map(lambda ruta: loader.load(str(ruta)), archivos):
+            loader.agregar_datos_al_dataframe(transformar(data, transformer, deduplicar=False))
+
+
+def _transformar_por_bloques(archivos, loader: LoadData, transformer: TransformData, filas_por_bloque: int,
+                             perfilador: Optional[ProfileData] = None) -> pd.DataFrame:
+    """
+    Lee y transforma las exportaciones bloque a bloque: en memoria solo queda
+    un bloque en texto y los movimientos ya tipados, que ocupan mucho menos.
+    Con `perfilador`, cada bloque tipado se perfila al pasar.
+    """
+    bloques = []
+    for file_path in archivos:
+        transformer.logger.info(f"Procesando archivo por bloques: {file_path}")
+        for bloque in loader.load_por_bloques(str(file_path), filas_por_bloque):
+            bloques.append(transformar(bloque, transformer, deduplicar=False))
+            if perfilador is not None:
+                perfilador.actualizar(bloques[-1])
+    return pd.concat(bloques, ignore_index=True) if bloques else pd.DataFrame(columns=loader.columns)
+
+
+def ingestar(data_dir=None, logger: Optional[Logger] = None, loader: Optional[LoadData] = None,
+             configuracion: Optional[RuntimeConfig] = None,
+             perfilador: Optional[ProfileData] = None) -> pd.DataFrame:
+    """
+    Carga todas las exportaciones del directorio de datos, concilia los saldos
+    y devuelve los movimientos transformados.
+
+    El modo de ejecución (memoria, bloques o paralelo) se elige con
+    RuntimeConfig.elegir_modo según el tamaño de las exportaciones; el
+    resultado es el mismo en los tres.
+
+    Con `perfilador`, al terminar tiene los perfiles de los movimientos
+    devueltos. En modo bloques se perfila cada bloque al transformarlo y
+    después solo se descuentan los duplicados, sin recorrer otra vez el total.
+
+    Args:
+        data_dir: Directorio de exportaciones (por defecto, el de la configuración o ver exportaciones.directorio_datos)
+        logger: Logger del pipeline
+        loader: LoadData a usar (por ejemplo, con las cuentas ya registradas en la base de datos)
+        configuracion: Configuración de ejecución (por defecto, config.yaml y entorno)
+        perfilador: ProfileData que se rellena con los movimientos devueltos
+
+    Returns:
+        pd.DataFrame: Movimientos de todas las exportaciones, limpios y tipados
+    """
+    logger = logger or Logger()
+    configuracion = configuracion or cargar_configuracion()
+    loader = loader or LoadData(COLUMNAS, logger, incluir_origen=True, directorio_cache=configuracion.directorio_cache)
+    transformer = TransformData(logger=logger)
+    archivos = listar_exportaciones(data_dir or configuracion.directorio_datos)
+    modo = configuracion.elegir_modo(archivos)
+    logger.info(f"Modo de ejecución: {modo} ({len(archivos)} exportaciones, "
+                f"presupuesto {configuracion.memoria_mb} MB, {configuracion.workers} workers)")
+
+    logger.info("=== FASE 1: EXTRACT ===")
+    if modo == 'bloques':
+        # Extracción y transformación van juntas para no tener el texto entero en memoria
+        df_tipado = _transformar_por_bloques(archivos, loader, transformer, configuracion.tamano_bloque(), perfilador)
+    elif modo == 'paralelo' and len(archivos) > 1:
+        _cargar_en_paralelo(archivos, loader, transformer, configuracion.workers)
+    else:
+        for file_path in archivos:
+            logger.info(f"Procesando archivo: {file_path}")
+            # Cada exportación se tipa antes de acumularla: las de Excel ya llegan
+            # en céntimos y las CSV en texto, y juntas no se podrían convertir
+            loader.agregar_datos_al_dataframe(transformar(loader.load(str(file_path)), transformer, deduplicar=False))
+
+    logger.info("=== FASE 2: TRANSFORM ===")
+    lote = df_tipado if modo == 'bloques' else loader.df
+    if lote.empty:
+        logger.warning("No se encontraron exportaciones para procesar")
+        return lote
+
+    # Conciliar saldos antes de deduplicar para detectar huecos y solapes entre ficheros
+    reconciler = ReconcileData(logger)
+    if not reconciler.validar_lote(lote):
+        logger.warning("El lote tiene rupturas de saldo o ficheros solapados; revisar antes de cargar")
+
+    df_clean = transformer.resolver_duplicados(transformer.eliminar_duplicados(lote))
+    if perfilador is not None:
+        if modo == 'bloques':
+            perfilador.corregir(lote, df_clean)
+        else:
+            perfilador.actualizar(df_clean)
+    return df_clean
+
+
+def ruta_datos_limpios(directorio_cache) -> Path:
+    """
+    Ruta base (sin extensión) de la caché con todos los movimientos limpios.
+    """
+    return Path(directorio_cache) / 'movimientos'
+
+
+def ruta_indice_conceptos(directorio_cache) -> Path:
+    """
+    Ruta base (sin extensión) del índice de conceptos de los movimientos limpios.
+    """
+    return Path(directorio_cache) / 'indice_conceptos'
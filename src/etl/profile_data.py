@@ -0,0 +1,365 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .dinero import a_centimos, es_columna_centimos, formatear_euros
+from .load_data import COLUMNAS_ORIGEN
+from .logger import Logger
+import numpy as np
+import pandas as pd
+
+# Error relativo de los cuantiles aproximados
+ERROR_CUANTILES = 0.01
+
+# Conceptos que guarda cada resumen de frecuentes
+MAX_CONCEPTOS = 256
+
+# Cuantiles que se muestran en el resumen
+CUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+
+# Columnas en céntimos con cuantiles aproximados
+COLUMNAS_CUANTILES = ['Importe', 'Saldo']
+
+# Clave de los perfiles sin fichero de origen o sin fecha
+SIN_CLAVE = ''
+
+
+class SketchCuantiles:
+    """
+    Cuantiles aproximados de importes en céntimos con cubos logarítmicos
+    (como DDSketch): cada valor cuenta en el cubo ceil(log_gamma(|x|)), con
+    signo, así que cualquier cuantil sale con un error relativo de `error`.
+
+    Dos sketches se fusionan sumando los recuentos de cada cubo, sin volver a
+    ver los valores.
+    """
+
+    def __init__(self, error: float = ERROR_CUANTILES, cubos: Optional[Counter] = None):
+        self.error = error
+        self.gamma = (1 + error) / (1 - error)
+        # Clave del cubo: 0 para el cero, ±(k + 1) para ±gamma^k
+        self.cubos = cubos if cubos is not None else Counter()
+
+    @property
+    def n(self) -> int:
+        return sum(self.cubos.values())
+
+    def claves(self, valores: np.ndarray) -> np.ndarray:
+        """Cubo de cada valor (sin nulos)."""
+        absolutos = np.abs(valores.astype(np.float64))
+        k = np.ceil(np.log(np.maximum(absolutos, 1)) / np.log(self.gamma)).astype(np.int64) + 1
+        return np.sign(valores).astype(np.int64) * k
+
+    def actualizar(self, valores: np.ndarray) -> 'SketchCuantiles':
+        claves, recuentos = np.unique(self.claves(valores), return_counts=True)
+        self.cubos.update(dict(zip(claves.tolist(), recuentos.tolist())))
+        return self
+
+    def fusionar(self, otro: 'SketchCuantiles') -> 'SketchCuantiles':
+        return SketchCuantiles(self.error, self.cubos + otro.cubos)
+
+    def cuantil(self, q: float) -> Optional[int]:
+        """
+        Valor aproximado (céntimos) del cuantil `q`; None si no hay valores.
+        """
+        if not self.cubos:
+            return None
+        claves = np.array(sorted(self.cubos))
+        acumulado = np.cumsum([self.cubos[c] for c in claves])
+        clave = int(claves[np.searchsorted(acumulado, q * (acumulado[-1] - 1), side='right')])
+        if clave == 0:
+            return 0
+        valor = 2 * self.gamma ** (abs(clave) - 1) / (self.gamma + 1)
+        return int(np.sign(clave) * round(valor))
+
+
+class FrecuentesConceptos:
+    """
+    Conceptos más frecuentes con el resumen de Misra-Gries: se guardan como
+    mucho `k` conceptos y cada recuento se queda corto como mucho en `error`
+    (a lo sumo n / (k + 1)). Dos resúmenes se fusionan sumando los recuentos
+    y recortando de nuevo a `k`.
+    """
+
+    def __init__(self, k: int = MAX_CONCEPTOS, recuentos: Optional[Counter] = None, error: int = 0):
+        self.k = k
+        self.recuentos = recuentos if recuentos is not None else Counter()
+        self.error = error
+        self._recortar()
+
+    def _recortar(self):
+        if len(self.recuentos) <= self.k:
+            return
+        umbral = sorted(self.recuentos.values(), reverse=True)[self.k]
+        self.recuentos = Counter({c: n - umbral for c, n in self.recuentos.items() if n > umbral})
+        self.error += umbral
+
+    def fusionar(self, otro: 'FrecuentesConceptos') -> 'FrecuentesConceptos':
+        return FrecuentesConceptos(min(self.k, otro.k), self.recuentos + otro.recuentos, self.error + otro.error)
+
+    def mas_frecuentes(self, n: int = 10) -> List[Tuple[str, int]]:
+        return self.recuentos.most_common(n)
+
+
+class Perfil:
+    """
+    Resumen fusionable de un conjunto de movimientos: filas, nulos por
+    columna, mínimos y máximos, ingresos y gastos (céntimos), cuantiles
+    aproximados de importes y saldos y conceptos más frecuentes.
+    """
+
+    def __init__(self, filas=0, nulos=None, minimos=None, maximos=None, ingresos=0, gastos=0,
+                 cuantiles=None, conceptos=None):
+        self.filas = filas
+        self.nulos: Dict[str, int] = nulos or {}
+        self.minimos: Dict[str, object] = minimos or {}
+        self.maximos: Dict[str, object] = maximos or {}
+        self.ingresos = ingresos
+        self.gastos = gastos
+        self.cuantiles: Dict[str, SketchCuantiles] = cuantiles or {}
+        self.conceptos = conceptos or FrecuentesConceptos()
+
+    def fusionar(self, otro: 'Perfil') -> 'Perfil':
+        def unir(a: dict, b: dict, funcion) -> dict:
+            return {c: funcion(a[c], b[c]) if c in a and c in b else a.get(c, b.get(c)) for c in a.keys() | b.keys()}
+
+        return Perfil(
+            filas=self.filas + otro.filas,
+            nulos=unir(self.nulos, otro.nulos, lambda x, y: x + y),
+            minimos=unir(self.minimos, otro.minimos, min),
+            maximos=unir(self.maximos, otro.maximos, max),
+            ingresos=self.ingresos + otro.ingresos,
+            gastos=self.gastos + otro.gastos,
+            cuantiles=unir(self.cuantiles, otro.cuantiles, SketchCuantiles.fusionar),
+            conceptos=self.conceptos.fusionar(otro.conceptos),
+        )
+
+    def restar(self, otro: 'Perfil') -> 'Perfil':
+        """
+        Quita de este perfil los movimientos de `otro`, que tienen que estar
+        incluidos en él (por ejemplo, duplicados quitados después de perfilar).
+        Los mínimos y máximos no se pueden descontar y se conservan.
+        """
+        return Perfil(
+            filas=self.filas - otro.filas,
+            nulos={c: n - otro.nulos.get(c, 0) for c, n in self.nulos.items()},
+            minimos=self.minimos,
+            maximos=self.maximos,
+            ingresos=self.ingresos - otro.ingresos,
+            gastos=self.gastos - otro.gastos,
+            cuantiles={c: SketchCuantiles(s.error, s.cubos - otro.cuantiles[c].cubos) if c in otro.cuantiles else s
+                       for c, s in self.cuantiles.items()},
+            conceptos=FrecuentesConceptos(self.conceptos.k, self.conceptos.recuentos - otro.conceptos.recuentos,
+                                          self.conceptos.error),
+        )
+
+    def tasas_nulos(self) -> Dict[str, float]:
+        return {c: n / self.filas if self.filas else 0.0 for c, n in self.nulos.items()}
+
+    def valores_cuantiles(self, columna: str = 'Importe', cuantiles=CUANTILES) -> Dict[float, Optional[int]]:
+        sketch = self.cuantiles.get(columna)
+        return {q: sketch.cuantil(q) if sketch else None for q in cuantiles}
+
+
+def combinar(perfiles: Iterable[Perfil]) -> Perfil:
+    """
+    Fusiona varios perfiles en uno (vacío si no hay ninguno).
+    """
+    total = Perfil()
+    for perfil in perfiles:
+        total = total.fusionar(perfil)
+    return total
+
+
+class ProfileData:
+    """
+    Perfila los movimientos en una sola pasada por bloque: un Perfil por
+    fichero de origen y mes, calculado con agregaciones vectorizadas por grupo.
+
+    Los perfiles son fusionables, así que los de cada bloque o fichero se
+    combinan en perfiles por mes y en el total sin volver a recorrer filas;
+    sirve igual para un DataFrame completo que para bloques en streaming.
+    """
+
+    def __init__(self, logger=None,
+                 max_conceptos=MAX_CONCEPTOS,
+                 error_cuantiles=ERROR_CUANTILES,
+                 columna_fecha='Fecha Operación',
+                 columna_concepto='Concepto',
+                 columna_importe='Importe',
+                 columna_archivo=COLUMNAS_ORIGEN[0]):
+        """
+        Args:
+            logger: Logger del pipeline
+            max_conceptos: Conceptos frecuentes que guarda cada perfil
+            error_cuantiles: Error relativo de los cuantiles aproximados
+        """
+        self.logger = logger or Logger()
+        self.max_conceptos = max_conceptos
+        self.error_cuantiles = error_cuantiles
+        self.columna_fecha = columna_fecha
+        self.columna_concepto = columna_concepto
+        self.columna_importe = columna_importe
+        self.columna_archivo = columna_archivo
+        # (fichero, 'YYYY-MM') -> Perfil de todo lo visto con actualizar()
+        self.perfiles: Dict[Tuple[str, str], Perfil] = {}
+
+    def perfilar(self, df: pd.DataFrame) -> Dict[Tuple[str, str], Perfil]:
+        """
+        Perfiles de un bloque de movimientos por fichero de origen y mes.
+
+        Returns:
+            Dict[Tuple[str, str], Perfil]: (fichero, 'YYYY-MM') -> Perfil
+        """
+        if df.empty:
+            return {}
+        archivo = (df[self.columna_archivo].astype(object).fillna(SIN_CLAVE) if self.columna_archivo in df.columns
+                   else pd.Series(SIN_CLAVE, index=df.index))
+        # Mes como entero (sin formatear cada fecha); solo se formatean los meses distintos
+        meses = pd.to_datetime(df[self.columna_fecha]).to_numpy().astype('datetime64[M]')
+        codigo_archivo, archivos = pd.factorize(archivo.to_numpy())
+        codigo_mes, valores_mes = pd.factorize(meses.view(np.int64))
+        grupos, combinados = pd.factorize(codigo_archivo * len(valores_mes) + codigo_mes)
+        claves = [(archivos[c // len(valores_mes)], valores_mes[c % len(valores_mes)]) for c in combinados]
+        claves = [(nombre, SIN_CLAVE if mes == np.iinfo(np.int64).min else str(np.datetime64(int(mes), 'M')))
+                  for nombre, mes in claves]
+        n_grupos = len(claves)
+        filas = np.bincount(grupos, minlength=n_grupos)
+
+        # Importes y saldos siempre en céntimos
+        datos = df.drop(columns=[c for c in COLUMNAS_ORIGEN if c in df.columns])
+        datos = datos.assign(**{c: a_centimos(datos[c]) for c in COLUMNAS_CUANTILES
+                                if c in datos.columns and not es_columna_centimos(datos, c)})
+        nulos = {c: np.bincount(grupos, weights=datos[c].isna().to_numpy(), minlength=n_grupos).astype(np.int64)
+                 for c in datos.columns}
+        minimos, maximos = {}, {}
+        for c in datos.columns:
+            if pd.api.types.is_numeric_dtype(datos[c]) or pd.api.types.is_datetime64_any_dtype(datos[c]):
+                por_grupo = datos[c].groupby(grupos)
+                minimos[c] = por_grupo.min().reindex(range(n_grupos))
+                maximos[c] = por_grupo.max().reindex(range(n_grupos))
+
+        importe = datos[self.columna_importe].to_numpy(dtype=np.int64, na_value=0)
+        ingresos = pd.Series(np.where(importe > 0, importe, 0)).groupby(grupos).sum().reindex(range(n_grupos))
+        gastos = pd.Series(np.where(importe < 0, importe, 0)).groupby(grupos).sum().reindex(range(n_grupos))
+
+        cuantiles = {c: self._cubos_por_grupo(datos[c], grupos) for c in COLUMNAS_CUANTILES if c in datos.columns}
+        conceptos = self._recuentos_por_grupo(datos[self.columna_concepto], grupos)
+
+        perfiles = {}
+        for g, clave in enumerate(claves):
+            perfiles[clave] = Perfil(
+                filas=int(filas[g]),
+                nulos={c: int(v[g]) for c, v in nulos.items()},
+                minimos={c: _escalar(v.iloc[g]) for c, v in minimos.items() if pd.notna(v.iloc[g])},
+                maximos={c: _escalar(v.iloc[g]) for c, v in maximos.items() if pd.notna(v.iloc[g])},
+                ingresos=int(ingresos[g]),
+                gastos=int(gastos[g]),
+                cuantiles={c: SketchCuantiles(self.error_cuantiles, cubos.get(g, Counter()))
+                           for c, cubos in cuantiles.items()},
+                conceptos=FrecuentesConceptos(self.max_conceptos, conceptos.get(g, Counter())),
+            )
+        return perfiles
+
+    def _cubos_por_grupo(self, centimos: pd.Series, grupos: np.ndarray) -> Dict[int, Counter]:
+        validos = centimos.notna().to_numpy()
+        claves = SketchCuantiles(self.error_cuantiles).claves(centimos.to_numpy(dtype=np.int64, na_value=0)[validos])
+        return self._por_grupo(pd.DataFrame({'g': grupos[validos], 'clave': claves}))
+
+    def _recuentos_por_grupo(self, serie: pd.Series, grupos: np.ndarray) -> Dict[int, Counter]:
+        validos = serie.notna().to_numpy()
+        return self._por_grupo(pd.DataFrame({'g': grupos[validos], 'clave': serie.to_numpy()[validos]}))
+
+    @staticmethod
+    def _por_grupo(pares: pd.DataFrame) -> Dict[int, Counter]:
+        """Recuento de cada clave dentro de cada grupo, con un solo value_counts."""
+        recuentos = pares.value_counts(sort=False)
+        return {int(g): Counter(dict(zip(r.index.get_level_values(1).tolist(), r.tolist())))
+                for g, r in recuentos.groupby(level=0, sort=False)}
+
+    def actualizar(self, df: pd.DataFrame) -> Dict[Tuple[str, str], Perfil]:
+        """
+        Perfila un bloque y lo fusiona con lo ya visto (mismo fichero y mes).
+
+        Returns:
+            Dict[Tuple[str, str], Perfil]: Perfiles acumulados
+        """
+        for clave, perfil in self.perfilar(df).items():
+            previo = self.perfiles.get(clave)
+            self.perfiles[clave] = previo.fusionar(perfil) if previo else perfil
+        return self.perfiles
+
+    def descontar(self, df: pd.DataFrame) -> Dict[Tuple[str, str], Perfil]:
+        """
+        Quita de los perfiles acumulados los movimientos de `df`, ya vistos
+        con actualizar(); los ficheros y meses que se quedan sin filas
+        desaparecen.
+
+        Returns:
+            Dict[Tuple[str, str], Perfil]: Perfiles acumulados
+        """
+        for clave, perfil in self.perfilar(df).items():
+            restante = self.perfiles[clave].restar(perfil)
+            if restante.filas:
+                self.perfiles[clave] = restante
+            else:
+                del self.perfiles[clave]
+        return self.perfiles
+
+    def corregir(self, antes: pd.DataFrame, despues: pd.DataFrame) -> Dict[Tuple[str, str], Perfil]:
+        """
+        Ajusta unos perfiles hechos con `antes` a `despues`, el mismo
+        DataFrame con duplicados quitados y huecos completados (mismas
+        etiquetas de índice): solo se vuelven a perfilar esas pocas filas.
+
+        Returns:
+            Dict[Tuple[str, str], Perfil]: Perfiles acumulados
+        """
+        if len(despues) == len(antes):
+            # Sin filas quitadas tampoco hay huecos completados
+            return self.perfiles
+        conservadas = antes.loc[despues.index]
+        completadas = (conservadas.isna() & despues.notna()).any(axis=1).to_numpy()
+        self.descontar(antes.drop(index=despues.index))
+        self.descontar(conservadas[completadas])
+        return self.actualizar(despues[completadas])
+
+    def por_archivo(self) -> Dict[str, Perfil]:
+        return self._agrupar(0)
+
+    def por_mes(self) -> Dict[str, Perfil]:
+        return self._agrupar(1)
+
+    def _agrupar(self, posicion: int) -> Dict[str, Perfil]:
+        agrupados: Dict[str, List[Perfil]] = {}
+        for clave, perfil in self.perfiles.items():
+            agrupados.setdefault(clave[posicion], []).append(perfil)
+        return {clave: combinar(perfiles) for clave, perfiles in sorted(agrupados.items())}
+
+    def total(self) -> Perfil:
+        return combinar(self.perfiles.values())
+
+    def registrar(self, perfil: Perfil, titulo: str = 'Total', conceptos: int = 10):
+        """
+        Muestra un perfil en el log en unas pocas líneas.
+        """
+        fecha_min, fecha_max = perfil.minimos.get(self.columna_fecha), perfil.maximos.get(self.columna_fecha)
+        periodo = f" ({fecha_min:%Y-%m-%d} a {fecha_max:%Y-%m-%d})" if fecha_min is not None else ''
+        self.logger.info(f"📊 {titulo}: {perfil.filas} movimientos{periodo}")
+        self.logger.info(f"   Ingresos {formatear_euros(perfil.ingresos)}, gastos {formatear_euros(perfil.gastos)}, "
+                         f"neto {formatear_euros(perfil.ingresos + perfil.gastos)}")
+        for columna in COLUMNAS_CUANTILES:
+            if columna in perfil.minimos:
+                cuantiles = ', '.join(f"p{round(q * 100)} {formatear_euros(v)}"
+                                      for q, v in perfil.valores_cuantiles(columna).items() if v is not None)
+                self.logger.info(f"   {columna}: min {formatear_euros(perfil.minimos[columna])}, "
+                                 f"max {formatear_euros(perfil.maximos[columna])}; {cuantiles}")
+        con_nulos = {c: f"{t:.0%}" for c, t in perfil.tasas_nulos().items() if t > 0}
+        if con_nulos:
+            self.logger.info(f"   Nulos: {con_nulos}")
+        frecuentes = ', '.join(f"{c} ({n})" for c, n in perfil.conceptos.mas_frecuentes(conceptos))
+        self.logger.info(f"   Conceptos frecuentes: {frecuentes}")
+
+
+def _escalar(valor):
+    """Valor de numpy/pandas a escalar de Python (los Timestamp se quedan)."""
+    return valor.item() if isinstance(valor, np.generic) else valor
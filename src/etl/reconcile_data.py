@@ -0,0 +1,162 @@
+from .dinero import a_centimos
+from .load_data import COLUMNAS_ORIGEN
+from .logger import Logger
+import numpy as np
+import pandas as pd
+
+
+class ReconcileData:
+    """
+    Concilia el saldo acumulado de cada movimiento con el anterior para
+    detectar movimientos que faltan, duplicados y exportaciones solapadas.
+
+    Cada fila de la exportación trae el saldo tras el movimiento, así que en
+    orden cronológico debe cumplirse saldo = saldo_anterior + importe.
+    """
+
+    def __init__(self, logger=None,
+                 columna_fecha='Fecha Operación',
+                 columna_importe='Importe',
+                 columna_saldo='Saldo',
+                 columna_cuenta='Cuenta_Id'):
+        self.logger = logger or Logger()
+        self.columna_fecha = columna_fecha
+        self.columna_importe = columna_importe
+        self.columna_saldo = columna_saldo
+        self.columna_cuenta = columna_cuenta
+        self.columna_archivo, self.columna_fila = COLUMNAS_ORIGEN
+
+    @staticmethod
+    def _a_centimos(serie) -> np.ndarray:
+        """
+        Convierte importes (céntimos, euros o texto tipo `5,847.95`) a céntimos enteros.
+        """
+        return a_centimos(serie).to_numpy(dtype=np.int64, na_value=0)
+
+    def _preparar(self, df) -> pd.DataFrame:
+        """
+        Extrae las columnas necesarias y las ordena cronológicamente por cuenta.
+
+        Dentro de un mismo día se respeta el orden del fichero, que el banco
+        exporta del movimiento más reciente al más antiguo.
+        """
+        n = len(df)
+        fechas = df[self.columna_fecha]
+        if not pd.api.types.is_datetime64_any_dtype(fechas):
+            fechas = pd.to_datetime(fechas, dayfirst=True, errors='coerce')
+
+        cuenta = df[self.columna_cuenta].to_numpy() if self.columna_cuenta in df.columns else np.zeros(n, dtype=np.int64)
+        if self.columna_archivo in df.columns:
+            # Categórica: una cadena por fichero, no una por movimiento
+            orden_archivo, nombres = pd.factorize(df[self.columna_archivo])
+            archivo = pd.Categorical.from_codes(orden_archivo, pd.Index(nombres, dtype=object))
+            fila = df[self.columna_fila].to_numpy()
+        else:
+            orden_archivo = np.zeros(n, dtype=np.int64)
+            archivo = np.full(n, '', dtype=object)
+            fila = np.arange(n)
+
+        datos = pd.DataFrame({
+            'cuenta': cuenta,
+            'archivo': archivo,
+            'orden_archivo': orden_archivo,
+            'fila': fila,
+            'fecha': fechas.to_numpy(),
+            'importe': self._a_centimos(df[self.columna_importe]),
+            'saldo': self._a_centimos(df[self.columna_saldo]),
+        }, index=df.index)
+
+        orden = np.lexsort((-datos['fila'].to_numpy(), datos['orden_archivo'].to_numpy(),
+                            datos['fecha'].to_numpy(), pd.factorize(datos['cuenta'])[0]))
+        return datos.iloc[orden]
+
+    @staticmethod
+    def _solapes(datos) -> pd.DataFrame:
+        rangos = (datos.groupby(['cuenta', 'archivo'], sort=False, observed=True)['fecha']
+                  .agg(desde='min', hasta='max').reset_index()
+                  .astype({'archivo': object})
+                  .sort_values(['cuenta', 'desde', 'hasta'], kind='mergesort'))
+
+        # Fin más tardío visto hasta el fichero anterior dentro de la cuenta y
+        # el fichero al que pertenece ese fin (con el que se solapa)
+        por_cuenta = rangos.groupby('cuenta', sort=False)
+        rangos['hasta_acumulado'] = por_cuenta['hasta'].cummax()
+        propietario = rangos['archivo'].where(rangos['hasta'] == rangos['hasta_acumulado'])
+        propietario = propietario.groupby(rangos['cuenta'], sort=False).ffill()
+        hasta_previo = por_cuenta['hasta_acumulado'].shift()
+        rangos['solapa_con'] = propietario.groupby(rangos['cuenta'], sort=False).shift()
+
+        return rangos[rangos['desde'] <= hasta_previo].drop(columns='hasta_acumulado').reset_index(drop=True)
+
+    def detectar_solapes(self, df) -> pd.DataFrame:
+        """
+        Detecta ficheros de una misma cuenta cuyos rangos de fechas se solapan.
+
+        Args:
+            df: Movimientos con las columnas de procedencia (LoadData(incluir_origen=True))
+
+        Returns:
+            pd.DataFrame: Un registro por fichero solapado con cuenta, archivo,
+            desde, hasta y el fichero anterior con el que solapa
+        """
+        solapes = self._solapes(self._preparar(df))
+        if len(solapes):
+            self.logger.warning(f"⚠️ {len(solapes)} ficheros con rangos de fechas solapados")
+        return solapes
+
+    def conciliar_saldos(self, df) -> pd.DataFrame:
+        """
+        Compara el saldo de cada movimiento con saldo_anterior + importe.
+
+        Args:
+            df: Movimientos con Fecha Operación, Importe y Saldo (y, si existen,
+                cuenta y columnas de procedencia)
+
+        Returns:
+            pd.DataFrame: Rupturas encontradas, con el índice de la fila original,
+            saldo esperado, diferencia (en céntimos) y tipo: 'duplicado',
+            'solape' o 'movimiento_faltante'
+        """
+        self.logger.info(f"🔎 Conciliando saldos de {len(df)} movimientos")
+        datos = self._preparar(df)
+
+        cuenta = datos['cuenta'].to_numpy()
+        misma_cuenta = np.r_[False, cuenta[1:] == cuenta[:-1]]
+        saldo_previo = np.r_[0, datos['saldo'].to_numpy()[:-1]]
+        esperado = saldo_previo + datos['importe'].to_numpy()
+        ruptura = misma_cuenta & (datos['saldo'].to_numpy() != esperado)
+
+        # Clasificación de las rupturas, de más a menos específica; solo se
+        # materializa para las filas con ruptura, que son muy pocas
+        duplicado = datos.duplicated(subset=['cuenta', 'fecha', 'importe', 'saldo']).to_numpy()
+        orden_archivo = datos['orden_archivo'].to_numpy()
+        cambio_archivo = np.r_[False, orden_archivo[1:] != orden_archivo[:-1]]
+        solapes = self._solapes(datos)
+        archivo = datos['archivo'].to_numpy(dtype=object)[ruptura]
+        en_solape = pd.MultiIndex.from_arrays([cuenta[ruptura], archivo]).isin(
+            pd.MultiIndex.from_arrays([solapes['cuenta'], solapes['archivo']]))
+
+        tipo = np.select(
+            [duplicado[ruptura], cambio_archivo[ruptura] & en_solape],
+            ['duplicado', 'solape'],
+            default='movimiento_faltante')
+
+        rupturas = datos[ruptura].drop(columns='orden_archivo').astype({'archivo': object})
+        rupturas = rupturas.assign(saldo_esperado=esperado[ruptura],
+                                   diferencia=rupturas['saldo'].to_numpy() - esperado[ruptura], tipo=tipo)
+
+        if len(rupturas):
+            self.logger.warning(f"⚠️ {len(rupturas)} rupturas de saldo: {rupturas['tipo'].value_counts().to_dict()}")
+        else:
+            self.logger.info("✅ Saldos conciliados sin rupturas")
+        return rupturas
+
+    def validar_lote(self, df) -> bool:
+        """
+        Indica si un lote de movimientos puede cargarse: sin rupturas de saldo
+        ni ficheros solapados.
+
+        Returns:
+            bool: True si el lote es coherente
+        """
+        return self.conciliar_saldos(df).empty and self.detectar_solapes(df).empty
@@ -0,0 +1,208 @@
+from .dinero import a_centimos
+from .load_data import COLUMNA_CUENTA
+from .logger import Logger
+import numpy as np
+import pandas as pd
+
+# Periodicidades que se detectan: días del periodo, tolerancia en días y
+# número mínimo de apariciones para considerar la serie recurrente
+PERIODICIDADES = {
+    'semanal': (7.0, 2.0, 4),
+    'mensual': (30.44, 4.0, 3),
+    'anual': (365.25, 10.0, 2),
+}
+
+# Fecha siguiente de cada periodicidad a partir de la última aparición
+SIGUIENTE_FECHA = {
+    'semanal': pd.DateOffset(days=7),
+    'mensual': pd.DateOffset(months=1),
+    'anual': pd.DateOffset(years=1),
+}
+
+
+class RecurringData:
+    """
+    Detecta pagos y cobros recurrentes (suscripciones, alquiler, Bizum
+    periódicos...) en el histórico de movimientos.
+
+    Los movimientos se agrupan por cuenta, concepto normalizado y banda de
+    importe; dentro de cada grupo se calculan los intervalos entre apariciones
+    sobre el histórico ordenado, todo con operaciones vectorizadas.
+    """
+
+    def __init__(self, logger=None,
+                 tolerancia_importe=0.10,
+                 tolerancia_minima=100,
+                 regularidad_minima=0.75,
+                 columna_fecha='Fecha Operación',
+                 columna_concepto='Concepto',
+                 columna_importe='Importe',
+                 columna_cuenta=COLUMNA_CUENTA):
+        """
+        Args:
+            logger: Logger del pipeline
+            tolerancia_importe: Variación relativa del importe dentro de una misma banda
+            tolerancia_minima: Variación absoluta mínima en céntimos dentro de una banda
+            regularidad_minima: Fracción de intervalos que deben ajustarse al periodo
+        """
+        self.logger = logger or Logger()
+        self.tolerancia_importe = tolerancia_importe
+        self.tolerancia_minima = tolerancia_minima
+        self.regularidad_minima = regularidad_minima
+        self.columna_fecha = columna_fecha
+        self.columna_concepto = columna_concepto
+        self.columna_importe = columna_importe
+        self.columna_cuenta = columna_cuenta
+
+    @staticmethod
+    def normalizar_conceptos(serie: pd.Series):
+        """
+        Normaliza los conceptos quitando números de tarjeta, referencias y
+        signos de puntuación: `COMPRA TARJ. 5402XXXXXXXX8018 PAYPAL *GOOGLE-4029357733`
+        pasa a `COMPRA TARJ PAYPAL GOOGLE`.
+
+        Solo se normalizan los valores distintos; el resultado se propaga con
+        los códigos de pd.factorize.
+
+        Returns:
+            Tuple[np.ndarray, pd.Index]: Código del concepto normalizado de cada
+            fila (-1 si es nulo) y conceptos normalizados
+        """
+        codigos, unicos = pd.factorize(serie)
+        texto = (pd.Series(unicos, dtype=object).astype(str).str.upper()
+                 .str.replace(r'[-*/.,:;#()]', ' ', regex=True)
+                 .str.replace(r'\S*\d\S*', ' ', regex=True)
+                 .str.replace(r'\s+', ' ', regex=True)
+                 .str.strip())
+        codigos_normalizados, normalizados = pd.factorize(texto)
+        if len(codigos_normalizados) == 0:
+            return np.full(len(codigos), -1), normalizados
+        return np.where(codigos < 0, -1, codigos_normalizados[np.maximum(codigos, 0)]), normalizados
+
+    def _bandas(self, cuenta, concepto, importe) -> np.ndarray:
+        """
+        Asigna a cada movimiento (ya ordenado por cuenta, concepto e importe) el
+        identificador de su serie: empieza una serie nueva al cambiar de cuenta,
+        de concepto, de signo o cuando el importe se aleja más de la tolerancia
+        del anterior.
+        """
+        if len(importe) == 0:
+            return np.zeros(0, dtype=np.int64)
+        salto = np.abs(np.diff(importe))
+        limite = np.maximum(self.tolerancia_minima, self.tolerancia_importe * np.abs(importe[:-1]))
+        nueva = ((cuenta[1:] != cuenta[:-1]) | (concepto[1:] != concepto[:-1])
+                 | (np.sign(importe[1:]) != np.sign(importe[:-1])) | (salto > limite))
+        return np.concatenate(([0], np.cumsum(nueva)))
+
+    def _apariciones(self, df) -> pd.DataFrame:
+        """
+        Una fila por serie y día en que aparece, ordenadas cronológicamente
+        dentro de cada serie, con los días transcurridos desde la anterior.
+        """
+        n = len(df)
+        fechas = df[self.columna_fecha]
+        if not pd.api.types.is_datetime64_any_dtype(fechas):
+            fechas = pd.to_datetime(fechas, dayfirst=True, errors='coerce')
+        concepto, normalizados = self.normalizar_conceptos(df[self.columna_concepto])
+        cuenta = (pd.factorize(df[self.columna_cuenta])[0] if self.columna_cuenta in df.columns
+                  else np.zeros(n, dtype=np.int64))
+        importe = a_centimos(df[self.columna_importe]).to_numpy(dtype='float64', na_value=np.nan)
+        dia = fechas.to_numpy(dtype='datetime64[D]')
+
+        validas = (concepto >= 0) & ~np.isnan(importe) & ~np.isnat(dia)
+        cuenta, concepto, importe, dia = cuenta[validas], concepto[validas], importe[validas].astype(np.int64), dia[validas]
+        cuenta_original = (df[self.columna_cuenta].to_numpy()[validas] if self.columna_cuenta in df.columns
+                           else np.zeros(len(cuenta), dtype=np.int64))
+
+        orden = np.lexsort((importe, concepto, cuenta))
+        serie = np.empty(len(orden), dtype=np.int64)
+        serie[orden] = self._bandas(cuenta[orden], concepto[orden], importe[orden])
+
+        dias = dia.astype(np.int64)
+        orden = np.lexsort((dias, serie))
+        serie, dias = serie[orden], dias[orden]
+        # Varias apariciones el mismo día cuentan como una sola
+        nueva = np.ones(len(serie), dtype=bool)
+        nueva[1:] = (serie[1:] != serie[:-1]) | (dias[1:] != dias[:-1])
+        intervalo = np.full(len(serie), np.nan)
+        intervalo[1:] = np.where(serie[1:] == serie[:-1], dias[1:] - dias[:-1], np.nan)
+
+        return pd.DataFrame({
+            'serie': serie,
+            'cuenta': cuenta_original[orden],
+            'concepto': np.asarray(normalizados, dtype=object)[concepto[orden]] if len(orden) else np.empty(0, dtype=object),
+            'dia': dias,
+            'importe': importe[orden],
+            'intervalo': intervalo,
+        })[nueva]
+
+    def detectar(self, df) -> pd.DataFrame:
+        """
+        Detecta las series recurrentes del histórico de movimientos.
+
+        Args:
+            df: Movimientos con fecha, concepto, importe y, opcionalmente, Cuenta_Id
+
+        Returns:
+            pd.DataFrame: Una fila por serie recurrente con Cuenta_Id, Concepto
+            (normalizado), Importe (mediana en céntimos), Periodicidad,
+            Ocurrencias, Intervalo_Dias, Regularidad, Primera_Fecha,
+            Ultima_Fecha y Proxima_Fecha, ordenadas por la próxima fecha
+        """
+        self.logger.info("Detectando pagos recurrentes")
+        apariciones = self._apariciones(df)
+        columnas = [self.columna_cuenta, 'Concepto', 'Importe', 'Periodicidad', 'Ocurrencias',
+                    'Intervalo_Dias', 'Regularidad', 'Primera_Fecha', 'Ultima_Fecha', 'Proxima_Fecha']
+
+        series = apariciones.groupby('serie', sort=False).agg(
+            cuenta=('cuenta', 'first'),
+            concepto=('concepto', 'first'),
+            importe=('importe', 'median'),
+            ocurrencias=('dia', 'size'),
+            primera=('dia', 'min'),
+            ultima=('dia', 'max'),
+            intervalo=('intervalo', 'median'),
+        )
+
+        # Periodicidad de cada serie según la mediana de sus intervalos
+        nombres = list(PERIODICIDADES)
+        condiciones = [(np.abs(series['intervalo'] - dias) <= tolerancia) & (series['ocurrencias'] >= minimo)
+                       for dias, tolerancia, minimo in PERIODICIDADES.values()]
+        series['periodicidad'] = np.select(condiciones, nombres, default='')
+        series = series[series['periodicidad'] != '']
+
+        # Regularidad: fracción de intervalos de la serie que encajan en su periodo
+        periodo = apariciones['serie'].map(series['periodicidad'])
+        dias_periodo = periodo.map({k: v[0] for k, v in PERIODICIDADES.items()})
+        tolerancia = periodo.map({k: v[1] for k, v in PERIODICIDADES.items()})
+        con_intervalo = periodo.notna() & apariciones['intervalo'].notna()
+        encaja = (np.abs(apariciones['intervalo'] - dias_periodo) <= tolerancia)[con_intervalo]
+        series['regularidad'] = encaja.groupby(apariciones.loc[con_intervalo, 'serie']).mean()
+        series = series[series['regularidad'] >= self.regularidad_minima]
+
+        if series.empty:
+            self.logger.info("Pagos recurrentes detectados: 0")
+            return pd.DataFrame(columns=columnas)
+
+        ultima = pd.to_datetime(series['ultima'], unit='D')
+        proxima = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+        for nombre, desplazamiento in SIGUIENTE_FECHA.items():
+            mascara = series['periodicidad'] == nombre
+            if mascara.any():
+                proxima[mascara] = ultima[mascara] + desplazamiento
+
+        resultado = pd.DataFrame({
+            self.columna_cuenta: series['cuenta'],
+            'Concepto': series['concepto'],
+            'Importe': series['importe'].round().astype(np.int64),
+            'Periodicidad': series['periodicidad'],
+            'Ocurrencias': series['ocurrencias'],
+            'Intervalo_Dias': series['intervalo'],
+            'Regularidad': series['regularidad'].round(3),
+            'Primera_Fecha': pd.to_datetime(series['primera'], unit='D'),
+            'Ultima_Fecha': ultima,
+            'Proxima_Fecha': proxima,
+        }).sort_values(['Proxima_Fecha', self.columna_cuenta, 'Concepto'], kind='mergesort').reset_index(drop=True)
+
+        self.logger.info(f"Pagos recurrentes detectados: {len(resultado)}")
+        return resultado
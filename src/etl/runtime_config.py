@@ -0,0 +1,243 @@
+import os
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Iterable, Optional
+
+# Este módulo solo usa la librería estándar (PyYAML y python-dotenv se importan
+# al leer los ficheros) para que la CLI pueda leer la configuración sin importar pandas.
+
+# Fichero de configuración por defecto: config.yaml en la raíz del repositorio
+RUTA_CONFIGURACION = Path(__file__).resolve().parent.parent.parent / 'config.yaml'
+
+# Variables de entorno locales (ver env.example), junto a config.yaml
+RUTA_ENTORNO = RUTA_CONFIGURACION.parent / '.env'
+
+# Modos de ejecución de la ingesta
+MODOS = ('memoria', 'bloques', 'paralelo')
+
+# Motores de base de datos (ver config/storage.py)
+MOTORES = ('postgres', 'sqlite')
+
+# Memoria de pico (lectura + limpieza + tipos) por byte de exportación en disco.
+# Medido con benchmarks/ (1M de filas: 96 MB de CSV, ~750 MB de pico); el
+# Excel va comprimido y ocupa bastante más al descomprimirlo.
+FACTOR_MEMORIA = {'.csv': 8, '.txt': 8, '.xls': 20, '.xlsx': 40}
+
+# Bytes de pico por fila de un bloque y por fila de un lote de inserción (tuplas de Python)
+BYTES_POR_FILA = 800
+BYTES_POR_FILA_LOTE = 1_000
+
+# Por debajo de este volumen estimado no compensa arrancar hilos
+MEMORIA_MINIMA_PARALELO = 64 * 1024 * 1024
+
+_entorno_cargado = False
+
+# Variables de entorno que sobrescriben cada opción (tienen prioridad sobre config.yaml)
+VARIABLES_ENTORNO = {
+    'directorio_datos': 'DATA_DIR',
+    'directorio_cache': 'CACHE_DIR',
+    'memoria_mb': 'MEMORIA_MB',
+    'workers': 'WORKERS',
+    'modo': 'MODO_EJECUCION',
+    'filas_por_bloque': 'FILAS_POR_BLOQUE',
+    'filas_por_lote_bd': 'DB_FILAS_POR_LOTE',
+    'db_min_conexiones': 'DB_MIN_CONNECTIONS',
+    'db_max_conexiones': 'DB_MAX_CONNECTIONS',
+    'motor_bd': 'DB_MOTOR',
+    'ruta_sqlite': 'DB_SQLITE',
+}
+
+# Sección y clave de cada opción en config.yaml
+CLAVES_YAML = {
+    'directorio_datos': ('datos', 'directorio'),
+    'directorio_cache': ('datos', 'cache'),
+    'memoria_mb': ('ejecucion', 'memoria_mb'),
+    'workers': ('ejecucion', 'workers'),
+    'modo': ('ejecucion', 'modo'),
+    'filas_por_bloque': ('ejecucion', 'filas_por_bloque'),
+    'filas_por_lote_bd': ('base_datos', 'filas_por_lote'),
+    'db_min_conexiones': ('base_datos', 'min_conexiones'),
+    'db_max_conexiones': ('base_datos', 'max_conexiones'),
+    'motor_bd': ('base_datos', 'motor'),
+    'ruta_sqlite': ('base_datos', 'sqlite'),
+}
+
+
+def memoria_fisica_mb() -> Optional[int]:
+    """
+    Memoria física del equipo en MB, o None si el sistema no la expone.
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def memoria_por_defecto_mb() -> int:
+    """
+    Presupuesto de memoria por defecto: la cuarta parte de la memoria física (2 GB si no se conoce).
+    """
+    fisica = memoria_fisica_mb()
+    return max(256, fisica // 4) if fisica else 2048
+
+
+def workers_por_defecto() -> int:
+    return max(1, min(os.cpu_count() or 1, 8))
+
+
+@dataclass(frozen=True)
+class RuntimeConfig:
+    """
+    Configuración de ejecución del pipeline, leída de config.yaml y del entorno.
+
+    Con `modo='auto'` la ingesta elige entre memoria (todo de una vez),
+    bloques (streaming con pico de memoria acotado) y paralelo (un hilo por
+    exportación) según el tamaño estimado de las exportaciones frente al
+    presupuesto de memoria y el número de workers; así el mismo código vale
+    para un portátil y para el servidor de ETL sin retocar nada.
+    """
+    directorio_datos: Optional[str] = None
+    directorio_cache: str = str(Path('.cache') / 'gastos')
+    memoria_mb: int = 0
+    workers: int = 0
+    modo: str = 'auto'
+    filas_por_bloque: Optional[int] = None
+    filas_por_lote_bd: Optional[int] = None
+    # Sin valor, DatabaseConnector usa DB_MIN_CONNECTIONS/DB_MAX_CONNECTIONS del .env o 1 y 10
+    db_min_conexiones: Optional[int] = None
+    db_max_conexiones: Optional[int] = None
+    # PostgreSQL (según .env) o un fichero SQLite local, sin servidor
+    motor_bd: str = 'postgres'
+    ruta_sqlite: str = str(Path('.cache') / 'gastos.sqlite')
+
+    def __post_init__(self):
+        # 0 (o 'auto' en el YAML) significa calcularlo según el equipo
+        if not self.memoria_mb:
+            object.__setattr__(self, 'memoria_mb', memoria_por_defecto_mb())
+        if not self.workers:
+            object.__setattr__(self, 'workers', workers_por_defecto())
+        if self.modo not in MODOS + ('auto',):
+            raise ValueError(f"Modo de ejecución no válido: {self.modo} (auto, {', '.join(MODOS)})")
+        if self.motor_bd not in MOTORES:
+            raise ValueError(f"Motor de base de datos no válido: {self.motor_bd} ({', '.join(MOTORES)})")
+        for campo in ('memoria_mb', 'workers', 'filas_por_bloque', 'filas_por_lote_bd',
+                      'db_min_conexiones', 'db_max_conexiones'):
+            if getattr(self, campo) is not None and getattr(self, campo) < 1:
+                raise ValueError(f"{campo} debe ser mayor que 0")
+        if (self.db_min_conexiones and self.db_max_conexiones
+                and self.db_min_conexiones > self.db_max_conexiones):
+            raise ValueError("db_min_conexiones no puede ser mayor que db_max_conexiones")
+
+    @property
+    def memoria_bytes(self) -> int:
+        return self.memoria_mb * 1024 * 1024
+
+    def memoria_estimada(self, exportaciones: Iterable) -> int:
+        """
+        Memoria de pico estimada (bytes) para ingestar las exportaciones de una vez.
+        """
+        return sum(Path(ruta).stat().st_size * FACTOR_MEMORIA.get(Path(ruta).suffix.lower(), 8)
+                   for ruta in exportaciones)
+
+    def elegir_modo(self, exportaciones) -> str:
+        """
+        Modo de ejecución para un conjunto de exportaciones.
+
+        Returns:
+            str: 'memoria', 'bloques' o 'paralelo'
+        """
+        if self.modo != 'auto':
+            return self.modo
+        exportaciones = list(exportaciones)
+        estimada = self.memoria_estimada(exportaciones)
+        if estimada > self.memoria_bytes:
+            return 'bloques'
+        if self.workers > 1 and len(exportaciones) > 1 and estimada >= MEMORIA_MINIMA_PARALELO:
+            return 'paralelo'
+        return 'memoria'
+
+    def tamano_bloque(self) -> int:
+        """
+        Filas por bloque en modo bloques: la mitad del presupuesto para el bloque en curso.
+        """
+        if self.filas_por_bloque:
+            return self.filas_por_bloque
+        return int(min(max(self.memoria_bytes // 2 // BYTES_POR_FILA, 10_000), 1_000_000))
+
+    def tamano_lote_bd(self) -> int:
+        """
+        Filas por lote de inserción: un 5 % del presupuesto en tuplas de Python.
+        """
+        if self.filas_por_lote_bd:
+            return self.filas_por_lote_bd
+        return int(min(max(self.memoria_bytes // 20 // BYTES_POR_FILA_LOTE, 1_000), 50_000))
+
+
+def _valor(texto, tipo):
+    """
+    Convierte un valor del YAML o del entorno al tipo de la opción; 'auto' o vacío es None.
+    """
+    if texto is None or (isinstance(texto, str) and texto.strip().lower() in ('', 'auto')):
+        return None
+    if tipo is int:
+        try:
+            return int(texto)
+        except (TypeError, ValueError):
+            raise ValueError(f"Se esperaba un número entero y se ha recibido {texto!r}")
+    return str(texto)
+
+
+def cargar_entorno():
+    """
+    Carga las variables de entorno desde .env la primera vez que se necesitan
+    (no al importar el módulo).
+    """
+    global _entorno_cargado
+    if not _entorno_cargado:
+        from dotenv import load_dotenv
+        load_dotenv(RUTA_ENTORNO)
+        _entorno_cargado = True
+
+
+def cargar_configuracion(ruta=None, entorno=None) -> RuntimeConfig:
+    """
+    Lee la configuración de ejecución: valores por defecto, después config.yaml
+    y por último las variables de entorno (ver VARIABLES_ENTORNO).
+
+    Args:
+        ruta: Fichero YAML (por defecto, config.yaml de la raíz del repositorio)
+        entorno: Variables de entorno (por defecto, os.environ con el .env cargado)
+
+    Returns:
+        RuntimeConfig: Configuración validada
+
+    Raises:
+        ValueError: Si algún valor no es válido
+    """
+    if entorno is None:
+        cargar_entorno()
+        entorno = os.environ
+    ruta = Path(ruta) if ruta else RUTA_CONFIGURACION
+    datos = {}
+    if ruta.is_file():
+        import yaml
+        with open(ruta, encoding='utf-8') as f:
+            datos = yaml.safe_load(f) or {}
+        if not isinstance(datos, dict):
+            raise ValueError(f"{ruta} debe contener secciones clave: valor")
+
+    tipos = {'memoria_mb': int, 'workers': int, 'filas_por_bloque': int, 'filas_por_lote_bd': int,
+             'db_min_conexiones': int, 'db_max_conexiones': int}
+    opciones = {}
+    for campo in fields(RuntimeConfig):
+        seccion, clave = CLAVES_YAML[campo.name]
+        tipo = tipos.get(campo.name, str)
+        valor = _valor(entorno.get(VARIABLES_ENTORNO[campo.name]), tipo)
+        if valor is None:
+            valor = _valor((datos.get(seccion) or {}).get(clave), tipo)
+            # Las rutas relativas del YAML son relativas al propio fichero
+            if valor is not None and campo.name.startswith(('directorio_', 'ruta_')) and not Path(valor).is_absolute():
+                valor = str(ruta.parent / valor)
+        if valor is not None:
+            opciones[campo.name] = valor
+    return RuntimeConfig(**opciones)
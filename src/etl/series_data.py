@@ -0,0 +1,266 @@
+import hashlib
+from pathlib import Path
+from typing import Dict, List
+
+from .cache import DIRECTORIO_CACHE, guardar_cache, leer_cache
+from .dinero import a_centimos
+from .load_data import COLUMNA_CUENTA
+from .logger import Logger
+from .recurring_data import RecurringData
+import numpy as np
+import pandas as pd
+
+# Frecuencias de las series de ingresos y gastos (periodos de pandas)
+FRECUENCIAS = {'dia': 'D', 'semana': 'W', 'mes': 'M'}
+
+# Ventanas (días) del gasto móvil
+VENTANAS = (7, 30, 90)
+
+# Agregados guardados en la caché: por día, cuenta y categoría, y saldo de
+# cierre de cada cuenta y día. `mes` ('YYYY-MM') es la partición que se recalcula.
+COLUMNAS_DIARIAS = ['mes', 'dia', 'cuenta', 'categoria', 'ingresos', 'gastos', 'movimientos']
+COLUMNAS_SALDOS = ['mes', 'dia', 'cuenta', 'saldo']
+
+
+class SeriesData:
+    """
+    Series temporales de los movimientos limpios: ingresos y gastos por día,
+    semana o mes, gasto móvil a 7/30/90 días, curva de saldo y variaciones
+    mensual e interanual del gasto por categoría.
+
+    Todo sale de unos agregados diarios calculados con un solo groupby sobre
+    los movimientos. Los agregados se guardan en la caché por mes junto con
+    la huella de los movimientos de ese mes: al actualizar solo se
+    recalculan los meses cuyos movimientos han cambiado.
+
+    La categoría es la misma que en AnomalyData: las dos primeras palabras
+    del concepto normalizado (`COMPRA TARJ`, `PAGO BIZUM`...).
+    """
+
+    def __init__(self, logger=None,
+                 directorio_cache=None,
+                 columna_fecha='Fecha Operación',
+                 columna_concepto='Concepto',
+                 columna_importe='Importe',
+                 columna_saldo='Saldo',
+                 columna_cuenta=COLUMNA_CUENTA):
+        """
+        Args:
+            logger: Logger del pipeline
+            directorio_cache: Directorio donde se guardan los agregados por mes
+        """
+        self.logger = logger or Logger()
+        self.directorio_cache = Path(directorio_cache or DIRECTORIO_CACHE)
+        self.columna_fecha = columna_fecha
+        self.columna_concepto = columna_concepto
+        self.columna_importe = columna_importe
+        self.columna_saldo = columna_saldo
+        self.columna_cuenta = columna_cuenta
+
+        self.diarios = pd.DataFrame(columns=COLUMNAS_DIARIAS)
+        self.saldos = pd.DataFrame(columns=COLUMNAS_SALDOS)
+        # Mes -> huella de sus movimientos cuando se calcularon sus agregados
+        self.huellas: Dict[str, str] = {}
+
+    @property
+    def ruta_diarios(self) -> Path:
+        return self.directorio_cache / 'series_diarias'
+
+    @property
+    def ruta_saldos(self) -> Path:
+        return self.directorio_cache / 'series_saldos'
+
+    def cargar_estado(self) -> bool:
+        """
+        Carga los agregados guardados. Devuelve False si todavía no hay.
+        """
+        diarios, saldos = leer_cache(self.ruta_diarios), leer_cache(self.ruta_saldos)
+        if diarios is None or saldos is None:
+            return False
+        (self.diarios, metadatos), (self.saldos, _) = diarios, saldos
+        self.huellas = metadatos.get('huellas', {})
+        return True
+
+    def guardar_estado(self):
+        guardar_cache(self.diarios, self.ruta_diarios, {'huellas': self.huellas})
+        guardar_cache(self.saldos, self.ruta_saldos, {'meses': len(self.huellas)})
+
+    def _meses(self, df) -> np.ndarray:
+        """Mes ('YYYY-MM') de cada movimiento, formateando solo los meses distintos."""
+        meses = pd.to_datetime(df[self.columna_fecha]).to_numpy().astype('datetime64[M]')
+        codigos, unicos = pd.factorize(meses)
+        return np.asarray(unicos.astype(str), dtype=object)[codigos]
+
+    def _huellas(self, df, meses: np.ndarray) -> Dict[str, str]:
+        """
+        Huella de los movimientos de cada mes, independiente de su orden.
+        """
+        columnas = [c for c in (self.columna_cuenta, self.columna_fecha, self.columna_concepto,
+                                self.columna_importe, self.columna_saldo) if c in df.columns]
+        hashes = pd.util.hash_pandas_object(df[columnas], index=False).to_numpy()
+        orden = np.lexsort((hashes, meses))
+        meses, hashes = meses[orden], hashes[orden]
+        cortes = np.flatnonzero(np.r_[True, meses[1:] != meses[:-1], True])
+        return {meses[a]: hashlib.sha1(hashes[a:b].tobytes()).hexdigest() for a, b in zip(cortes[:-1], cortes[1:])}
+
+    def _agregar(self, df, meses: np.ndarray):
+        """
+        Agregados diarios por cuenta y categoría y saldo de cierre de cada
+        cuenta y día de los movimientos de `df`.
+        """
+        n = len(df)
+        dia = pd.to_datetime(df[self.columna_fecha]).dt.normalize().to_numpy()
+        cuenta = (df[self.columna_cuenta].to_numpy(dtype=np.int64) if self.columna_cuenta in df.columns
+                  else np.zeros(n, dtype=np.int64))
+        codigos, normalizados = RecurringData.normalizar_conceptos(df[self.columna_concepto])
+        categorias = pd.Series(normalizados, dtype=object).str.split(' ').str[:2].str.join(' ').to_numpy()
+        categoria = np.where(codigos >= 0, categorias[np.maximum(codigos, 0)] if len(categorias) else '', '')
+        importe = a_centimos(df[self.columna_importe]).to_numpy(dtype=np.int64, na_value=0)
+
+        datos = pd.DataFrame({
+            'mes': meses, 'dia': dia, 'cuenta': cuenta, 'categoria': categoria,
+            'ingresos': np.where(importe > 0, importe, 0),
+            'gastos': np.where(importe < 0, importe, 0),
+            'movimientos': np.ones(n, dtype=np.int64),
+        })
+        diarios = datos.groupby(['mes', 'dia', 'cuenta', 'categoria'], sort=True).sum().reset_index()
+
+        # Saldo de cierre: el movimiento del día cuyo saldo no es el saldo previo
+        # de otro movimiento del mismo día (el último de la cadena). Si no hay
+        # uno claro, el primero del fichero, que el banco exporta del más reciente al más antiguo.
+        saldo = a_centimos(df[self.columna_saldo]).to_numpy(dtype=np.int64, na_value=0)
+        clave = pd.util.hash_pandas_object(pd.DataFrame({'cuenta': cuenta, 'dia': dia, 'saldo': saldo}),
+                                           index=False).to_numpy()
+        previo = pd.util.hash_pandas_object(pd.DataFrame({'cuenta': cuenta, 'dia': dia, 'saldo': saldo - importe}),
+                                            index=False).to_numpy()
+        cierre = ~np.isin(clave, previo[importe != 0])
+        orden = np.lexsort((np.arange(n), ~cierre, dia, cuenta))
+        saldos = (pd.DataFrame({'mes': meses, 'dia': dia, 'cuenta': cuenta, 'saldo': saldo}).iloc[orden]
+                  .drop_duplicates(['cuenta', 'dia']).sort_values(['dia', 'cuenta'], kind='stable'))
+        return diarios[COLUMNAS_DIARIAS], saldos[COLUMNAS_SALDOS].reset_index(drop=True)
+
+    def actualizar(self, df: pd.DataFrame) -> List[str]:
+        """
+        Recalcula los agregados de los meses de `df` cuyos movimientos han
+        cambiado. `df` debe traer todos los movimientos de cada mes que
+        contiene; los meses que no aparecen se conservan como estaban.
+
+        Returns:
+            List[str]: Meses recalculados ('YYYY-MM')
+        """
+        if df.empty:
+            return []
+        meses = self._meses(df)
+        huellas = self._huellas(df, meses)
+        tocados = sorted(m for m, h in huellas.items() if self.huellas.get(m) != h)
+        if not tocados:
+            self.logger.info(f"📈 Series al día ({len(huellas)} meses sin cambios)")
+            return []
+
+        seleccion = np.isin(meses, tocados)
+        diarios, saldos = self._agregar(df[seleccion], meses[seleccion])
+        conservar = ~self.diarios['mes'].isin(tocados)
+        self.diarios = (pd.concat([self.diarios[conservar], diarios], ignore_index=True) if conservar.any() else diarios)
+        self.diarios = self.diarios.sort_values(['dia', 'cuenta', 'categoria'], kind='stable', ignore_index=True)
+        conservar = ~self.saldos['mes'].isin(tocados)
+        self.saldos = (pd.concat([self.saldos[conservar], saldos], ignore_index=True) if conservar.any() else saldos)
+        self.saldos = self.saldos.sort_values(['dia', 'cuenta'], kind='stable', ignore_index=True)
+        self.huellas.update({m: huellas[m] for m in tocados})
+        self.logger.info(f"📈 Series recalculadas para {len(tocados)} de {len(huellas)} meses: {', '.join(tocados)}")
+        return tocados
+
+    def procesar(self, df: pd.DataFrame) -> List[str]:
+        """
+        Carga los agregados de la caché, recalcula los meses que han cambiado
+        y, si hay alguno, los vuelve a guardar.
+
+        Returns:
+            List[str]: Meses recalculados
+        """
+        self.cargar_estado()
+        tocados = self.actualizar(df)
+        if tocados:
+            self.guardar_estado()
+        return tocados
+
+    def ingresos_gastos(self, frecuencia: str = 'mes') -> pd.DataFrame:
+        """
+        Ingresos, gastos, neto (céntimos) y número de movimientos por día,
+        semana (de lunes a domingo) o mes, con los periodos sin movimientos a cero.
+
+        Returns:
+            pd.DataFrame: Índice con el inicio de cada periodo
+        """
+        if frecuencia not in FRECUENCIAS:
+            raise ValueError(f"Frecuencia no válida: {frecuencia} ({', '.join(FRECUENCIAS)})")
+        columnas = ['ingresos', 'gastos', 'movimientos']
+        if self.diarios.empty:
+            return pd.DataFrame(columns=columnas + ['neto'], dtype=np.int64)
+        periodos = pd.to_datetime(self.diarios['dia']).dt.to_period(FRECUENCIAS[frecuencia])
+        serie = self.diarios[columnas].astype(np.int64).groupby(periodos.to_numpy()).sum()
+        serie = serie.reindex(pd.period_range(serie.index.min(), serie.index.max(), freq=FRECUENCIAS[frecuencia]),
+                              fill_value=0)
+        serie['neto'] = serie['ingresos'] + serie['gastos']
+        serie.index = serie.index.start_time.rename('periodo')
+        return serie
+
+    def gasto_movil(self, ventanas=VENTANAS) -> pd.DataFrame:
+        """
+        Gasto (céntimos, negativo) de los últimos 7, 30 y 90 días naturales
+        en cada día, y el ritmo de gasto diario medio de los últimos 30 días.
+        """
+        gastos = self.ingresos_gastos('dia')['gastos']
+        movil = pd.DataFrame({f'gasto_{v}d': gastos.rolling(v, min_periods=1).sum().astype(np.int64)
+                              for v in ventanas}, index=gastos.index)
+        movil['ritmo_diario_30d'] = gastos.rolling(30, min_periods=1).mean().round(2)
+        return movil
+
+    def saldo_acumulado(self) -> pd.DataFrame:
+        """
+        Saldo de cierre de cada cuenta en cada día natural (el último conocido
+        en los días sin movimientos) y su suma en `total`.
+        """
+        if self.saldos.empty:
+            return pd.DataFrame(columns=['total'], dtype='Int64')
+        saldos = self.saldos.assign(dia=pd.to_datetime(self.saldos['dia']))
+        curva = saldos.pivot(index='dia', columns='cuenta', values='saldo')
+        curva = curva.reindex(pd.date_range(curva.index.min(), curva.index.max(), freq='D', name='dia')).ffill()
+        curva['total'] = curva.sum(axis=1, min_count=1)
+        return curva.astype('Int64')
+
+    def variaciones_categoria(self) -> pd.DataFrame:
+        """
+        Gasto mensual (céntimos, negativo) por categoría con su variación
+        respecto al mes anterior (MoM) y al mismo mes del año anterior (YoY),
+        en céntimos y en tanto por uno sobre el gasto de referencia.
+
+        Returns:
+            pd.DataFrame: Columnas mes, categoria, gasto, variacion_mes,
+            variacion_mes_pct, variacion_anio y variacion_anio_pct
+        """
+        columnas = ['mes', 'categoria', 'gasto', 'variacion_mes', 'variacion_mes_pct',
+                    'variacion_anio', 'variacion_anio_pct']
+        gastos = self.diarios[self.diarios['gastos'] != 0]
+        if gastos.empty:
+            return pd.DataFrame(columns=columnas)
+        meses = pd.PeriodIndex(gastos['mes'], freq='M')
+        tabla = gastos['gastos'].astype(np.int64).groupby([meses, gastos['categoria'].to_numpy()]).sum().unstack(fill_value=0)
+        tabla = tabla.reindex(pd.period_range(tabla.index.min(), tabla.index.max(), freq='M'), fill_value=0)
+
+        # Matrices mes x categoría: las variaciones de todas las categorías a la vez
+        actual = tabla.to_numpy()
+        anterior, hace_un_anio = tabla.shift(1).to_numpy(), tabla.shift(12).to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            resultado = pd.DataFrame({
+                'mes': np.repeat(tabla.index.astype(str), tabla.shape[1]),
+                'categoria': np.tile(tabla.columns.to_numpy(dtype=object), tabla.shape[0]),
+                'gasto': actual.ravel(),
+                'variacion_mes': (actual - anterior).ravel(),
+                'variacion_mes_pct': ((actual - anterior) / np.abs(anterior)).ravel(),
+                'variacion_anio': (actual - hace_un_anio).ravel(),
+                'variacion_anio_pct': ((actual - hace_un_anio) / np.abs(hace_un_anio)).ravel(),
+            })
+        resultado = resultado.replace([np.inf, -np.inf], np.nan)
+        # Sin las parejas mes/categoría sin gasto ni en el mes ni en el anterior
+        con_gasto = (resultado['gasto'] != 0) | (resultado['variacion_mes'].fillna(0) != 0)
+        return resultado[con_gasto].astype({'variacion_mes': 'Int64', 'variacion_anio': 'Int64'}).reset_index(drop=True)
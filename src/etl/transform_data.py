@@ -1,21 +1,60 @@
 ##limpieza, categorías, agrupaciones, etc.
 
-from .load_data import LoadData
+from .load_data import LoadData, COLUMNAS_ORIGEN, COLUMNA_CUENTA
+from .duplicate_data import DuplicateData
+from .dinero import a_centimos, es_columna_centimos, euros_a_centimos
 from .logger import Logger
+from .profile_data import ProfileData
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+from typing import Dict, Tuple
+
+# Valores que identifican una fila de cabecera (en minúsculas)
+NOMBRES_CABECERAS = [
+    'fecha operación', 'fecha_operacion', 'fecha operacion', 'f. operativa',
+    'concepto', 'descripción', 'descripcion',
+    'fecha valor', 'fecha_valor', 'f. valor',
+    'importe', 'monto', 'cantidad',
+    'saldo', 'balance',
+    'referencia 1', 'referencia_1', 'ref1',
+    'referencia 2', 'referencia_2', 'ref2'
+]
+
+# Primera columna de las líneas de preámbulo de la exportación del banco
+MARCADORES_PREAMBULO = [
+    'consulta de movimientos', 'cuenta:', 'divisa:', 'titular:', 'selección:', 'seleccion:'
+]
+
+# Fecha y hora de la consulta que aparece en la segunda línea del preámbulo
+PATRON_FECHA_CONSULTA = r'^\d{2}/\d{2}/\d{4} \d{2}:\d{2}(:\d{2})?$'
 
 
 class TransformData:
     def __init__(self, df=None, logger=None):
         self.logger = logger or Logger()
         self.df = None
+        # Informe de la última resolución de duplicados difusos
+        self.fusiones = None
 
     def eliminar_duplicados(self, df):
         self.logger.info("Eliminando duplicados")
-        self.df = df.drop_duplicates()
+        # Las columnas de procedencia no cuentan: la misma fila en dos ficheros es un duplicado.
+        # Cuenta_Id sí forma parte de la clave, así que cuentas distintas nunca colisionan.
+        subset = [c for c in df.columns if c not in COLUMNAS_ORIGEN]
+        self.df = df.drop_duplicates(subset=subset if 0 < len(subset) < len(df.columns) else None)
         self.logger.info(f"Duplicados eliminados: {self.df.shape[0]}")
         return self.df
 
+    def resolver_duplicados(self, df):
+        """
+        Fusiona los duplicados difusos (mismo movimiento con el concepto algo
+        distinto o una referencia rellenada después, ver DuplicateData) sobre
+        movimientos ya tipados. El informe queda en self.fusiones.
+        """
+        self.df, self.fusiones = DuplicateData(self.logger).resolver(df)
+        return self.df
+
     def filtrar_por_fecha(self, df, fecha_inicio, fecha_fin):
         self.logger.info(f"Filtrando por fecha: {fecha_inicio} a {fecha_fin}")
         
@@ -29,22 +68,37 @@ class TransformData:
         self.logger.info(f"Filtrado por fecha: {self.df.shape[0]}")
         return self.df
     
+    def filtrar_por_cuenta(self, df, cuenta_id):
+        self.logger.info(f"Filtrando por cuenta: {cuenta_id}")
+        self.df = df[df[COLUMNA_CUENTA] == cuenta_id]
+        self.logger.info(f"Filtrado por cuenta: {self.df.shape[0]}")
+        return self.df
+
     def filtrar_por_concepto(self, df, concepto):
         self.logger.info(f"Filtrando por concepto: {concepto}")
-        self.df = df[df['Concepto'].str.contains(concepto)]
+        # Sin distinguir mayúsculas y sin fallar con conceptos vacíos; para búsquedas
+        # repetidas sobre todo el histórico, ver ConceptIndex (etl/concept_index.py)
+        self.df = df[df['Concepto'].str.contains(concepto, case=False, na=False)]
         self.logger.info(f"Filtrado por concepto: {self.df.shape[0]}")
         return self.df
     
     def filtrar_por_importe(self, df, importe_minimo, importe_maximo):
+        """
+        Filtra por importe; los límites se indican en euros. Si la columna está
+        en céntimos, los límites se pasan a céntimos y la comparación es entera.
+        """
         self.logger.info(f"Filtrando por importe: {importe_minimo} a {importe_maximo}")
-        self.df = df[df['Importe'] >= importe_minimo]
-        self.df = df[df['Importe'] <= importe_maximo]
+        if es_columna_centimos(df, 'Importe'):
+            importe_minimo, importe_maximo = euros_a_centimos(importe_minimo), euros_a_centimos(importe_maximo)
+        self.df = df[(df['Importe'] >= importe_minimo) & (df['Importe'] <= importe_maximo)]
         self.logger.info(f"Filtrado por importe: {self.df.shape[0]}")
         return self.df
     
     def ordenar_por_fecha(self, df):
         self.logger.info("Ordenando por fecha")
-        self.df = df.sort_values(by='Fecha Operación')
+        # Con varias cuentas se ordena dentro de cada una
+        orden = [COLUMNA_CUENTA, 'Fecha Operación'] if COLUMNA_CUENTA in df.columns else 'Fecha Operación'
+        self.df = df.sort_values(by=orden, kind='mergesort')
         self.logger.info(f"Ordenado por fecha: {self.df.shape[0]}")
         return self.df
 
@@ -52,15 +106,18 @@ class TransformData:
         self.logger.info(f"Transformando campo '{campo}' a tipo '{tipo}'")
         try:
            
-            if tipo == 'float':
+            if tipo == 'centimos':
+                # Céntimos enteros (int64) parseados directamente del texto `5,847.95`
+                df[campo] = a_centimos(df[campo])
+            elif tipo == 'float':
                 # Reemplazar comas de miles y convertir a float
                 df[campo] = df[campo].astype(str).str.replace(',', '', regex=False).astype(float)
             elif tipo == 'datetime':
                 # Usar pd.to_datetime para convertir a fecha
                 df[campo] = pd.to_datetime(df[campo], dayfirst=True, errors='coerce')
             elif tipo == 'text':
-                # Convertir a texto (string)
-                df[campo] = df[campo].astype(str)
+                # Convertir a texto (string) sin convertir los vacíos en 'nan'
+                df[campo] = df[campo].astype(str).where(df[campo].notna())
             else:
                 # Conversión estándar para otros tipos
                 df = df.astype({campo: tipo})
@@ -73,12 +130,89 @@ class TransformData:
             raise TypeError(f"Error while type casting for column '{campo}'")
 
     
-    def resumen(self, df):
-        self.logger.info("Generando resumen")
-        self.logger.info(f"Numero total de movimientos:\n {df.shape[0]} ")
-        self.logger.info(f"Resumen: \n{df.describe().to_string()}")
-        # self.logger.info(f"Resumen por concepto: \n{df.groupby('Concepto').describe().to_string()}")
-        self.logger.info(f"Conteo por concepto: \n{df['Concepto'].value_counts().to_string()}")
+    def resumen(self, df, titulo='Resumen'):
+        """
+        Perfila los movimientos en una sola pasada (ver ProfileData) y muestra
+        el resultado. Para varios resúmenes del mismo DataFrame (un mes y el
+        total, por ejemplo) es mejor perfilar una vez y combinar los perfiles.
+
+        Returns:
+            Perfil: Perfil de todos los movimientos
+        """
+        perfilador = ProfileData(self.logger)
+        perfilador.actualizar(df)
+        perfil = perfilador.total()
+        perfilador.registrar(perfil, titulo)
+        return perfil
+
+    def limpiar_filas_basura(self, df, columna_importe='Importe') -> Tuple[pd.DataFrame, Dict[str, int]]:
+        """
+        Elimina en una sola pasada las cabeceras, líneas de preámbulo y filas
+        vacías repartidas por todo el DataFrame (por ejemplo, al concatenar
+        varias exportaciones), además de las filas con Importe no numérico.
+
+        Las máscaras se calculan columna a columna sobre el DataFrame original;
+        solo se copia el resultado final con las filas válidas.
+
+        Args:
+            df: DataFrame original
+            columna_importe: Columna con el importe (se omite si no existe)
+
+        Returns:
+            Tuple[pd.DataFrame, Dict[str, int]]: DataFrame limpio y número de
+            filas eliminadas por motivo (vacia, preambulo, cabecera, importe_invalido)
+        """
+        n = len(df)
+        vacia = np.ones(n, dtype=bool)
+        cabecera = np.zeros(n, dtype=bool)
+        preambulo = np.zeros(n, dtype=bool)
+
+        for i, col in enumerate(df.columns):
+            serie = df[col]
+            if is_numeric_dtype(serie) or is_datetime64_any_dtype(serie):
+                vacia = vacia & serie.isna().to_numpy()
+                continue
+
+            # Se normalizan solo los valores distintos y se propagan con los códigos
+            codigos, unicos = pd.factorize(serie)
+            texto = pd.Series(unicos, dtype=object).astype(str).str.strip().str.lower()
+            nulos = codigos < 0
+            codigos = np.where(nulos, 0, codigos)
+
+            def expandir(mascara_unicos):
+                if len(mascara_unicos) == 0:
+                    return np.zeros(n, dtype=bool)
+                return np.asarray(mascara_unicos, dtype=bool)[codigos] & ~nulos
+
+            vacia = vacia & (nulos | expandir(texto == ''))
+            cabecera = cabecera | expandir(texto.isin(NOMBRES_CABECERAS))
+            if i == 0:
+                # El preámbulo solo se identifica por la primera columna
+                preambulo = expandir(texto.isin(MARCADORES_PREAMBULO)
+                                     | texto.str.match(PATRON_FECHA_CONSULTA))
+
+        invalido = np.zeros(n, dtype=bool)
+        if columna_importe in df.columns:
+            importe = df[columna_importe]
+            if not is_numeric_dtype(importe):
+                importe = pd.to_numeric(importe.astype(str).str.replace(',', '', regex=False), errors='coerce')
+            invalido = importe.isna().to_numpy()
+
+        # Cada fila se cuenta una sola vez, por el primer motivo que cumple
+        preambulo = preambulo & ~vacia
+        cabecera = cabecera & ~(vacia | preambulo)
+        invalido = invalido & ~(vacia | preambulo | cabecera)
+        conteos = {
+            'vacia': int(vacia.sum()),
+            'preambulo': int(preambulo.sum()),
+            'cabecera': int(cabecera.sum()),
+            'importe_invalido': int(invalido.sum()),
+        }
+
+        descartar = vacia | preambulo | cabecera | invalido
+        df_limpio = df[~descartar] if descartar.any() else df
+        self.logger.info(f"🧹 Limpieza: {len(df_limpio)} filas válidas de {n} originales, eliminadas {conteos}")
+        return df_limpio, conteos
 
     def limpiar_dataframe_para_carga(self, df) -> pd.DataFrame:
         """
@@ -91,66 +225,9 @@ class TransformData:
             pd.DataFrame: DataFrame limpio listo para cargar
         """
         try:
-            df_limpio = df.copy()
-            self.logger.info(f"🧹 Iniciando limpieza de DataFrame con {len(df_limpio)} filas")
-            
-            # 1. Verificar si la primera fila contiene cabeceras
-            if len(df_limpio) > 0:
-                primera_fila = df_limpio.iloc[0]
-                tiene_cabeceras = False
-                
-                # Detectar si la primera fila contiene nombres de columnas
-                # Buscar coincidencias exactas o parciales con nombres de columnas esperados
-                nombres_cabeceras = [
-                    'fecha operación', 'fecha_operacion', 'fecha operacion',
-                    'concepto', 'descripción', 'descripcion',
-                    'fecha valor', 'fecha_valor', 'fecha valor',
-                    'importe', 'monto', 'cantidad',
-                    'saldo', 'balance',
-                    'referencia 1', 'referencia_1', 'ref1',
-                    'referencia 2', 'referencia_2', 'ref2'
-                ]
-                
-                # Verificar cada valor en la primera fila
-                for col in df_limpio.columns:
-                    valor_primera_fila = str(primera_fila[col]).lower().strip()
-                    self.logger.info(f"   Verificando columna '{col}': '{valor_primera_fila}'")
-                    
-                    if valor_primera_fila in nombres_cabeceras:
-                        tiene_cabeceras = True
-                        self.logger.info(f"   ✅ Detectada cabecera en columna '{col}': '{valor_primera_fila}'")
-                        break
-                
-                # 2. Eliminar primera fila si contiene cabeceras
-                if tiene_cabeceras:
-                    self.logger.info("🧹 Detectadas cabeceras en primera fila, eliminando...")
-                    df_limpio = df_limpio.iloc[1:].reset_index(drop=True)
-                    self.logger.info(f"   Filas restantes después de eliminar cabeceras: {len(df_limpio)}")
-                else:
-                    self.logger.info("✅ No se detectaron cabeceras en la primera fila")
-            
-            # 3. Filtrar filas con datos válidos
-            if len(df_limpio) > 0:
-                # Eliminar filas donde Importe no sea numérico
-                filas_antes = len(df_limpio)
-                df_limpio = df_limpio[pd.to_numeric(df_limpio['Importe'], errors='coerce').notna()]
-                filas_despues = len(df_limpio)
-                
-                if filas_antes != filas_despues:
-                    self.logger.info(f"   🗑️ Eliminadas {filas_antes - filas_despues} filas con Importe inválido")
-                
-                # 4. Eliminar filas completamente vacías
-                filas_antes = len(df_limpio)
-                df_limpio = df_limpio.dropna(how='all')
-                filas_despues = len(df_limpio)
-                
-                if filas_antes != filas_despues:
-                    self.logger.info(f"   🗑️ Eliminadas {filas_antes - filas_despues} filas completamente vacías")
-            
-            self.logger.info(f"✅ DataFrame limpio: {len(df_limpio)} filas válidas de {len(df)} originales")
+            df_limpio, _ = self.limpiar_filas_basura(df)
             return df_limpio
-            
+
         except Exception as e:
             self.logger.error(f"❌ Error al limpiar DataFrame: {e}")
             return df
-        
\ No newline at end of file
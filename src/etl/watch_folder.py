@@ -0,0 +1,349 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from .exportaciones import EXTENSIONES, huella_archivo
+from .logger import Logger
+
+# Este módulo solo usa la librería estándar: la carga y la transformación de
+# cada exportación llegan como funciones, así el vigilante no importa pandas.
+
+# Eventos de inotify que interesan: fichero creado, modificado, cerrado tras
+# escribir o movido al directorio (las descargas del navegador se renombran al terminar)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+EVENTOS_INOTIFY = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# Cabecera de cada evento leído del descriptor: wd, mask, cookie, len
+CABECERA_EVENTO = struct.Struct('iIII')
+
+# Nombre del registro de exportaciones ya cargadas dentro del directorio de caché
+REGISTRO_PROCESADOS = 'procesados.json'
+
+
+def es_exportacion(nombre: str) -> bool:
+    """
+    Indica si un nombre de fichero tiene la extensión de una exportación del banco.
+    """
+    return not nombre.startswith('.') and Path(nombre).suffix.lower() in EXTENSIONES
+
+
+def firma_archivo(ruta) -> Optional[Tuple[int, int]]:
+    """
+    Tamaño y fecha de modificación (ns) de un fichero, o None si ya no existe.
+    """
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return estado.st_size, estado.st_mtime_ns
+
+
+class VigilanteInotify:
+    """
+    Espera cambios en un directorio con inotify (Linux) a través de la libc,
+    sin dependencias externas. Mientras no hay eventos el proceso queda
+    bloqueado en select() y no consume CPU.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = Path(directorio)
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 ha fallado")
+        if libc.inotify_add_watch(self.fd, os.fsencode(self.directorio), EVENTOS_INOTIFY) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"No se puede vigilar {self.directorio}")
+        # Tubería para despertar el select() desde otro hilo al detener el vigilante
+        self._lectura, self._escritura = os.pipe()
+
+    def esperar(self, timeout: Optional[float] = None) -> Set[str]:
+        """
+        Bloquea hasta que hay eventos o vence el timeout (None: sin límite).
+
+        Returns:
+            Set[str]: Nombres de los ficheros que han cambiado
+        """
+        listos, _, _ = select.select([self.fd, self._lectura], [], [], timeout)
+        if self._lectura in listos:
+            os.read(self._lectura, 64)
+        if self.fd not in listos:
+            return set()
+        nombres = set()
+        try:
+            datos = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return nombres
+        posicion = 0
+        while posicion + CABECERA_EVENTO.size <= len(datos):
+            _, _, _, longitud = CABECERA_EVENTO.unpack_from(datos, posicion)
+            posicion += CABECERA_EVENTO.size
+            nombre = datos[posicion:posicion + longitud].rstrip(b'\0')
+            posicion += longitud
+            if nombre:
+                nombres.add(os.fsdecode(nombre))
+        return nombres
+
+    def despertar(self):
+        os.write(self._escritura, b'x')
+
+    def cerrar(self):
+        for fd in (self.fd, self._lectura, self._escritura):
+            os.close(fd)
+
+
+class VigilanteSondeo:
+    """
+    Alternativa a inotify para otros sistemas o sistemas de ficheros de red:
+    compara cada `intervalo` segundos el tamaño y la fecha de modificación de
+    los ficheros del directorio.
+    """
+
+    def __init__(self, directorio, intervalo: float = 2.0):
+        self.directorio = Path(directorio)
+        self.intervalo = intervalo
+        self._parada = threading.Event()
+        self._firmas = self._explorar()
+
+    def _explorar(self) -> Dict[str, Tuple[int, int]]:
+        firmas = {}
+        with os.scandir(self.directorio) as entradas:
+            for entrada in entradas:
+                try:
+                    if entrada.is_file():
+                        estado = entrada.stat()
+                        firmas[entrada.name] = (estado.st_size, estado.st_mtime_ns)
+                except FileNotFoundError:
+                    continue
+        return firmas
+
+    def esperar(self, timeout: Optional[float] = None) -> Set[str]:
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            firmas = self._explorar()
+            cambios = {nombre for nombre, firma in firmas.items() if self._firmas.get(nombre) != firma}
+            self._firmas = firmas
+            if cambios:
+                return cambios
+            espera = self.intervalo if limite is None else min(self.intervalo, limite - time.monotonic())
+            if espera <= 0 or self._parada.wait(espera):
+                self._parada.clear()
+                return set()
+
+    def despertar(self):
+        self._parada.set()
+
+    def cerrar(self):
+        pass
+
+
+def crear_vigilante(directorio, sondeo: bool = False, intervalo: float = 2.0, logger=None):
+    """
+    Vigilante de inotify en Linux; si no está disponible (u otro sistema, o
+    `sondeo=True`), uno de sondeo periódico.
+    """
+    logger = logger or Logger()
+    if not sondeo and sys.platform.startswith('linux'):
+        try:
+            return VigilanteInotify(directorio)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify no disponible ({e}); se vigila por sondeo cada {intervalo}s")
+    return VigilanteSondeo(directorio, intervalo)
+
+
+class WatchFolder:
+    """
+    Demonio que vigila el directorio de exportaciones y carga solo las nuevas
+    o cambiadas.
+
+    Un fichero se procesa cuando su tamaño y fecha de modificación no cambian
+    durante `espera_estabilidad` segundos (así no se leen exportaciones a
+    medio escribir) y su SHA-1 no coincide con el de la última carga. La
+    lectura y la transformación (`procesar`) se reparten en un pool acotado
+    de hilos; la carga (`cargar`) se hace siempre en el hilo principal, de una
+    en una, porque comparte la conexión a la base de datos.
+    """
+
+    def __init__(self, directorio,
+                 procesar: Callable,
+                 cargar: Callable,
+                 logger=None,
+                 directorio_cache=None,
+                 max_workers: int = 2,
+                 espera_estabilidad: float = 2.0,
+                 vigilante=None):
+        """
+        Args:
+            directorio: Directorio de exportaciones a vigilar
+            procesar: Función ruta -> DataFrame limpio (se ejecuta en el pool)
+            cargar: Función (ruta, DataFrame) -> bool que guarda los movimientos
+            logger: Logger del pipeline
+            directorio_cache: Directorio donde se guarda el registro de exportaciones cargadas
+            max_workers: Hilos del pool; como mucho hay el doble de ficheros en curso
+            espera_estabilidad: Segundos sin cambios antes de dar un fichero por terminado
+            vigilante: VigilanteInotify o VigilanteSondeo (por defecto, crear_vigilante)
+        """
+        self.logger = logger or Logger()
+        self.directorio = Path(directorio)
+        self.procesar = procesar
+        self.cargar = cargar
+        self.max_workers = max_workers
+        self.espera_estabilidad = espera_estabilidad
+        self.vigilante = vigilante or crear_vigilante(self.directorio, logger=self.logger)
+        self.ruta_registro = Path(directorio_cache or self.directorio) / REGISTRO_PROCESADOS
+        self.procesados: Dict[str, str] = self._leer_registro()
+        # Ficheros vistos que aún no se han dado por estables: nombre -> (firma, desde)
+        self.pendientes: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        # Ficheros en el pool: nombre -> (huella, future)
+        self.en_curso: Dict[str, tuple] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='watch')
+        self._parada = threading.Event()
+        self._cerrado = False
+        for nombre in os.listdir(self.directorio):
+            self._anotar(nombre)
+
+    def _leer_registro(self) -> Dict[str, str]:
+        try:
+            with open(self.ruta_registro, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _guardar_registro(self):
+        self.ruta_registro.parent.mkdir(parents=True, exist_ok=True)
+        temporal = self.ruta_registro.with_suffix('.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.procesados, f, indent=2, ensure_ascii=False)
+        os.replace(temporal, self.ruta_registro)
+
+    def _anotar(self, nombre: str):
+        """
+        Registra un cambio en un fichero; el plazo de estabilidad empieza de nuevo.
+        """
+        if not es_exportacion(nombre):
+            return
+        firma = firma_archivo(self.directorio / nombre)
+        if firma is None:
+            self.pendientes.pop(nombre, None)
+        elif nombre not in self.pendientes or self.pendientes[nombre][0] != firma:
+            self.pendientes[nombre] = (firma, time.monotonic())
+
+    def _revisar_pendientes(self) -> Optional[float]:
+        """
+        Envía al pool los ficheros estables que hayan cambiado desde su última carga.
+
+        Returns:
+            Optional[float]: Segundos hasta que el próximo pendiente pueda estar
+            estable, o None si no queda ninguno
+        """
+        ahora = time.monotonic()
+        proximo = None
+        for nombre, (firma, desde) in list(self.pendientes.items()):
+            actual = firma_archivo(self.directorio / nombre)
+            if actual is None:
+                del self.pendientes[nombre]
+                continue
+            if actual != firma:
+                self.pendientes[nombre] = (actual, ahora)
+                desde = ahora
+            restante = self.espera_estabilidad - (ahora - desde)
+            # Un fichero que sigue en el pool espera a que termine su versión anterior
+            if restante > 0 or nombre in self.en_curso or len(self.en_curso) >= 2 * self.max_workers:
+                espera = max(restante, 0.05)
+                proximo = espera if proximo is None else min(proximo, espera)
+                continue
+            del self.pendientes[nombre]
+            huella = huella_archivo(self.directorio / nombre)
+            if self.procesados.get(nombre) == huella:
+                self.logger.info(f"Exportación sin cambios, se omite: {nombre}")
+                continue
+            self.logger.info(f"Exportación nueva o cambiada: {nombre}")
+            self.en_curso[nombre] = (huella, self._pool.submit(self.procesar, self.directorio / nombre))
+        return proximo
+
+    def _recoger_resultados(self) -> int:
+        """
+        Carga, en el hilo principal, los ficheros que el pool ya ha procesado.
+
+        Returns:
+            int: Número de exportaciones cargadas
+        """
+        cargadas = 0
+        for nombre, (huella, futuro) in list(self.en_curso.items()):
+            if not futuro.done():
+                continue
+            del self.en_curso[nombre]
+            try:
+                if self.cargar(self.directorio / nombre, futuro.result()):
+                    self.procesados[nombre] = huella
+                    self._guardar_registro()
+                    cargadas += 1
+                    print(f"📥 Exportación cargada: {nombre}")
+                else:
+                    self.logger.error(f"No se ha podido cargar {nombre}; se reintentará cuando cambie")
+            except Exception as e:
+                self.logger.error(f"Error procesando {nombre}: {e}")
+        return cargadas
+
+    def ciclo(self, timeout: Optional[float] = None) -> int:
+        """
+        Una vuelta del demonio: espera cambios (como mucho `timeout` segundos o
+        lo que falte para que un pendiente esté estable), envía al pool los
+        ficheros listos y carga los ya procesados.
+
+        Returns:
+            int: Número de exportaciones cargadas en esta vuelta
+        """
+        cargadas = self._recoger_resultados()
+        proximo = self._revisar_pendientes()
+        if self.en_curso:
+            # Con ficheros en el pool se despierta a menudo para recoger resultados
+            proximo = 0.1 if proximo is None else min(proximo, 0.1)
+        if timeout is not None:
+            proximo = timeout if proximo is None else min(proximo, timeout)
+        for nombre in self.vigilante.esperar(proximo):
+            self._anotar(nombre)
+        return cargadas + self._recoger_resultados()
+
+    def ejecutar(self) -> int:
+        """
+        Vigila el directorio hasta que se llama a detener() o se pulsa Ctrl+C.
+
+        Returns:
+            int: Número total de exportaciones cargadas
+        """
+        print(f"👀 Vigilando {self.directorio} ({type(self.vigilante).__name__}, {self.max_workers} hilos)")
+        total = 0
+        try:
+            while not self._parada.is_set():
+                total += self.ciclo()
+        except KeyboardInterrupt:
+            print("🛑 Vigilancia interrumpida")
+        finally:
+            self.cerrar()
+        return total
+
+    def detener(self):
+        self._parada.set()
+        self.vigilante.despertar()
+
+    def cerrar(self):
+        if self._cerrado:
+            return
+        self._cerrado = True
+        self._pool.shutdown(wait=True)
+        self._recoger_resultados()
+        self.vigilante.cerrar()
@@ -5,87 +5,50 @@ Este script implementa un pipeline ETL (Extract, Transform, Load) para procesar
 archivos de gastos en diferentes formatos.
 """
 
-import os
 import sys
 from pathlib import Path
 
 # Agregar el directorio src al path para importaciones
 sys.path.append(str(Path(__file__).parent))
 
-from etl.load_data import LoadData
-from etl.transform_data import TransformData
 from etl.logger import Logger
-from etl.DB_Gastos import cargar_gastos_desde_dataframe
-from config.database_conector import DatabaseConnector
 
 
-def main():
+def main(data_dir=None):
     """
     Función principal que ejecuta el pipeline ETL completo.
+
+    Equivale a `python -m src ingest --resumen`; las importaciones pesadas se
+    hacen aquí para que importar este módulo no tenga coste.
     """
+    from etl.pipeline import crear_cargador, guardar_cuentas, ingestar
+    from etl.profile_data import ProfileData
+    from etl.runtime_config import cargar_configuracion
+
     # Configuración inicial
     logger = Logger()
     logger.info("Iniciando pipeline de procesamiento de datos de gastos")
-    
-    # Definir columnas esperadas en los datos
-    columns = [
-        'Fecha Operación', 
-        'Concepto', 
-        'Fecha Valor', 
-        'Importe', 
-        'Saldo', 
-        'Referencia 1',
-        'Referencia 2'
-    ]
-    
-    try:
-        # 1. EXTRACT - Cargar datos
-        logger.info("=== FASE 1: EXTRACT ===")
-        loader = LoadData(columns, logger)
-        
-        # Directorio de datos
-        data_dir = Path("D:\WORKSPACE\data-gastos-pipeline\data")
-        
-        # Procesar todos los archivos en el directorio data
-        for file_path in data_dir.glob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in ['.csv', '.txt', '.xls', '.xlsx']:
-                logger.info(f"Procesando archivo: {file_path}")
-                
-                # Cargar datos del archivo
-                gastos_2025 = loader.load(str(file_path))
-                
-                
-                # Agregar al DataFrame acumulado
-                loader.agregar_datos_al_dataframe(gastos_2025)
-        
-        # Mostrar vista previa de todos los datos cargados
-        # loader.view_data()
-        
-        # 2. TRANSFORM - Transformar datos
-        logger.info("=== FASE 2: TRANSFORM ===")
-        transformer = TransformData(loader.df, logger)
-        
-        # Aplicar transformaciones básicas
-        df_clean = transformer.eliminar_duplicados(loader.df)
-        df_clean = transformer.transformar_campos(df_clean, 'Importe', 'float')
-        df_clean = transformer.transformar_campos(df_clean, 'Saldo', 'float')
-        df_clean = transformer.transformar_campos(df_clean, 'Fecha Operación', 'datetime')
-        df_clean = transformer.transformar_campos(df_clean, 'Fecha Valor', 'datetime')
-        df_clean = transformer.transformar_campos(df_clean, 'Referencia 1', 'str')
-        df_clean = transformer.transformar_campos(df_clean, 'Referencia 2', 'str')
-        df_clean = transformer.eliminar_duplicados(df_clean)
 
-        # logger.info(f"Datos transformados: \n{df_clean.to_string()}")
-        # loader.view_data()
-        
-        # Ejemplo de filtros (comentados para uso opcional)
-        df_abril = transformer.filtrar_por_fecha(df_clean, '2025-04-01', '2025-04-30')
-        df_abril = transformer.ordenar_por_fecha(df_abril)
+    try:
+        # 1. EXTRACT + 2. TRANSFORM - Cargar, conciliar y limpiar datos
+        # Directorio de datos: argumento, variable DATA_DIR, config.yaml o data/ del repositorio;
+        # el modo de ejecución (memoria, bloques o paralelo) se elige según config.yaml
+        # 3. PERFIL - Se perfila durante la ingesta (en modo bloques, bloque a
+        # bloque); los perfiles por fichero y mes se combinan para el resumen
+        # de abril y el total sin volver a recorrer filas
+        perfilador = ProfileData(logger)
+        configuracion = cargar_configuracion()
+        loader = crear_cargador(configuracion.directorio_cache, logger)
+        df_clean = ingestar(data_dir, logger, loader=loader, configuracion=configuracion, perfilador=perfilador)
+        guardar_cuentas(loader)
+        if df_clean.empty:
+            return
+
+        abril = perfilador.por_mes().get('2025-04')
+        if abril is not None:
+            perfilador.registrar(abril, 'Abril 2025')
+        perfilador.registrar(perfilador.total(), 'Total')
 
-        transformer.resumen(df_abril)
-        transformer.resumen(df_clean)
-  
-        
     except Exception as e:
         logger.error(f"Error en el pipeline: {str(e)}")
         sys.exit(1)
@@ -1,86 +1,172 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-import sys
+
 from pathlib import Path
-from ..config.database_conector import DatabaseConnector
 
-try:
-    with DatabaseConnector() as db:
-        # Probar conexión básica
-        result = db.execute_query("SELECT version();")
+# Meses con vista vw_gastos2025_<mes> (ver src/sql/Create views of months.sql)
+MESES = ['enero', 'febrero', 'marzo', 'abril', 'mayo']
+
+# Directorio donde se guardan los gráficos
+DIRECTORIO_GRAFICOS = Path(__file__).parent
+
+
+def cargar_gastos_mes(db, mes: str = 'abril'):
+    """
+    Carga los movimientos de un mes (el mismo rango que su vista), ordenados por fecha.
+
+    Args:
+        db: Almacén (PostgreSQL o SQLite, ver config/storage.py) o DatabaseConnector
+        mes: Nombre del mes en minúsculas (enero, febrero, ...)
+
+    Returns:
+        pd.DataFrame: Movimientos del mes
+    """
+    from config.storage import como_almacen
+    from etl.dinero import a_centimos, centimos_a_euros
+
+    if mes not in MESES:
+        raise ValueError(f"Mes sin vista definida: {mes}")
+    numero = MESES.index(mes) + 1
+    # El almacén devuelve los importes en céntimos enteros (sumas exactas);
+    # en euros (float) solo para dibujar
+    gastos = como_almacen(db).movements(f'2025-{numero:02d}-01', f'2025-{numero + 1:02d}-01')
+    gastos['importe_centimos'] = a_centimos(gastos['importe'])
+    gastos['importe'] = centimos_a_euros(gastos['importe_centimos'])
+    print(f"📊 Datos de {mes} cargados: {len(gastos)} filas")
+    return gastos
+
+
+def resumen_mes(gastos, mes: str = 'abril') -> dict:
+    """
+    Muestra y devuelve el resumen de un mes: número de gastos, total y día con más gastos.
+    Los totales se suman en céntimos (columna importe_centimos).
+    """
+    from etl.dinero import formatear_euros
+
+    print(gastos.head())
+
+    print(f"🔍 Analizando gastos de {mes}...")
+    print(gastos.describe())
+    nuemero_gatos = int(gastos['fecha_operacion'].count())
+    print(f"📈 Número total de gastos en {mes}: {nuemero_gatos}")
+    gasto_total = int(gastos['importe_centimos'].sum())
+    print(f"💰 Gasto total en {mes}: {formatear_euros(gasto_total)}")
+    resumen = {'numero_gastos': nuemero_gatos, 'gasto_total': gasto_total}
+    if nuemero_gatos:
+        dia_mas_gastos = gastos['fecha_operacion'].dt.day.value_counts().idxmax()
+        gasto_dia_mas_gastos = int(gastos[gastos['fecha_operacion'].dt.day == dia_mas_gastos]['importe_centimos'].sum())
+        print(f"📅 Día con más gastos: {dia_mas_gastos} de {mes}, se gasto:{formatear_euros(gasto_dia_mas_gastos)} ")
+        resumen.update(dia_mas_gastos=int(dia_mas_gastos), gasto_dia_mas_gastos=gasto_dia_mas_gastos)
+    return resumen
+
+
+def histograma_importes(gastos, mes: str = 'abril', directorio=DIRECTORIO_GRAFICOS, mostrar: bool = False) -> Path:
+    '''
+    Un histograma o boxplot para ver:
+
+        Si haces muchos pequeños pagos o algunos grandes.
 
+        Detectar valores atípicos (por ejemplo, una transferencia grande o una compra puntual).
+    '''
+    import matplotlib
+    if not mostrar:
+        matplotlib.use('Agg')  # sin ventana: solo se guarda el fichero
+    import matplotlib.pyplot as plt
+
+    # Histograma de los importes de los gastos
+    plt.figure(figsize=(12, 6)) # tamaño del gráfico
+    plt.hist(gastos['importe'], bins=150, color='purple', alpha=0.7) # color y transparencia de las barras
+    plt.title(f'Histograma de importes de gastos en {mes} 2025') # título del gráfico
+    plt.xlabel('Importe (€)') # etiqueta del eje X
+    plt.ylabel('Frecuencia') # etiqueta del eje Y
+    plt.grid(axis='y', linestyle='--', alpha=0.3) # líneas de la cuadrícula en el eje Y
+    plt.tight_layout() # ajusta el diseño para que no se solapen los elementos
+    print("📊 Histograma de importes de gastos generado.")
+    ruta = Path(directorio) / f'histograma_importes_{mes}.png'
+    plt.savefig(ruta)# Guardar el gráfico
+    if mostrar:
+        plt.show()# Mostrar el gráfico
+    plt.close()
+    return ruta
+
+
+def gastos_por_dia(gastos, mes: str = 'abril', directorio=DIRECTORIO_GRAFICOS, mostrar: bool = False) -> Path:
+    """
+    Gráfico de barras con los gastos por día del mes.
+    """
+    import matplotlib
+    if not mostrar:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    ##Mostraremos un grafico con los gastos por dia
+    gastos_dia = gastos.groupby(gastos['fecha_operacion'].dt.day)['importe'].sum().reset_index() # agrupo por día y sumo los importes
+    gastos_dia.columns = ['dia', 'importe'] # renombro las columnas para mayor claridad
+    plt.figure(figsize=(12, 6)) # tamaño del gráfico
+    plt.bar(gastos_dia['dia'], gastos_dia['importe'], color='skyblue') # color de las barras
+    plt.title(f'Gastos por día en {mes} 2025')   # título del gráfico
+    plt.xlabel('Día del mes') # etiqueta del eje X
+    plt.ylabel('Importe total (€)') # etiqueta del eje Y
+    plt.xticks(gastos_dia['dia']) # muestro todos los días del mes
+    plt.grid(axis='y', linestyle='--', alpha=0.3) # líneas de la cuadrícula en el eje Y
+    plt.tight_layout() # ajusta el diseño para que no se solapen los elementos
+    print("📊 Gráfico de gastos por día generado.")
+    ruta = Path(directorio) / f'gastos_por_dia_{mes}.png'
+    plt.savefig(ruta)# Guardar el gráfico
+    if mostrar:
+        plt.show()# Mostrar el gráfico
+    plt.close()
+    return ruta
+
+
+def gastos_por_concepto(gastos, mes: str = 'abril', directorio=DIRECTORIO_GRAFICOS, mostrar: bool = False) -> Path:
+    """
+    Gráfico de barras con los gastos agrupados por concepto.
+    """
+    import matplotlib
+    if not mostrar:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    ##rafico de gasto por condepto
+    gato_concepto = gastos.groupby('concepto')['importe'].sum().reset_index() # agrupo por concepto y sumo los importes
+    gato_concepto.columns = ['concepto', 'importe'] # renombro las columnas para mayor claridad
+    plt.figure(figsize=(12, 6)) # tamaño del gráfico
+    plt.bar(gato_concepto['concepto'], gato_concepto['importe'], color='lightgreen') # color de las barras
+    plt.title(f'Gastos por concepto en {mes} 2025')   # título del gráfico
+    plt.xlabel('Concepto') # etiqueta del eje X
+    plt.ylabel('Importe total (€)') # etiqueta del eje Y
+    plt.xticks(rotation=45, ha='right') # rotación de las etiquetas del eje X para mejor legibilidad
+    plt.grid(axis='y', linestyle='--', alpha=0.3) # líneas de la cuadrícula en el eje Y
+    plt.tight_layout() # ajusta el diseño para que no se solapen los elementos
+    print("📊 Gráfico de gastos por concepto generado.")
+    ruta = Path(directorio) / f'gastos_por_concepto_{mes}.png'
+    plt.savefig(ruta)# Guardar el gráfico
+    if mostrar:
+        plt.show()# Mostrar el gráfico
+    plt.close()
+    return ruta
+
+
+def main(mes: str = 'abril', graficos: bool = True, mostrar: bool = True, almacen=None):
+    """
+    Analiza un mes desde la base de datos (la configurada si no se pasa
+    `almacen`) y genera sus gráficos.
+    """
+    from config.storage import abrir_almacen
+
+    with almacen or abrir_almacen() as almacen:
+        # Probar conexión básica
+        version = almacen.version()
         print("✅ Conexión exitosa!")
-        print(f"📋 Versión de PostgreSQL: {result[0]['version']}")
- 
-except Exception as e:
-    print(f"❌ Error al conectar a la base de datos: {e}")
-
-db = DatabaseConnector()
-
-gastos_abril = pd.DataFrame()
-gastos_abril = pd.read_sql("""
-SELECT * FROM vw_gastos2025_abril ORDER BY fecha_operacion asc;""", db.get_connection())
-print(f"📊 Datos de abril cargados: {len(gastos_abril)} filas")
-print(gastos_abril.head())
-
-print("🔍 Analizando gastos de abril...")
-print(gastos_abril.describe())
-nuemero_gatos = gastos_abril.describe()['fecha_operacion']['count']
-print(f"📈 Número total de gastos en abril: {nuemero_gatos}")
-gasto_total = gastos_abril['importe'].sum()
-print(f"💰 Gasto total en abril: {gastos_abril['importe'].sum()}")
-dia_mas_gastos = gastos_abril['fecha_operacion'].dt.day.value_counts().idxmax() 
-gasto_dia_mas_gastos = gastos_abril[gastos_abril['fecha_operacion'].dt.day == dia_mas_gastos]['importe'].sum()
-print(f"📅 Día con más gastos: {dia_mas_gastos} de abril, se gasto:{gasto_dia_mas_gastos} ")
-
-#Graficos
-
-# ##Mostraremos un grafico con los gastos por dia
-# gastos_por_dia = gastos_abril.groupby(gastos_abril['fecha_operacion'].dt.day)['importe'].sum().reset_index() # agrupo por día y sumo los importes
-# gastos_por_dia.columns = ['dia', 'importe'] # renombro las columnas para mayor claridad
-# plt.figure(figsize=(12, 6)) # tamaño del gráfico
-# plt.bar(gastos_por_dia['dia'], gastos_por_dia['importe'], color='skyblue') # color de las barras
-# plt.title('Gastos por día en abril 2025')   # título del gráfico
-# plt.xlabel('Día del mes') # etiqueta del eje X
-# plt.ylabel('Importe total (€)') # etiqueta del eje Y
-# plt.xticks(gastos_por_dia['dia']) # muestro todos los días del mes
-# plt.grid(axis='y', linestyle='--', alpha=0.3) # líneas de la cuadrícula en el eje Y
-# plt.tight_layout() # ajusta el diseño para que no se solapen los elementos
-# print("📊 Gráfico de gastos por día generado.")
-# plt.savefig(Path(__file__).parent / 'gastos_por_dia_abril.png')# Guardar el gráfico
-# plt.show()# Mostrar el gráfico
-
-# ##rafico de gasto por condepto
-# gato_concepto = gastos_abril.groupby('concepto')['importe'].sum().reset_index() # agrupo por concepto y sumo los importes
-# gato_concepto.columns = ['concepto', 'importe'] # renombro las columnas para mayor claridad
-# plt.figure(figsize=(12, 6)) # tamaño del gráfico    
-# plt.bar(gato_concepto['concepto'], gato_concepto['importe'], color='lightgreen') # color de las barras
-# plt.title('Gastos por concepto en abril 2025')   # título del gráfico   
-# plt.xlabel('Concepto') # etiqueta del eje X
-# plt.ylabel('Importe total (€)') # etiqueta del eje Y
-# plt.xticks(rotation=45, ha='right') # rotación de las etiquetas del eje X para mejor legibilidad
-# plt.grid(axis='y', linestyle='--', alpha=0.3) # líneas de la cuadrícula en el eje Y
-# plt.tight_layout() # ajusta el diseño para que no se solapen los elementos
-# print("📊 Gráfico de gastos por concepto generado.")    
-# plt.savefig(Path(__file__).parent / 'gastos_por_concepto_abril.png')# Guardar el gráfico
-# plt.show()# Mostrar el gráfico
-
-'''
-Un histograma o boxplot para ver:
-
-    Si haces muchos pequeños pagos o algunos grandes.
-
-    Detectar valores atípicos (por ejemplo, una transferencia grande o una compra puntual).
-'''
-
-# Histograma de los importes de los gastos
-plt.figure(figsize=(12, 6)) # tamaño del gráfico
-plt.hist(gastos_abril['importe'], bins=150, color='purple', alpha=0.7) # color y transparencia de las barras
-plt.title('Histograma de importes de gastos en abril 2025') # título del gráfico
-plt.xlabel('Importe (€)') # etiqueta del eje X          
-plt.ylabel('Frecuencia') # etiqueta del eje Y
-plt.grid(axis='y', linestyle='--', alpha=0.3) # líneas de la cuadrícula en el eje Y
-plt.tight_layout() # ajusta el diseño para que no se solapen los elementos
-print("📊 Histograma de importes de gastos generado.")
-plt.savefig(Path(__file__).parent / 'histograma_importes_abril.png')# Guardar el gráfico
-plt.show()# Mostrar el gráfico
\ No newline at end of file
+        print(f"📋 Versión de la base de datos: {version}")
+
+        gastos = cargar_gastos_mes(almacen, mes)
+
+    resumen_mes(gastos, mes)
+    if graficos:
+        histograma_importes(gastos, mes, mostrar=mostrar)
+
+
+if __name__ == "__main__":
+    import sys
+    sys.path.append(str(Path(__file__).parent.parent))
+    main()
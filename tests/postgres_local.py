@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Instancia local y desechable de PostgreSQL para pruebas y benchmarks.
+
+Crea un directorio de datos temporal con `initdb`, arranca el servidor con
+`pg_ctl` en un puerto libre y lo elimina todo al salir. Así se puede medir la
+carga sin tocar la base de datos compartida configurada en `.env`.
+
+Los binarios se buscan en la variable de entorno `PG_BIN`, en el PATH y en las
+rutas habituales de instalación. Si no se encuentran, `disponible()` devuelve
+un motivo y las pruebas se saltan.
+"""
+
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+RUTAS_HABITUALES = [
+    '/usr/lib/postgresql/*/bin',
+    '/usr/pgsql-*/bin',
+    '/usr/local/pgsql/bin',
+    '/opt/homebrew/opt/postgresql*/bin',
+    '/usr/local/opt/postgresql*/bin',
+]
+
+
+def buscar_binarios() -> Optional[Path]:
+    """
+    Busca el directorio que contiene `initdb` y `pg_ctl`.
+
+    Returns:
+        Optional[Path]: Directorio de binarios o None si no se encuentra
+    """
+    candidatos = []
+    if os.getenv('PG_BIN'):
+        candidatos.append(os.getenv('PG_BIN'))
+    initdb = shutil.which('initdb')
+    if initdb:
+        candidatos.append(os.path.dirname(initdb))
+    for patron in RUTAS_HABITUALES:
+        candidatos.extend(sorted(glob.glob(patron), reverse=True))
+
+    for directorio in candidatos:
+        ruta = Path(directorio)
+        if (ruta / 'initdb').exists() and (ruta / 'pg_ctl').exists():
+            return ruta
+    return None
+
+
+def disponible() -> Optional[str]:
+    """
+    Comprueba si se puede levantar una instancia local.
+
+    Returns:
+        Optional[str]: None si se puede, o el motivo por el que no
+    """
+    if buscar_binarios() is None:
+        return "No se encontraron los binarios initdb/pg_ctl (define PG_BIN)"
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        return "initdb no puede ejecutarse como root"
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        return "psycopg2 no está instalado"
+    return None
+
+
+def _puerto_libre() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class PostgresLocal:
+    """
+    Servidor PostgreSQL temporal. Se usa como context manager:
+
+        with PostgresLocal() as pg:
+            with pg.conector() as db:
+                db.execute_query("SELECT 1")
+    """
+
+    def __init__(self, usuario: str = 'postgres', base_datos: str = 'postgres'):
+        self.bin = buscar_binarios()
+        self.usuario = usuario
+        self.base_datos = base_datos
+        self.host = '127.0.0.1'
+        self.port = None
+        self.directorio = None
+
+    def _ejecutar(self, programa: str, *args):
+        subprocess.run([str(self.bin / programa), *args], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def iniciar(self):
+        """
+        Crea el directorio de datos y arranca el servidor.
+        """
+        motivo = disponible()
+        if motivo:
+            raise RuntimeError(motivo)
+
+        self.directorio = Path(tempfile.mkdtemp(prefix='pg_gastos_'))
+        self.port = _puerto_libre()
+        datos = self.directorio / 'datos'
+
+        self._ejecutar('initdb', '-D', str(datos), '-U', self.usuario,
+                       '--auth=trust', '--encoding=UTF8', '--no-sync')
+        # Opciones pensadas para pruebas: sin fsync y sin escuchar en red externa
+        opciones = (f"-p {self.port} -h {self.host} -k {self.directorio} "
+                    "-c fsync=off -c synchronous_commit=off -c full_page_writes=off")
+        self._ejecutar('pg_ctl', '-D', str(datos), '-o', opciones,
+                       '-l', str(self.directorio / 'postgres.log'), '-w', 'start')
+        return self
+
+    def detener(self):
+        """
+        Para el servidor y borra el directorio temporal.
+        """
+        if self.directorio is None:
+            return
+        try:
+            self._ejecutar('pg_ctl', '-D', str(self.directorio / 'datos'), '-m', 'immediate', '-w', 'stop')
+        finally:
+            shutil.rmtree(self.directorio, ignore_errors=True)
+            self.directorio = None
+
+    def conector(self, **kwargs):
+        """
+        Crea un DatabaseConnector apuntando a la instancia local.
+        """
+        from config.database_conector import DatabaseConnector
+        return DatabaseConnector(host=self.host, port=self.port, database=self.base_datos,
+                                 user=self.usuario, password='', **kwargs)
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.detener()
+
+
+# Misma definición que las tablas creadas por PostgresStorage (config/storage.py)
+DDL_GASTOS = """
+CREATE TABLE IF NOT EXISTS cuentas (
+    id SMALLINT PRIMARY KEY NOT NULL,
+    iban VARCHAR(34) UNIQUE,
+    titular VARCHAR(255)
+);
+INSERT INTO cuentas (id, iban, titular) VALUES (0, NULL, 'Cuenta desconocida')
+ON CONFLICT (id) DO NOTHING;
+CREATE TABLE IF NOT EXISTS gastos_2025 (
+    id SERIAL PRIMARY KEY NOT NULL,
+    Fecha_Operacion TIMESTAMP NOT NULL,
+    Concepto VARCHAR(255),
+    Fecha_Valor TIMESTAMP,
+    Importe DECIMAL(10, 2),
+    Saldo DECIMAL(10, 2),
+    Referencia_1 VARCHAR(255),
+    Referencia_2 VARCHAR(255),
+    Cuenta_Id SMALLINT NOT NULL DEFAULT 0 REFERENCES cuentas (id)
+);
+CREATE INDEX IF NOT EXISTS idx_gastos_2025_cuenta_fecha ON gastos_2025 (Cuenta_Id, Fecha_Operacion);
+"""
+
+RUTA_VISTAS = Path(__file__).parent.parent / 'src' / 'sql' / 'Create views of months.sql'
+
+
+def sentencias_vistas() -> list:
+    """
+    Extrae las sentencias CREATE VIEW del script de vistas por mes.
+
+    Returns:
+        list: Sentencias SQL, una por vista
+    """
+    texto = RUTA_VISTAS.read_text(encoding='utf-8')
+    return [s.strip() for s in texto.split(';') if s.strip().lower().startswith('create or replace view')]
+
+
+def crear_esquema_gastos(db):
+    """
+    Crea la tabla gastos_2025 y las vistas por mes en la base de datos indicada.
+    """
+    db.execute_command(DDL_GASTOS)
+    for sentencia in sentencias_vistas():
+        db.execute_command(sentencia)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la puntuación incremental de anomalías de AnomalyData.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl.anomaly_data import AnomalyData
+
+
+def _movimientos(desde, dias, semilla=0):
+    """Un café diario de ~1.50 € y una compra semanal de ~60 € en el supermercado."""
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range(desde, periods=dias, freq='D')
+    filas = [(f, 'COMPRA TARJ. 5402XXXXXXXX8018 CAFETERIA SOL-MADRID', -150 - int(rng.integers(0, 30)))
+             for f in fechas]
+    filas += [(f, 'COMPRA TARJ. 5402XXXXXXXX8018 MERCADONA-ILLESCAS', -6000 - int(rng.integers(-800, 800)))
+              for f in fechas[::7]]
+    df = pd.DataFrame(filas, columns=['Fecha Operación', 'Concepto', 'Importe'])
+    df['Saldo'] = np.arange(len(df), dtype=np.int64)
+    df['Cuenta_Id'] = np.int16(1)
+    return df
+
+
+def test_marca_importes_atipicos_por_concepto(tmp_path):
+    historico = _movimientos('2025-01-01', 60)
+    anomalias = AnomalyData(directorio_cache=tmp_path)
+    puntuados = anomalias.puntuar(historico)
+    assert len(puntuados) == len(historico)
+    assert not puntuados['Anomalia'].any()
+
+    nuevos = pd.DataFrame({
+        'Fecha Operación': pd.to_datetime(['2025-03-05', '2025-03-05', '2025-03-06']),
+        'Concepto': ['COMPRA TARJ. 5402XXXXXXXX8018 CAFETERIA SOL-MADRID',
+                     'COMPRA TARJ. 5402XXXXXXXX8018 CAFETERIA SOL-MADRID',
+                     'COMPRA TARJ. 5402XXXXXXXX8018 MERCADONA-ILLESCAS'],
+        'Importe': [-165, -4500, -6100],
+        'Saldo': [1, 2, 3],
+        'Cuenta_Id': np.int16(1),
+    })
+    puntuados = anomalias.puntuar(nuevos)
+    assert puntuados['Anomalia'].tolist() == [False, True, False]
+    assert puntuados['Nivel_Anomalia'].tolist() == ['concepto'] * 3
+    assert abs(puntuados['Importe_Esperado'].iloc[0] - (-165)) < 20
+
+
+def test_estado_persistido_es_incremental(tmp_path):
+    historico = _movimientos('2025-01-01', 90)
+    primera, resto = historico[historico['Fecha Operación'] < '2025-02-15'], historico
+
+    AnomalyData(directorio_cache=tmp_path).procesar(primera)
+
+    # Una segunda carga con todo el histórico solo puntúa lo que no se había visto
+    segunda = AnomalyData(directorio_cache=tmp_path)
+    segunda.cargar_estado()
+    puntuados = segunda.puntuar(resto)
+    assert len(puntuados) == len(historico) - len(primera)
+
+    # El resultado es el mismo que puntuando todo de una vez
+    completo = AnomalyData(directorio_cache=tmp_path / 'completo')
+    completo.puntuar(historico)
+    estado = segunda.estado.sort_values(['nivel', 'clave']).reset_index(drop=True)
+    esperado = completo.estado.sort_values(['nivel', 'clave']).reset_index(drop=True)
+    for columna in ('suma', 'suma_cuadrados', 'peso'):
+        assert np.allclose(estado[columna].astype(float), esperado[columna].astype(float))
+    assert (estado['n'].astype(int) == esperado['n'].astype(int)).all()
+
+
+def test_procesar_guarda_anomalias(tmp_path):
+    historico = _movimientos('2025-01-01', 30)
+    historico.loc[len(historico)] = [pd.Timestamp('2025-01-31'),
+                                     'COMPRA TARJ. 5402XXXXXXXX8018 CAFETERIA SOL-MADRID', -9900, 999, np.int16(1)]
+    anomalias = AnomalyData(directorio_cache=tmp_path).procesar(historico)
+    assert anomalias['Importe'].tolist() == [-9900]
+    assert AnomalyData(directorio_cache=tmp_path).ultimas_anomalias()['Importe'].tolist() == [-9900]
+
+
+def test_exportacion_atrasada_se_puntua(tmp_path):
+    historico = _movimientos('2025-01-01', 90)
+    febrero = historico['Fecha Operación'].between('2025-02-01', '2025-02-28')
+    reciente, atrasada = historico[~febrero], historico[febrero]
+
+    AnomalyData(directorio_cache=tmp_path).procesar(reciente)
+    # Febrero llega después que marzo: se puntúa igualmente y solo una vez
+    segunda = AnomalyData(directorio_cache=tmp_path)
+    segunda.cargar_estado()
+    assert len(segunda.puntuar(atrasada)) == len(atrasada)
+    assert segunda.puntuar(historico).empty
+    assert len(segunda.puntuadas) == len(historico)
+    assert segunda.marcas == {1: '2025-03-31'}
+
+
+def test_estado_sin_huellas_se_reconstruye(tmp_path):
+    historico = _movimientos('2025-01-01', 30)
+    anomalias = AnomalyData(directorio_cache=tmp_path)
+    anomalias.procesar(historico)
+    for ruta in tmp_path.glob(f'{anomalias.ruta_huellas.name}.*'):
+        ruta.unlink()
+
+    reconstruida = AnomalyData(directorio_cache=tmp_path)
+    assert not reconstruida.cargar_estado()
+    assert len(reconstruida.puntuar(historico)) == len(historico)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Pruebas de carga contra una instancia local y desechable de PostgreSQL.
+
+Se saltan si no hay binarios de PostgreSQL disponibles (ver tests/postgres_local.py).
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(__file__))
+
+from postgres_local import PostgresLocal, disponible, crear_esquema_gastos
+
+motivo = disponible()
+pytestmark = pytest.mark.skipif(motivo is not None, reason=motivo or '')
+
+INSERT_GASTO = """
+INSERT INTO gastos_2025 (Fecha_Operacion, Concepto, Fecha_Valor, Importe, Saldo, Referencia_1, Referencia_2)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+@pytest.fixture(scope='module')
+def db():
+    with PostgresLocal() as pg:
+        with pg.conector() as conector:
+            crear_esquema_gastos(conector)
+            yield conector
+
+
+def test_execute_many_y_vistas(db):
+    """Las filas insertadas con execute_many aparecen en la vista de su mes."""
+    db.execute_command("TRUNCATE gastos_2025")
+    filas = [
+        ('2025-04-02', 'PAGO BIZUM PRUEBA', '2025-04-02', -20.00, 980.00, '', ''),
+        ('2025-04-15', 'COMPRA TARJ. PRUEBA', '2025-04-16', -5.50, 974.50, '', ''),
+        ('2025-05-01', 'TRANSFERENCIA DE PRUEBA', '2025-05-01', 100.00, 1074.50, '', ''),
+    ]
+    db.execute_many(INSERT_GASTO, filas)
+
+    assert db.execute_query("SELECT COUNT(*) AS n FROM gastos_2025")[0]['n'] == 3
+    abril = db.execute_query("SELECT SUM(importe) AS total FROM vw_gastos2025_abril")
+    assert float(abril[0]['total']) == pytest.approx(-25.50)
+    assert db.table_exists('gastos_2025')
+
+
+def test_cargar_dataframe_en_centimos(db):
+    """Los importes en céntimos se guardan como DECIMAL exacto y suman sin error de redondeo."""
+    import pandas as pd
+
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+    from etl.DB_Gastos import cargar_dataframe_a_tabla
+
+    db.execute_command("TRUNCATE gastos_2025")
+    n = 1000
+    df = pd.DataFrame({
+        'Fecha Operación': pd.to_datetime(['2025-04-10'] * n),
+        'Concepto': ['CAFE'] * n,
+        'Fecha Valor': pd.to_datetime(['2025-04-10'] * n),
+        'Importe': pd.Series([-10] * n, dtype='int64'),   # -0.10 €
+        'Saldo': pd.Series([584795] * n, dtype='int64'),  # 5,847.95 €
+        'Referencia 1': [None] * n,
+        'Referencia 2': [None] * n,
+        'Cuenta_Id': pd.Series([0] * n, dtype='int16'),
+    })
+    assert cargar_dataframe_a_tabla(df, 'gastos_2025', db)
+
+    fila = db.execute_query("SELECT SUM(importe) AS total, MAX(saldo) AS saldo FROM vw_gastos2025_abril")[0]
+    assert str(fila['total']) == '-100.00'
+    assert str(fila['saldo']) == '5847.95'
+
+
+def test_recargar_no_duplica_movimientos(db):
+    """Cargar dos veces la misma exportación (o una que solapa) solo inserta lo nuevo."""
+    import pandas as pd
+
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+    from etl.DB_Gastos import cargar_movimientos, crear_tablas
+    from etl.load_data import LoadData
+
+    crear_tablas(db)
+    db.execute_command("TRUNCATE gastos_2025")
+    df = pd.DataFrame({
+        'Fecha Operación': pd.to_datetime(['2025-04-01', '2025-04-02', '2025-04-02']),
+        'Concepto': ['CAFE', 'CAFE', None],
+        'Fecha Valor': pd.to_datetime(['2025-04-01', '2025-04-02', '2025-04-02']),
+        'Importe': pd.Series([-150, -150, 2000], dtype='int64'),
+        'Saldo': pd.Series([10000, 9850, 11850], dtype='int64'),
+        'Referencia 1': [None] * 3,
+        'Referencia 2': [None] * 3,
+        'Cuenta_Id': pd.Series([0] * 3, dtype='int16'),
+    })
+    assert len(cargar_movimientos(df, 'gastos_2025', db, LoadData())) == 3
+
+    solapada = pd.concat([df.iloc[1:], df.iloc[:1].assign(**{
+        'Fecha Operación': pd.Timestamp('2025-04-03'), 'Saldo': 11700})], ignore_index=True)
+    assert len(cargar_movimientos(solapada, 'gastos_2025', db, LoadData())) == 1
+    assert db.execute_query("SELECT COUNT(*) AS n FROM gastos_2025")[0]['n'] == 4
+
+
+def test_carga_por_lotes_confirma_lote_y_punto_de_control_juntos(db):
+    """Un lote que falla no deja ni sus filas ni su punto de control; al repetir se completa."""
+    import pandas as pd
+
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+    from etl.DB_Gastos import cargar_movimientos, crear_tablas, huellas_archivos
+    from etl.load_data import LoadData
+
+    crear_tablas(db)
+    db.execute_command("TRUNCATE gastos_2025, cargas_control")
+    n = 100
+    df = pd.DataFrame({
+        'Fecha Operación': pd.Timestamp('2025-04-01') + pd.to_timedelta(range(n), unit='h'),
+        'Concepto': [f'CAFE {i}' for i in range(n)],
+        'Fecha Valor': pd.Timestamp('2025-04-01') + pd.to_timedelta(range(n), unit='h'),
+        'Importe': pd.Series([-150] * n, dtype='int64'),
+        'Saldo': pd.Series(range(100_000, 100_000 - 150 * n, -150), dtype='int64'),
+        'Referencia 1': [None] * n,
+        'Referencia 2': [None] * n,
+        'Cuenta_Id': pd.Series([0] * n, dtype='int16'),
+        'Archivo': 'gastos_abril.csv',
+        'Fila_Archivo': range(n),
+    })
+    # La fila 45 no cabe en VARCHAR(255): falla el tercer lote de 20
+    erronea = df.assign(Concepto=df['Concepto'].where(df.index != 45, 'X' * 300))
+    with pytest.raises(RuntimeError):
+        cargar_movimientos(erronea, 'gastos_2025', db, LoadData(), filas_por_lote=20)
+    assert db.execute_query("SELECT COUNT(*) AS n FROM gastos_2025")[0]['n'] == 40
+    control = db.execute_query("SELECT lote, fila_hasta, filas FROM cargas_control ORDER BY lote")
+    assert [(f['lote'], f['fila_hasta'], f['filas']) for f in control] == [(1, 19, 20), (2, 39, 20)]
+
+    # Reanudar la misma exportación (como tras un corte) sigue desde el lote 3:
+    # aquí se corrige la fila y se da por buena la huella de lo ya confirmado
+    correcta = erronea.assign(Concepto=erronea['Concepto'].str.slice(0, 255))
+    db.execute_command("UPDATE cargas_control SET huella = %s", (huellas_archivos(correcta)['gastos_abril.csv'],))
+    assert len(cargar_movimientos(correcta, 'gastos_2025', db, LoadData(), filas_por_lote=20)) == 60
+    assert db.execute_query("SELECT COUNT(*) AS n FROM gastos_2025")[0]['n'] == n
+    lotes = db.execute_query("SELECT MAX(lote) AS lote, SUM(filas) AS filas FROM cargas_control")[0]
+    assert (lotes['lote'], lotes['filas']) == (5, n)
+
+
+def test_cache_de_consultas_se_invalida_al_escribir(db):
+    """Una consulta sobre una vista se invalida al escribir en su tabla base."""
+    from config.query_cache import QueryCache
+
+    db.execute_command("TRUNCATE gastos_2025")
+    db.query_cache = QueryCache(ttl=60)
+    try:
+        consulta = "SELECT COUNT(*) AS n FROM vw_gastos2025_abril"
+        assert db.execute_query(consulta)[0]['n'] == 0
+        assert db.execute_query(consulta)[0]['n'] == 0
+        assert db.cache_stats()['hits'] == 1
+
+        db.execute_many(INSERT_GASTO, [('2025-04-02', 'PAGO BIZUM PRUEBA', '2025-04-02', -20.00, 980.00, '', '')])
+        assert db.execute_query(consulta)[0]['n'] == 1
+        assert db.cache_stats()['invalidations'] == 1
+    finally:
+        db.query_cache = None
+
+
+def test_sentencias_preparadas_y_metadatos(db):
+    """Las sentencias repetidas se preparan y los metadatos se refrescan tras un DDL."""
+    db.execute_command("TRUNCATE gastos_2025")
+    antes = db.cache_stats()['statements']['executions']
+    for i in range(3):
+        db.execute_many(INSERT_GASTO, [('2025-04-02', f'PRUEBA {i}', '2025-04-02', -1.25, 10.00, '', '')])
+    consulta = "SELECT COUNT(*) AS n FROM gastos_2025 WHERE Cuenta_Id = ANY(%s) AND Importe = %s"
+    assert [db.execute_query(consulta, ([0, 1], -1.25))[0]['n'] for _ in range(3)] == [3, 3, 3]
+    assert db.cache_stats()['statements']['executions'] > antes
+
+    assert not db.table_exists('tabla_temporal')
+    assert db.create_table('tabla_temporal', [('id', 'INTEGER'), ('nombre', 'TEXT')])
+    assert db.table_exists('tabla_temporal')
+    assert db.get_columns('tabla_temporal') == [('id', 'integer'), ('nombre', 'text')]
+    db.execute_command("ALTER TABLE tabla_temporal ADD COLUMN importe NUMERIC")
+    assert [c for c, _ in db.get_columns('tabla_temporal')] == ['id', 'nombre', 'importe']
+    assert 'idx_gastos_2025_cuenta_fecha' in db.get_indexes('gastos_2025')
+    assert db.drop_table('tabla_temporal')
+    assert not db.table_exists('tabla_temporal')
+
+
+def test_query_to_dataframe_tipado_y_devuelve_la_conexion(db):
+    """COPY ... TO STDOUT da las mismas filas con tipos de pandas y no retiene conexiones."""
+    from viz.analisis_abril import cargar_gastos_mes
+
+    db.execute_command("TRUNCATE gastos_2025")
+    db.execute_many(INSERT_GASTO, [
+        ('2025-04-02', 'NA', '2025-04-02', -20.10, 980.00, '', None),
+        ('2025-04-15', 'COMPRA, "TARJ." PRUEBA', '2025-04-16', -5.55, 974.45, '00123', ''),
+    ])
+    consulta = "SELECT * FROM vw_gastos2025_abril WHERE importe < %s ORDER BY fecha_operacion"
+    for _ in range(db.max_connections + 1):
+        gastos = db.query_to_dataframe(consulta, (0,))
+    assert len(db.connection_pool._used) == 0
+
+    assert gastos['concepto'].tolist() == ['NA', 'COMPRA, "TARJ." PRUEBA']
+    assert str(gastos['fecha_operacion'].dtype).startswith('datetime64')
+    assert gastos['importe'].tolist() == [-20.10, -5.55]
+    assert gastos['referencia_1'].tolist()[1] == '00123'
+    assert gastos['referencia_2'].isna().tolist() == [True, False]
+
+    abril = cargar_gastos_mes(db, 'abril')
+    assert abril['importe_centimos'].tolist() == [-2010, -555]
+    assert str(db.query_to_dataframe("SELECT NULL::int AS a UNION ALL SELECT 1")['a'].dtype) == 'Int64'
+
+
+def test_postgres_y_sqlite_dan_las_mismas_consultas(db):
+    """Los periodos y agregados coinciden (tipos incluidos) entre PostgreSQL y SQLite."""
+    import pandas as pd
+
+    from config.sqlite_storage import SQLiteStorage
+    from config.storage import PostgresStorage
+    from etl.DB_Gastos import cargar_movimientos, crear_tablas
+    from etl.load_data import LoadData
+    from etl.pipeline import COLUMNAS, ingestar
+    from etl.runtime_config import RuntimeConfig
+
+    loader = LoadData(COLUMNAS, incluir_origen=True)
+    df = ingestar(os.path.join(os.path.dirname(__file__), '..', 'data'), loader=loader,
+                  configuracion=RuntimeConfig(modo='memoria'))
+    crear_tablas(db)
+    db.execute_command("TRUNCATE gastos_2025")
+    with SQLiteStorage() as sqlite:
+        for almacen in (PostgresStorage(db), sqlite):
+            crear_tablas(almacen)
+            cargar_movimientos(df, 'gastos_2025', almacen, loader)
+
+        postgres = PostgresStorage(db)
+        pd.testing.assert_frame_equal(postgres.movements('2025-04-01', '2025-05-01').drop(columns='id'),
+                                      sqlite.movements('2025-04-01', '2025-05-01').drop(columns='id'))
+        for agrupacion in ('dia', 'mes', 'concepto', 'cuenta'):
+            pd.testing.assert_frame_equal(postgres.totals('2025-01-01', '2026-01-01', agrupacion),
+                                          sqlite.totals('2025-01-01', '2026-01-01', agrupacion))
+
+
+def test_errores_de_la_sentencia_no_desactivan_la_preparacion(db):
+    """Una violación de restricción se propaga una vez y la sentencia sigue preparada."""
+    import psycopg2
+
+    db.execute_command("CREATE TABLE IF NOT EXISTS claves_unicas (id INTEGER PRIMARY KEY)")
+    insertar = "INSERT INTO claves_unicas (id) VALUES (%s)"
+    for i in range(3):
+        db.execute_command(insertar, (i,))
+    with pytest.raises(psycopg2.errors.UniqueViolation):
+        db.execute_command(insertar, (1,))
+    antes = db.cache_stats()['statements']['executions']
+    db.execute_command(insertar, (3,))
+    assert db.cache_stats()['statements']['executions'] > antes
+    assert db.execute_query("SELECT COUNT(*) AS n FROM claves_unicas")[0]['n'] == 4
+    assert db.drop_table('claves_unicas')
+
+
+def test_transaccion_se_repite_si_caduca_una_sentencia_preparada(db):
+    """Si una sentencia preparada deja de existir a mitad de transacción, la transacción se repite."""
+    db.execute_command("CREATE TABLE IF NOT EXISTS claves_repetidas (id INTEGER PRIMARY KEY)")
+    insertar = "INSERT INTO claves_repetidas (id) VALUES (%s)"
+    db.execute_transaction([(insertar, [(1,)]), (insertar, [(2,)])])
+
+    # Otro cliente de la misma conexión descarta las sentencias sin que el conector lo sepa
+    for conexion in db.connection_pool._pool:
+        with conexion.cursor() as cursor:
+            cursor.execute('DEALLOCATE ALL')
+        conexion.commit()
+
+    db.execute_transaction([("INSERT INTO claves_repetidas (id) SELECT %s", [(10,)]), (insertar, [(3,)])])
+    assert db.execute_query("SELECT COUNT(*) AS n FROM claves_repetidas")[0]['n'] == 4
+    assert db.drop_table('claves_repetidas')
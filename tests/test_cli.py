@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la línea de comandos: arranque sin dependencias pesadas e ingesta.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.join(os.path.dirname(__file__), '..')
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(RAIZ, 'src'))
+
+
+def _ejecutar(*args, cwd=RAIZ):
+    return subprocess.run([sys.executable, *args], cwd=cwd, capture_output=True, text=True, timeout=120)
+
+
+def test_importar_modulos_no_carga_dependencias_pesadas():
+    """Importar la CLI y los módulos del pipeline no debe importar pandas ni conectar."""
+    codigo = (
+        "import sys; sys.path.insert(0, 'src')\n"
+        "import cli, main, viz.analisis_abril\n"
+        "pesados = [m for m in ('pandas', 'psycopg2', 'matplotlib', 'dotenv') if m in sys.modules]\n"
+        "print(pesados)\n"
+    )
+    resultado = _ejecutar('-c', codigo)
+    assert resultado.returncode == 0, resultado.stderr
+    assert resultado.stdout.strip() == '[]'
+
+
+def test_help_y_manifest(tmp_path):
+    resultado = _ejecutar('-m', 'src', '--help')
+    assert resultado.returncode == 0, resultado.stderr
+    for comando in ('ingest', 'load', 'report', 'charts', 'status', 'manifest'):
+        assert comando in resultado.stdout
+
+    (tmp_path / 'gastos_enero.csv').write_text('"F. Operativa","Concepto"\n', encoding='utf-8')
+    (tmp_path / 'notas.md').write_text('no es una exportación', encoding='utf-8')
+    resultado = _ejecutar('-m', 'src', '--data-dir', str(tmp_path), 'manifest')
+    assert resultado.returncode == 0, resultado.stderr
+    entradas = json.loads(resultado.stdout)
+    assert [e['archivo'] for e in entradas] == ['gastos_enero.csv']
+    assert len(entradas[0]['sha1']) == 40
+
+
+def test_ingest_guarda_cache(tmp_path):
+    from etl.cache import leer_cache
+    from etl.pipeline import ruta_datos_limpios
+
+    # Se ejecuta desde tmp_path para que app.log no se escriba en el repositorio
+    cache = tmp_path / 'cache'
+    resultado = _ejecutar(os.path.join(RAIZ, 'src', 'cli.py'), '--cache-dir', str(cache), 'ingest',
+                          cwd=tmp_path)
+    assert resultado.returncode == 0, resultado.stderr
+
+    df, metadatos = leer_cache(ruta_datos_limpios(cache))
+    assert len(df) > 0
+    assert 'gastos_abril.csv' in metadatos['archivos']
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Pruebas del índice invertido de conceptos.
+"""
+
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl.concept_index import ConceptIndex
+from etl.pipeline import ingestar
+from etl.runtime_config import RuntimeConfig
+from etl.transform_data import TransformData
+
+DATOS = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+CONCEPTOS = [
+    'PAGO BIZUM RAFAEL GARCIA VELASCO',
+    'COMPRA TARJ. 5402XXXXXXXX8018 MERCADONA SEÑOR-ILLESCAS',
+    None,
+    'ABONO BIZUM DE RAFAEL GARCIA CUERVA',
+    'pago bizum Rafaela Soto',
+    'TRANSFERENCIA A Rafael Garcia Cuerva',
+]
+
+
+def _esperado(conceptos, *terminos):
+    """Búsqueda de referencia: todos los términos como palabra completa o prefijo."""
+    filas = []
+    for i, concepto in enumerate(conceptos):
+        palabras = ' '.join(str(concepto or '').upper().replace('.', ' ').replace('-', ' ').split()).split()
+        if all(any(p == t.rstrip('*') or (t.endswith('*') and p.startswith(t[:-1])) for p in palabras)
+               for t in terminos):
+            filas.append(i)
+    return filas
+
+
+def test_consultas_and_y_prefijo():
+    indice = ConceptIndex()
+    indice.actualizar(pd.Series(CONCEPTOS))
+
+    assert indice.buscar('BIZUM RAFAEL').tolist() == [0, 3]
+    assert indice.buscar('bizum raf*').tolist() == [0, 3, 4]
+    assert indice.buscar('Mercadona señor').tolist() == [1]
+    assert indice.buscar('GARCIA CUERVA').tolist() == _esperado(CONCEPTOS, 'GARCIA', 'CUERVA')
+    assert indice.buscar('NETFLIX').tolist() == []
+    assert indice.buscar('BIZUM NETFLIX').tolist() == []
+
+
+def test_actualizacion_incremental_y_persistencia(tmp_path):
+    rng = np.random.default_rng(0)
+    palabras = ['PAGO', 'BIZUM', 'COMPRA', 'TARJ', 'RAFAEL', 'MARTA', 'AMAZON', 'MERCADONA']
+    conceptos = pd.Series([' '.join(rng.choice(palabras, 3)) for _ in range(2000)])
+
+    indice = ConceptIndex()
+    assert not indice.actualizar(conceptos[:500])
+    # Se añaden las filas de una exportación nueva sin reconstruir
+    for fin in range(600, 2001, 100):
+        assert indice.actualizar(conceptos[:fin])
+    for consulta in ('BIZUM RAFAEL', 'MAR*', 'COMPRA AMAZON TARJ'):
+        assert indice.buscar(consulta).tolist() == _esperado(conceptos, *consulta.split())
+
+    ruta = indice.guardar(tmp_path / 'indice_conceptos')
+    cargado = ConceptIndex.cargar(tmp_path / 'indice_conceptos')
+    assert ruta.exists()
+    assert cargado.buscar('BIZUM RAFAEL').tolist() == indice.buscar('BIZUM RAFAEL').tolist()
+
+    # Si las filas ya indexadas cambian, el índice se reconstruye
+    assert not cargado.actualizar(conceptos[::-1].reset_index(drop=True))
+    assert cargado.num_filas == len(conceptos)
+
+
+def test_exportacion_nueva_se_indexa_sin_reconstruir(tmp_path):
+    configuracion = RuntimeConfig(modo='memoria')
+    shutil.copy(os.path.join(DATOS, 'gastos_mayo.csv'), tmp_path)
+    indice = ConceptIndex()
+    movimientos = ingestar(tmp_path, configuracion=configuracion)
+    indice.actualizar(movimientos['Concepto'], movimientos['Archivo'])
+    mayo = indice.partes[0]
+
+    # `gastos_abril` llega después pero va antes por nombre: sus filas quedan delante
+    shutil.copy(os.path.join(DATOS, 'gastos_abril.csv'), tmp_path)
+    movimientos = ingestar(tmp_path, configuracion=configuracion)
+    assert movimientos['Archivo'].iloc[0] == 'gastos_abril.csv'
+    assert indice.actualizar(movimientos['Concepto'], movimientos['Archivo'])
+    assert len(indice.partes) == 2 and indice.partes[1] is mayo
+    assert indice.buscar('BIZUM').tolist() == _esperado(movimientos['Concepto'], 'BIZUM')
+
+    # Guardado y cargado sigue reconociendo cada exportación
+    indice.guardar(tmp_path / 'indice_conceptos')
+    cargado = ConceptIndex.cargar(tmp_path / 'indice_conceptos')
+    assert cargado.huella == indice.huella
+    shutil.copy(os.path.join(DATOS, 'gastos_enero.csv'), tmp_path)
+    movimientos = ingestar(tmp_path, configuracion=configuracion)
+    assert cargado.actualizar(movimientos['Concepto'], movimientos['Archivo'])
+    assert cargado.buscar('TRANSFERENCIA').tolist() == _esperado(movimientos['Concepto'], 'TRANSFERENCIA')
+
+
+def test_filtrar_por_concepto_sin_distinguir_mayusculas():
+    df = pd.DataFrame({'Concepto': CONCEPTOS})
+    filtrado = TransformData().filtrar_por_concepto(df, 'bizum')
+    assert filtrado.index.tolist() == [0, 3, 4]
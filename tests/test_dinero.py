@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la representación de importes en céntimos enteros.
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl.dinero import a_centimos, euros_a_centimos, formatear_euros, texto_a_centimos
+from etl.transform_data import TransformData
+
+
+def test_texto_a_centimos_formato_del_banco():
+    serie = pd.Series(['-237.15', '5,847.95', '12', '0.5', '+3.10', None, 'Importe'])
+    resultado = texto_a_centimos(serie)
+    assert str(resultado.dtype) == 'Int64'
+    assert resultado.iloc[:5].tolist() == [-23715, 584795, 1200, 50, 310]
+    assert resultado.iloc[5:].isna().all()
+
+    # Sin nulos el resultado es int64 normal
+    assert texto_a_centimos(pd.Series(['1.10', '2.20'])).dtype == 'int64'
+
+
+def test_sumas_exactas_en_centimos():
+    # 0.1 + 0.2 en float no es 0.3; en céntimos sí
+    importes = pd.Series(['0.10', '0.20'] * 500_000)
+    centimos = a_centimos(importes)
+    assert centimos.sum() == 150_000 * 100
+    assert a_centimos(centimos) is centimos
+    assert a_centimos(pd.Series([-237.15, 19.99])).tolist() == [-23715, 1999]
+    assert formatear_euros(-123456) == '-1,234.56 €'
+    assert euros_a_centimos(-50.0) == -5000
+
+
+def test_transformar_y_filtrar_en_centimos():
+    transformer = TransformData()
+    df = pd.DataFrame({'Concepto': ['Netflix', 'Nómina', 'Café'],
+                       'Importe': ['-15.99', '2,100.00', '-1.50']})
+    df = transformer.transformar_campos(df, 'Importe', 'centimos')
+    assert df['Importe'].dtype == 'int64'
+    assert df['Importe'].sum() == 208251
+
+    filtrado = transformer.filtrar_por_importe(df, -20.0, 0)
+    assert filtrado['Concepto'].tolist() == ['Netflix', 'Café']
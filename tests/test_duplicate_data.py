@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la resolución de duplicados difusos.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl.duplicate_data import DuplicateData, similitud_conceptos
+from etl.load_data import LoadData
+from etl.pipeline import COLUMNAS, ingestar, transformar
+from etl.runtime_config import RuntimeConfig
+from etl.transform_data import TransformData
+
+DATOS = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def _movimientos(filas):
+    df = pd.DataFrame(filas, columns=['Fecha Operación', 'Concepto', 'Importe', 'Saldo', 'Referencia 1'])
+    df['Fecha Operación'] = pd.to_datetime(df['Fecha Operación'])
+    df['Fecha Valor'] = df['Fecha Operación']
+    df['Referencia 2'] = None
+    df['Cuenta_Id'] = 1
+    return df
+
+
+MOVIMIENTOS = _movimientos([
+    ('2025-04-02', 'COMPRA TARJ. MERCADONA ILLESCAS', -4530, 120000, None),
+    ('2025-04-02', 'COMPRA TARJ MERCADONA  ILLESCAS', -4530, 120000, 'REF-1'),
+    ('2025-04-03', 'PAGO BIZUM DE ANA GARCIA CENA', -2000, 118000, None),
+    ('2025-04-03', 'PAGO BIZUM DE ANA', -2000, 118000, None),
+    ('2025-04-04', 'PAGO A HACIENDA', -5000, 113000, None),
+    ('2025-04-04', 'RECIBO LUZ IBERDROLA', -5000, 113000, None),
+    ('2025-04-05', 'RETENCION', 0, 113000, None),
+    ('2025-04-05', 'RETENCION', 0, 113000, None),
+])
+
+
+def test_similitud_de_conceptos():
+    assert similitud_conceptos('PAGO BIZUM', 'PAGO BIZUM') == 1.0
+    assert similitud_conceptos('PAGO BIZUM DE ANA', 'PAGO BIZUM DE ANA GARCIA') == 1.0
+    assert similitud_conceptos('', 'PAGO') == 0.0
+    assert similitud_conceptos('COMPRA MERCADONA', 'COMPRA MERCADONO') > 0.9
+    assert similitud_conceptos('PAGO A HACIENDA', 'RECIBO LUZ IBERDROLA') < 0.5
+
+
+def test_resolver_fusiona_y_completa():
+    resultado, informe = DuplicateData().resolver(MOVIMIENTOS)
+
+    # Se fusionan la compra y el bizum recortado; Hacienda/luz y los de importe 0, no
+    assert len(resultado) == len(MOVIMIENTOS) - 2
+    assert len(informe) == 2
+    assert informe['Similitud'].min() >= 0.8
+
+    compra = resultado[resultado['Importe'] == -4530]
+    assert len(compra) == 1
+    assert compra['Referencia 1'].iloc[0] == 'REF-1'
+    bizum = resultado[resultado['Importe'] == -2000]
+    assert bizum['Concepto'].tolist() == ['PAGO BIZUM DE ANA GARCIA CENA']
+    assert (resultado['Importe'] == 0).sum() == 2
+
+    # Sin duplicados no cambia nada
+    sin_cambios, vacio = DuplicateData().resolver(resultado)
+    assert len(sin_cambios) == len(resultado) and vacio.empty
+
+
+def test_transformar_completa_la_referencia_rellenada_despues():
+    # Como llegan del cargador: texto, con las referencias vacías como NaN
+    def crudo(referencias):
+        return pd.DataFrame([
+            ['02/04/2025', 'PAGO BIZUM A JUAN PEREZ', '02/04/2025', '-20.00', '1,180.00', *referencias[0]],
+            ['02/04/2025', 'PAGO BIZUM A JUAN', '02/04/2025', '-20.00', '1,180.00', *referencias[1]],
+        ], columns=COLUMNAS)
+
+    resultado = transformar(crudo([(np.nan, np.nan), ('REF123', np.nan)]), TransformData())
+    assert len(resultado) == 1
+    assert resultado['Referencia 1'].iloc[0] == 'REF123'
+    assert resultado['Referencia 2'].isna().all()
+
+    # Con los mismos campos rellenos gana el concepto largo y se completa su hueco
+    resultado = transformar(crudo([(np.nan, 'R2'), ('REF123', np.nan)]), TransformData())
+    assert resultado[['Concepto', 'Referencia 1', 'Referencia 2']].values.tolist() == [
+        ['PAGO BIZUM A JUAN PEREZ', 'REF123', 'R2']]
+
+
+def test_resolver_no_cruza_cuentas_ni_bloques():
+    otra_cuenta = MOVIMIENTOS.iloc[[0, 1]].assign(**{'Cuenta_Id': [1, 2]})
+    assert len(DuplicateData().resolver(otra_cuenta)[0]) == 2
+
+    otro_saldo = MOVIMIENTOS.iloc[[0, 1]].assign(Saldo=[120000, 124530])
+    assert len(DuplicateData().resolver(otro_saldo)[0]) == 2
+
+
+def test_filtrar_existentes():
+    existentes = MOVIMIENTOS.iloc[[0, 3]].reset_index(drop=True)
+    nuevos = MOVIMIENTOS.iloc[[1, 2, 4]].reset_index(drop=True)
+    filtrados, informe = DuplicateData().filtrar_existentes(nuevos, existentes)
+    assert filtrados['Concepto'].tolist() == ['PAGO A HACIENDA']
+    assert sorted(informe['Concepto_Eliminado']) == ['COMPRA TARJ MERCADONA  ILLESCAS', 'PAGO BIZUM DE ANA GARCIA CENA']
+
+
+def test_bloques_escala_casi_lineal():
+    # Con saldos distintos cada fila es su propio bloque: no se compara ninguna pareja
+    n = 200_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'Fecha Operación': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+        'Concepto': 'COMPRA',
+        'Importe': rng.integers(-10_000, 10_000, n),
+        'Saldo': np.arange(n),
+        'Cuenta_Id': 1,
+    })
+    assert DuplicateData().parejas(df).empty
+
+
+def test_ingesta_de_los_datos_del_repositorio():
+    transformados = ingestar(DATOS, loader=LoadData(COLUMNAS), configuracion=RuntimeConfig(modo='memoria'))
+    _, informe = DuplicateData().resolver(transformados)
+    # Lo que queda tras la ingesta ya no tiene duplicados difusos
+    assert informe.empty
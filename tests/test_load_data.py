@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la carga de exportaciones con LoadData.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl.load_data import LoadData, leer_preambulo
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+COLUMNAS = ['Fecha Operación', 'Concepto', 'Fecha Valor', 'Importe', 'Saldo', 'Referencia 1', 'Referencia 2']
+
+
+def test_leer_preambulo():
+    preambulo = leer_preambulo(DATA_DIR / 'gastos_abril.csv')
+
+    assert preambulo['cuenta'] == 'ES4400812708010006216235'
+    assert preambulo['divisa'] == 'EUR'
+    assert preambulo['seleccion'] == 'Desde 01/04/2025 hasta 30/04/2025'
+
+
+def test_cuenta_id_estable_entre_ficheros():
+    """Los ficheros de la misma cuenta reciben la misma clave entera."""
+    loader = LoadData(cuentas={'ES0000000000000000000001': 1})
+
+    abril = loader.load(str(DATA_DIR / 'gastos_abril.csv'))
+    mayo = loader.load(str(DATA_DIR / 'gastos_mayo.csv'))
+
+    assert abril['Cuenta_Id'].dtype == 'int16'
+    assert set(abril['Cuenta_Id']) == set(mayo['Cuenta_Id']) == {2}
+    assert loader.titulares[2]
+
+
+def test_excel_en_streaming_con_preambulo(tmp_path):
+    """El Excel se lee por bloques, sin preámbulo y con las columnas tipadas."""
+    import csv
+    openpyxl = pytest.importorskip('openpyxl')
+
+    libro = openpyxl.Workbook()
+    with open(DATA_DIR / 'gastos_abril.csv', encoding='utf-8') as f:
+        for fila in csv.reader(f):
+            libro.active.append([v if v != '' else None for v in fila])
+    ruta = tmp_path / 'gastos_abril.xlsx'
+    libro.save(ruta)
+
+    loader = LoadData(COLUMNAS)
+    bloques = list(loader.load_excel_por_bloques(str(ruta), filas_por_bloque=20, directorio_cache=tmp_path / 'cache'))
+    # Segunda lectura desde la caché columnar
+    en_cache = list(loader.load_excel_por_bloques(str(ruta), filas_por_bloque=20, directorio_cache=tmp_path / 'cache'))
+
+    for lectura in (bloques, en_cache):
+        assert [len(b) for b in lectura] == [20, 20, 9]
+        # Importes en céntimos enteros, sin pasar por float
+        assert lectura[0]['Importe'].dtype == 'int64'
+        assert lectura[0]['Importe'].iloc[0] == -2000
+        assert lectura[0]['Saldo'].iloc[0] == 485901
+        assert str(lectura[0]['Fecha Operación'].iloc[0].date()) == '2025-04-30'
+        assert set(lectura[0]['Cuenta_Id']) == {1}
+
+
+def test_excel_sin_movimientos(tmp_path):
+    """Una exportación Excel con solo preámbulo y cabecera da un DataFrame vacío."""
+    import csv
+    openpyxl = pytest.importorskip('openpyxl')
+
+    libro = openpyxl.Workbook()
+    with open(DATA_DIR / 'gastos_abril.csv', encoding='utf-8') as f:
+        for fila in csv.reader(f):
+            libro.active.append([v if v != '' else None for v in fila])
+            if fila and fila[0] == 'F. Operativa':
+                break
+    ruta = tmp_path / 'gastos_vacio.xlsx'
+    libro.save(ruta)
+
+    loader = LoadData(COLUMNAS, incluir_origen=True)
+    for directorio_cache in (None, tmp_path / 'cache', tmp_path / 'cache'):
+        bloques = list(loader.load_excel_por_bloques(str(ruta), directorio_cache=directorio_cache))
+        assert [len(b) for b in bloques] == [0]
+    datos = loader.load(str(ruta))
+    assert datos.empty
+    assert list(datos.columns[:len(COLUMNAS)]) == COLUMNAS
+    assert datos['Importe'].dtype == 'int64'
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los perfiles fusionables (cuantiles aproximados, conceptos frecuentes).
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl.load_data import LoadData
+from etl.pipeline import COLUMNAS, ingestar
+from etl.profile_data import FrecuentesConceptos, ProfileData, SketchCuantiles, combinar
+from etl.runtime_config import RuntimeConfig
+from etl.transform_data import TransformData
+
+DATOS = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def test_sketch_de_cuantiles_fusionable_con_error_relativo():
+    rng = np.random.default_rng(0)
+    valores = np.concatenate([-rng.lognormal(7, 1.5, 50_000).astype(np.int64),
+                              rng.lognormal(9, 1, 5_000).astype(np.int64), np.zeros(100, dtype=np.int64)])
+    partes = np.array_split(rng.permutation(valores), 7)
+    fusionado = SketchCuantiles()
+    for parte in partes:
+        fusionado = fusionado.fusionar(SketchCuantiles().actualizar(parte))
+    assert fusionado.cubos == SketchCuantiles().actualizar(valores).cubos
+    assert fusionado.n == len(valores)
+
+    ordenados = np.sort(valores)
+    for q in (0.01, 0.1, 0.5, 0.9, 0.95, 0.999):
+        exacto = ordenados[int(q * (len(valores) - 1))]
+        assert abs(fusionado.cuantil(q) - exacto) <= max(0.011 * abs(exacto), 1)
+    assert SketchCuantiles().cuantil(0.5) is None
+
+
+def test_frecuentes_misra_gries():
+    rng = np.random.default_rng(1)
+    conceptos = np.concatenate([np.repeat(['MERCADONA', 'BIZUM', 'LUZ'], [3000, 2000, 1000]),
+                                [f'COMPRA {i}' for i in range(4000)]])
+    partes = np.array_split(rng.permutation(conceptos), 10)
+    resumen = FrecuentesConceptos(k=50)
+    for parte in partes:
+        valores, recuentos = np.unique(parte, return_counts=True)
+        resumen = resumen.fusionar(FrecuentesConceptos(50, dict(zip(valores, recuentos))))
+    assert len(resumen.recuentos) <= 50
+    assert [c for c, _ in resumen.mas_frecuentes(3)] == ['MERCADONA', 'BIZUM', 'LUZ']
+    # Recuentos por defecto, como mucho `error` por debajo (y error <= n / (k + 1))
+    assert resumen.error <= len(conceptos) / 51
+    for concepto, exacto in (('MERCADONA', 3000), ('BIZUM', 2000), ('LUZ', 1000)):
+        assert exacto - resumen.error <= resumen.recuentos[concepto] <= exacto
+
+
+def test_perfiles_por_bloques_igual_que_en_una_pasada():
+    df = ingestar(DATOS, loader=LoadData(COLUMNAS, incluir_origen=True), configuracion=RuntimeConfig(modo='memoria'))
+    completo = ProfileData()
+    completo.actualizar(df)
+    por_bloques = ProfileData()
+    for inicio in range(0, len(df), 37):
+        por_bloques.actualizar(df.iloc[inicio:inicio + 37])
+
+    total, total_bloques = completo.total(), por_bloques.total()
+    assert total.filas == total_bloques.filas == len(df)
+    assert total.nulos == total_bloques.nulos
+    assert total.minimos == total_bloques.minimos and total.maximos == total_bloques.maximos
+    assert total.cuantiles['Importe'].cubos == total_bloques.cuantiles['Importe'].cubos
+    assert total.ingresos + total.gastos == int(df['Importe'].sum())
+    assert total.nulos['Referencia 1'] == int(df['Referencia 1'].isna().sum())
+    assert total.minimos['Fecha Operación'] == df['Fecha Operación'].min()
+
+    # Los perfiles por fichero y mes se combinan sin volver a las filas
+    meses = completo.por_mes()
+    abril = df[df['Fecha Operación'].dt.strftime('%Y-%m') == '2025-04']
+    assert meses['2025-04'].filas == len(abril)
+    assert meses['2025-04'].maximos['Saldo'] == int(abril['Saldo'].max())
+    assert combinar(meses.values()).filas == len(df)
+    assert combinar(completo.por_archivo().values()).gastos == total.gastos
+    frecuente, veces = total.conceptos.mas_frecuentes(1)[0]
+    assert frecuente == df['Concepto'].value_counts().index[0]
+    assert veces == df['Concepto'].value_counts().iloc[0]
+
+
+def test_resumen_devuelve_el_perfil():
+    df = ingestar(DATOS, loader=LoadData(COLUMNAS), configuracion=RuntimeConfig(modo='memoria'))
+    perfil = TransformData().resumen(df)
+    assert perfil.filas == len(df)
+    assert set(perfil.valores_cuantiles('Saldo')) == {0.01, 0.25, 0.5, 0.75, 0.99}
+    assert 0 < perfil.tasas_nulos()['Referencia 1'] < 1
+
+
+def test_perfil_de_la_ingesta_por_bloques(tmp_path):
+    # Dos exportaciones de abril: duplicados exactos y uno difuso cuyo hueco se
+    # completa con la otra; se quitan después de perfilar los bloques
+    original = open(os.path.join(DATOS, 'gastos_abril.csv'), encoding='utf-8').read()
+    (tmp_path / 'gastos_abril.csv').write_text(original, encoding='utf-8')
+    (tmp_path / 'gastos_abril_bis.csv').write_text(original.replace(
+        '"TRANSFERENCIA A Alvaro Garcia Velasco","30/04/2025","-20.00","4,859.01","152350149",""',
+        '"TRANSFERENCIA A Alvaro Garcia Velasco S","30/04/2025","-20.00","4,859.01","","X"'), encoding='utf-8')
+    perfilador = ProfileData()
+    df = ingestar(tmp_path, loader=LoadData(COLUMNAS, incluir_origen=True),
+                  configuracion=RuntimeConfig(modo='bloques', filas_por_bloque=16), perfilador=perfilador)
+    assert df['Referencia 1'].eq('152350149').any() and df['Referencia 2'].eq('X').any()
+    completo = ProfileData()
+    completo.actualizar(df)
+
+    assert sum(p.filas for p in perfilador.perfiles.values()) == len(df)
+    assert set(perfilador.perfiles) == set(completo.perfiles)
+    for clave, perfil in completo.perfiles.items():
+        bloques = perfilador.perfiles[clave]
+        assert (bloques.filas, bloques.nulos, bloques.ingresos, bloques.gastos) == \
+               (perfil.filas, perfil.nulos, perfil.ingresos, perfil.gastos)
+        assert bloques.cuantiles['Importe'].cubos == perfil.cuantiles['Importe'].cubos
+        assert bloques.conceptos.recuentos == perfil.conceptos.recuentos
+    assert perfilador.total().minimos['Fecha Operación'] == df['Fecha Operación'].min()
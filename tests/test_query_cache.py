@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la caché de resultados de DatabaseConnector.
+"""
+
+import os
+import sys
+import time
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config.query_cache import QueryCache, es_cacheable, es_lectura, relaciones_leidas, tabla_escrita
+from config.statement_cache import convertir_marcadores
+
+
+def test_clave_y_dependencias():
+    """La misma consulta con otro formato comparte entrada; los literales se respetan."""
+    assert QueryCache.key("SELECT *\n  FROM gastos_2025;", None) == QueryCache.key("select * from gastos_2025", None)
+    assert QueryCache.key("SELECT 'A  b'", None) != QueryCache.key("SELECT 'a b'", None)
+    assert QueryCache.key("SELECT %s", (1,)) != QueryCache.key("SELECT %s", (2,))
+
+    assert relaciones_leidas("SELECT * FROM public.gastos_2025 g, vw_x v JOIN cuentas c ON c.id = g.cuenta_id") == \
+        {'gastos_2025', 'cuentas', 'vw_x'}
+    # Los identificadores entre comillas dobles distinguen mayúsculas
+    assert QueryCache.key('SELECT "Importe" FROM t', None) != QueryCache.key('SELECT "importe" FROM t', None)
+    assert QueryCache.key('SELECT  "Importe"  FROM T', None) == QueryCache.key('select "Importe" from t', None)
+    # El FROM de EXTRACT/SUBSTRING no es una relación; el de una subconsulta, sí
+    assert relaciones_leidas("SELECT EXTRACT(YEAR FROM fecha_operacion), SUBSTRING(concepto FROM 1 FOR 4) "
+                             "FROM gastos_2025 WHERE cuenta_id IN (SELECT id FROM cuentas)") == {'gastos_2025', 'cuentas'}
+    assert relaciones_leidas("SELECT COALESCE((SELECT MAX(importe) FROM gastos_2025), 0) "
+                             "FROM (SELECT * FROM cuentas) c") == {'gastos_2025', 'cuentas'}
+    assert tabla_escrita("INSERT INTO gastos_2025 (a) VALUES ('x; y')") == 'gastos_2025'
+    assert tabla_escrita("UPDATE cuentas SET titular = NULL; DELETE FROM gastos_2025") is None
+    assert es_cacheable("SELECT version();")
+    assert not es_cacheable("SELECT now()")
+    assert not es_cacheable("WITH x AS (DELETE FROM t RETURNING *) SELECT * FROM x")
+    assert es_lectura("SELECT now()")
+    assert not es_lectura("CREATE TABLE t (id INTEGER)")
+
+
+def test_marcadores_de_sentencias_preparadas():
+    """Los %s pasan a $n; con % en un literal o parámetros con nombre no se prepara."""
+    assert convertir_marcadores("SELECT * FROM t WHERE a = %s AND b = 'it''s' AND c = %s;") == \
+        ("SELECT * FROM t WHERE a = $1 AND b = 'it''s' AND c = $2", 2)
+    assert convertir_marcadores("SELECT 100 %% 7") == ("SELECT 100 % 7", 0)
+    # psycopg2 también sustituye dentro de los literales: preparada cambiaría de sentido
+    assert convertir_marcadores("SELECT * FROM t WHERE a = %s AND b LIKE '%s%%'") is None
+    assert convertir_marcadores("SELECT concepto || '%%' FROM t WHERE id = %s") is None
+    assert convertir_marcadores("SELECT * FROM t WHERE a = %(a)s") is None
+    assert convertir_marcadores("SELECT 100 % 7") is None
+
+
+def test_lru_ttl_e_invalidacion():
+    cache = QueryCache(ttl=0.2, max_bytes=4096)
+    filas = [{'id': i, 'concepto': 'CAFE'} for i in range(5)]
+    cache.put(('a',), filas, {'gastos_2025'})
+    cache.put(('b',), filas, {'cuentas'})
+
+    copia = cache.get(('a',))
+    assert copia == filas
+    copia[0]['concepto'] = 'modificado'  # las filas devueltas son copias
+    assert cache.get(('a',))[0]['concepto'] == 'CAFE'
+
+    assert cache.invalidate(['public.GASTOS_2025']) == 1
+    assert cache.get(('a',)) is None and cache.get(('b',)) is not None
+
+    # Por tamaño se expulsa la menos usada recientemente
+    for i in range(50):
+        cache.put(('c', i), filas, set())
+    assert cache.stats()['bytes'] <= 4096 and cache.stats()['evictions'] > 0
+    assert cache.get(('b',)) is None
+
+    time.sleep(0.25)
+    assert cache.get(('c', 49)) is None
+    estadisticas = cache.stats()
+    assert estadisticas['hits'] == 3 and estadisticas['misses'] == 3
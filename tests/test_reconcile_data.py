@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la conciliación de saldos de ReconcileData.
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl.reconcile_data import ReconcileData
+
+
+def _exportacion(archivo, filas):
+    """Filas (fecha, importe, saldo) en el orden del banco: de la más reciente a la más antigua."""
+    df = pd.DataFrame(filas, columns=['Fecha Operación', 'Importe', 'Saldo'])
+    df['Archivo'] = archivo
+    df['Fila_Archivo'] = range(len(df))
+    return df
+
+
+ABRIL = [('30/04/2025', '-20.00', '4,859.01'),
+         ('30/04/2025', '100.00', '4,879.01'),
+         ('29/04/2025', '-200.00', '4,779.01'),
+         ('28/04/2025', '-54.03', '4,979.01')]
+MAYO = [('02/05/2025', '-59.01', '4,800.00'),
+        ('01/05/2025', '0.00', '4,859.01')]
+
+
+def test_exportaciones_consecutivas_concilian():
+    reconciler = ReconcileData()
+    df = pd.concat([_exportacion('abril.csv', ABRIL), _exportacion('mayo.csv', MAYO)], ignore_index=True)
+
+    assert reconciler.conciliar_saldos(df).empty
+    assert reconciler.validar_lote(df)
+
+
+def test_movimiento_faltante():
+    reconciler = ReconcileData()
+    df = _exportacion('abril.csv', ABRIL).drop(index=1)
+
+    rupturas = reconciler.conciliar_saldos(df)
+
+    assert list(rupturas['tipo']) == ['movimiento_faltante']
+    assert rupturas['diferencia'].iloc[0] == 10000
+
+
+def test_exportaciones_solapadas():
+    reconciler = ReconcileData()
+    df = pd.concat([_exportacion('abril.csv', ABRIL), _exportacion('abril_2.csv', ABRIL[:2])], ignore_index=True)
+
+    solapes = reconciler.detectar_solapes(df)
+
+    assert list(solapes['archivo']) == ['abril_2.csv']
+    assert list(solapes['solapa_con']) == ['abril.csv']
+    assert set(reconciler.conciliar_saldos(df)['tipo']) == {'duplicado'}
+    assert not reconciler.validar_lote(df)
+
+
+def test_solape_con_el_fichero_que_cubre_el_rango():
+    # trimestre.csv cubre abril y mayo; mayo.csv empieza después de abril.csv
+    # pero solapa con el trimestre, no con el fichero anterior
+    reconciler = ReconcileData()
+    df = pd.concat([_exportacion('trimestre.csv', MAYO + ABRIL), _exportacion('abril.csv', ABRIL[:2]),
+                    _exportacion('mayo.csv', MAYO)], ignore_index=True)
+
+    solapes = reconciler.detectar_solapes(df)
+
+    assert list(solapes['archivo']) == ['abril.csv', 'mayo.csv']
+    assert list(solapes['solapa_con']) == ['trimestre.csv', 'trimestre.csv']
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Pruebas del detector de pagos recurrentes de RecurringData.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl.recurring_data import RecurringData
+
+
+def _movimientos(filas):
+    """Filas (cuenta, fecha, concepto, importe en céntimos)."""
+    df = pd.DataFrame(filas, columns=['Cuenta_Id', 'Fecha Operación', 'Concepto', 'Importe'])
+    df['Fecha Operación'] = pd.to_datetime(df['Fecha Operación'])
+    df['Importe'] = df['Importe'].astype('int64')
+    return df
+
+
+def test_detecta_periodicidades_y_proxima_fecha():
+    rng = np.random.default_rng(1)
+    filas = []
+    # Suscripción mensual con referencias distintas y algún día de desfase
+    for mes in range(1, 13):
+        dia = 5 + int(rng.integers(0, 3))
+        filas.append((1, f'2024-{mes:02d}-{dia:02d}',
+                      f'COMPRA TARJ. 5402XXXXXXXX8018 NETFLIX.COM-{rng.integers(10**9)}', -1599))
+    # Bizum semanal con importe ligeramente variable
+    for semana in pd.date_range('2024-09-02', periods=10, freq='7D'):
+        filas.append((1, str(semana.date()), 'PAGO BIZUM PADEL', -500 - int(rng.integers(0, 40))))
+    # Seguro anual
+    for anio in (2022, 2023, 2024):
+        filas.append((1, f'{anio}-03-15', 'RECIBO SEGURO HOGAR', -31000))
+    # Ruido: compras sin patrón
+    for i in range(40):
+        filas.append((1, str((pd.Timestamp('2024-01-01') + pd.Timedelta(days=int(rng.integers(0, 365)))).date()),
+                      f'COMPRA TARJ. TIENDA {i % 7}A', -int(rng.integers(100, 20000))))
+
+    resultado = RecurringData().detectar(_movimientos(filas))
+    por_concepto = resultado.set_index('Concepto')
+
+    netflix = por_concepto.loc['COMPRA TARJ NETFLIX COM']
+    assert netflix['Periodicidad'] == 'mensual'
+    assert netflix['Ocurrencias'] == 12
+    assert netflix['Importe'] == -1599
+    assert netflix['Proxima_Fecha'] == netflix['Ultima_Fecha'] + pd.DateOffset(months=1)
+
+    assert por_concepto.loc['PAGO BIZUM PADEL', 'Periodicidad'] == 'semanal'
+    assert por_concepto.loc['RECIBO SEGURO HOGAR', 'Periodicidad'] == 'anual'
+    assert por_concepto.loc['RECIBO SEGURO HOGAR', 'Proxima_Fecha'] == pd.Timestamp('2025-03-15')
+    assert not resultado['Concepto'].str.startswith('COMPRA TARJ TIENDA').any()
+
+
+def test_series_por_cuenta_y_banda_de_importe():
+    filas = []
+    for mes in range(1, 7):
+        fecha = f'2025-{mes:02d}-01'
+        filas.append((1, fecha, 'TRANSFERENCIA ALQUILER', -80000))
+        filas.append((2, fecha, 'TRANSFERENCIA ALQUILER', -80000))
+        # Mismo concepto, importe muy distinto: es otra serie
+        filas.append((1, f'2025-{mes:02d}-20', 'TRANSFERENCIA ALQUILER', -5000))
+
+    resultado = RecurringData().detectar(_movimientos(filas))
+    assert len(resultado) == 3
+    assert sorted(resultado['Cuenta_Id'].tolist()) == [1, 1, 2]
+    assert set(resultado['Importe']) == {-80000, -5000}
+    assert (resultado['Periodicidad'] == 'mensual').all()
+
+
+def test_sin_recurrentes():
+    resultado = RecurringData().detectar(_movimientos([(0, '2025-01-01', 'COMPRA', -100)]))
+    assert resultado.empty
+    assert 'Proxima_Fecha' in resultado.columns
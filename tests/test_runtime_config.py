@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la configuración de ejecución y de los modos de ingesta.
+"""
+
+import csv
+import os
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl import runtime_config
+from etl.logger import Logger
+from etl.pipeline import ingestar
+from etl.runtime_config import RuntimeConfig, cargar_configuracion
+
+DATOS = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def test_yaml_y_entorno(tmp_path):
+    """El entorno tiene prioridad sobre config.yaml; 'auto' deja el valor calculado."""
+    ruta = tmp_path / 'config.yaml'
+    ruta.write_text(
+        "datos:\n  directorio: exportaciones\n"
+        "ejecucion:\n  memoria_mb: 512\n  workers: auto\n  modo: bloques\n"
+        "base_datos:\n  max_conexiones: 4\n  sqlite: gastos.sqlite\n",
+        encoding='utf-8')
+
+    config = cargar_configuracion(ruta, entorno={'WORKERS': '3', 'DB_MIN_CONNECTIONS': '2'})
+    assert config.memoria_mb == 512
+    assert config.workers == 3
+    assert config.modo == 'bloques'
+    assert (config.db_min_conexiones, config.db_max_conexiones) == (2, 4)
+    assert config.directorio_datos == str(tmp_path / 'exportaciones')
+    assert config.motor_bd == 'postgres' and config.ruta_sqlite == str(tmp_path / 'gastos.sqlite')
+    assert cargar_configuracion(ruta, entorno={'DB_MOTOR': 'sqlite'}).motor_bd == 'sqlite'
+
+    sin_fichero = cargar_configuracion(tmp_path / 'no_existe.yaml', entorno={})
+    assert sin_fichero.modo == 'auto' and sin_fichero.workers >= 1 and sin_fichero.memoria_mb >= 256
+
+    with pytest.raises(ValueError):
+        cargar_configuracion(ruta, entorno={'MODO_EJECUCION': 'turbo'})
+    with pytest.raises(ValueError):
+        cargar_configuracion(ruta, entorno={'MEMORIA_MB': 'mucha'})
+    with pytest.raises(ValueError):
+        cargar_configuracion(ruta, entorno={'DB_MOTOR': 'oracle'})
+
+
+def test_el_env_se_carga_antes_de_leer_el_entorno(tmp_path, monkeypatch):
+    """Sin `entorno` explícito se lee el .env, aunque no exista aún ningún conector."""
+    env = tmp_path / '.env'
+    env.write_text("DB_MOTOR=sqlite\nMEMORIA_MB=300\n", encoding='utf-8')
+    monkeypatch.setattr(runtime_config, 'RUTA_ENTORNO', env)
+    monkeypatch.setattr(runtime_config, '_entorno_cargado', False)
+    for variable in ('DB_MOTOR', 'MEMORIA_MB'):
+        monkeypatch.delenv(variable, raising=False)
+
+    config = cargar_configuracion(tmp_path / 'no_existe.yaml')
+    assert (config.motor_bd, config.memoria_mb) == ('sqlite', 300)
+
+
+def test_elegir_modo_segun_memoria_y_workers(tmp_path):
+    grande, pequeno = tmp_path / 'grande.csv', tmp_path / 'pequeno.csv'
+    grande.write_bytes(b'x' * 20 * 1024 * 1024)
+    pequeno.write_bytes(b'x' * 1024)
+
+    # 20 MB de CSV ocupan unos 160 MB en memoria
+    assert RuntimeConfig(memoria_mb=100, workers=4).elegir_modo([grande]) == 'bloques'
+    assert RuntimeConfig(memoria_mb=4096, workers=4).elegir_modo([grande, pequeno]) == 'paralelo'
+    assert RuntimeConfig(memoria_mb=4096, workers=1).elegir_modo([grande, pequeno]) == 'memoria'
+    assert RuntimeConfig(memoria_mb=4096, workers=4).elegir_modo([pequeno]) == 'memoria'
+    assert RuntimeConfig(memoria_mb=4096, modo='bloques').elegir_modo([pequeno]) == 'bloques'
+
+    # Lotes y bloques crecen con el presupuesto, dentro de sus límites
+    pequeno, grande = RuntimeConfig(memoria_mb=256), RuntimeConfig(memoria_mb=64 * 1024)
+    assert pequeno.tamano_lote_bd() < grande.tamano_lote_bd() <= 50_000
+    assert pequeno.tamano_bloque() < grande.tamano_bloque() <= 1_000_000
+    assert RuntimeConfig(filas_por_lote_bd=500).tamano_lote_bd() == 500
+
+
+def test_los_tres_modos_dan_el_mismo_resultado(tmp_path):
+    # Una exportación más con la Referencia 1 solo de dígitos o vacía
+    shutil.copytree(DATOS, tmp_path, dirs_exist_ok=True)
+    with open(os.path.join(DATOS, 'gastos_abril.csv'), encoding='utf-8', newline='') as f:
+        filas = list(csv.reader(f))
+    for n, fila in enumerate(filas[9:]):
+        fila[5] = str(152350149 + n) if n % 2 else ''
+    with open(tmp_path / 'gastos_abril_referencias.csv', 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f, quoting=csv.QUOTE_ALL).writerows(filas)
+
+    logger = Logger()
+    resultados = {modo: ingestar(str(tmp_path), logger,
+                                 configuracion=RuntimeConfig(modo=modo, workers=3, filas_por_bloque=40))
+                  for modo in ('memoria', 'bloques', 'paralelo')}
+
+    assert len(resultados['memoria']) > 0
+    assert '152350150' in set(resultados['memoria']['Referencia 1'])
+    for modo in ('bloques', 'paralelo'):
+        pd.testing.assert_frame_equal(resultados[modo].reset_index(drop=True),
+                                      resultados['memoria'].reset_index(drop=True))
+
+
+def test_los_tres_modos_con_csv_y_excel(tmp_path):
+    """Las exportaciones CSV y Excel de un mismo lote dan los mismos importes en cualquier modo."""
+    openpyxl = pytest.importorskip('openpyxl')
+    datos, cache = tmp_path / 'datos', tmp_path / 'cache'
+    datos.mkdir()
+    shutil.copy(os.path.join(DATOS, 'gastos_enero.csv'), datos)
+    libro = openpyxl.Workbook()
+    with open(os.path.join(DATOS, 'gastos_febrero.csv'), encoding='utf-8', newline='') as f:
+        for n, fila in enumerate(csv.reader(f)):
+            if n >= 9:
+                # Importe y saldo como celdas numéricas, igual que las exporta el banco
+                fila[3], fila[4] = float(fila[3].replace(',', '')), float(fila[4].replace(',', ''))
+            libro.active.append([v if v != '' else None for v in fila])
+    libro.save(datos / 'gastos_febrero.xlsx')
+
+    logger = Logger()
+    # El primer modo convierte el libro a la caché columnar y los demás la leen
+    resultados = {modo: ingestar(str(datos), logger,
+                                 configuracion=RuntimeConfig(modo=modo, workers=3, filas_por_bloque=40,
+                                                             directorio_cache=str(cache)))
+                  for modo in ('memoria', 'bloques', 'paralelo')}
+    assert any(cache.glob('gastos_febrero_*.json'))
+
+    febrero = resultados['memoria'][resultados['memoria']['Archivo'] == 'gastos_febrero.xlsx']
+    assert len(febrero) > 0
+    assert febrero['Saldo'].abs().max() < 10_000_000
+    for modo in ('bloques', 'paralelo'):
+        pd.testing.assert_frame_equal(resultados[modo].reset_index(drop=True),
+                                      resultados['memoria'].reset_index(drop=True))
+
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Pruebas de las series temporales (periodos, gasto móvil, saldo y variaciones).
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl.load_data import LoadData
+from etl.pipeline import COLUMNAS, ingestar
+from etl.runtime_config import RuntimeConfig
+from etl.series_data import SeriesData
+
+DATOS = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def _movimientos(dias=3 * 365, por_dia=4, semilla=0):
+    """
+    Movimientos sintéticos de varios años en el orden del banco (del más
+    reciente al más antiguo dentro de cada día), con el saldo encadenado.
+    """
+    rng = np.random.default_rng(semilla)
+    fechas = np.repeat(pd.date_range('2022-01-01', periods=dias, freq='D'), por_dia)
+    conceptos = rng.choice(['COMPRA TARJ MERCADONA', 'PAGO BIZUM A ANA', 'RECIBO LUZ IBERDROLA', 'NOMINA EMPRESA'],
+                           len(fechas))
+    importe = np.where(conceptos == 'NOMINA EMPRESA', rng.integers(1_000, 5_000, len(fechas)),
+                       -rng.integers(100, 10_000, len(fechas)))
+    df = pd.DataFrame({'Fecha Operación': fechas, 'Concepto': conceptos, 'Importe': importe,
+                       'Saldo': 1_000_000 + np.cumsum(importe), 'Cuenta_Id': 1})
+    return df.iloc[::-1].reset_index(drop=True)
+
+
+def test_periodos_y_gasto_movil():
+    df = _movimientos()
+    series = SeriesData()
+    series.actualizar(df)
+
+    for frecuencia in ('dia', 'semana', 'mes'):
+        periodos = series.ingresos_gastos(frecuencia)
+        assert periodos['neto'].sum() == df['Importe'].sum()
+        assert periodos['movimientos'].sum() == len(df)
+    meses = series.ingresos_gastos('mes')
+    assert len(meses) == 36
+    enero = df[df['Fecha Operación'].dt.strftime('%Y-%m') == '2023-01']
+    assert meses.loc['2023-01-01', 'gastos'] == enero['Importe'].clip(upper=0).sum()
+    assert series.ingresos_gastos('semana').index[0] == pd.Timestamp('2021-12-27')
+
+    movil = series.gasto_movil()
+    dia = pd.Timestamp('2023-06-15')
+    for ventana in (7, 30, 90):
+        en_ventana = df['Fecha Operación'].between(dia - pd.Timedelta(days=ventana - 1), dia)
+        assert movil.loc[dia, f'gasto_{ventana}d'] == df.loc[en_ventana, 'Importe'].clip(upper=0).sum()
+    assert movil.loc[dia, 'ritmo_diario_30d'] == round(movil.loc[dia, 'gasto_30d'] / 30, 2)
+
+
+def test_saldo_de_cierre_y_dias_sin_movimientos():
+    df = _movimientos(dias=60)
+    # Un hueco de una semana sin movimientos y un movimiento sin importe al cierre del día
+    df = df[~df['Fecha Operación'].between('2022-01-20', '2022-01-26')]
+    cierre = df[df['Fecha Operación'] == '2022-01-10'].iloc[0]
+    retencion = cierre.copy()
+    retencion['Concepto'], retencion['Importe'] = 'RETENCION', 0
+    df = pd.concat([df[df.index < cierre.name], retencion.to_frame().T, df[df.index >= cierre.name]])
+    df = df.astype({'Importe': 'int64', 'Saldo': 'int64', 'Cuenta_Id': 'int64'})
+    otra = _movimientos(dias=30, semilla=1).assign(Cuenta_Id=2)
+
+    series = SeriesData()
+    series.actualizar(pd.concat([df, otra], ignore_index=True))
+    curva = series.saldo_acumulado()
+    ultimo_dia = df.groupby('Fecha Operación')['Saldo'].first()
+    assert (curva.loc[ultimo_dia.index, 1] == ultimo_dia).all()
+    # En los días sin movimientos se mantiene el último saldo
+    assert curva.loc['2022-01-23', 1] == ultimo_dia.loc['2022-01-19']
+    assert curva.loc['2022-02-15', 2] == otra['Saldo'].iloc[0]
+    assert curva.loc['2022-01-05', 'total'] == curva.loc['2022-01-05', 1] + curva.loc['2022-01-05', 2]
+
+
+def test_variaciones_mensual_e_interanual():
+    df = _movimientos()
+    series = SeriesData()
+    series.actualizar(df)
+    variaciones = series.variaciones_categoria().set_index(['mes', 'categoria'])
+
+    gastos = df[df['Importe'] < 0]
+    mensual = gastos.groupby([gastos['Fecha Operación'].dt.strftime('%Y-%m'),
+                              gastos['Concepto'].str.split(' ').str[:2].str.join(' ')])['Importe'].sum()
+    fila = variaciones.loc[('2024-03', 'COMPRA TARJ')]
+    assert fila['gasto'] == mensual[('2024-03', 'COMPRA TARJ')]
+    assert fila['variacion_mes'] == mensual[('2024-03', 'COMPRA TARJ')] - mensual[('2024-02', 'COMPRA TARJ')]
+    assert fila['variacion_anio'] == mensual[('2024-03', 'COMPRA TARJ')] - mensual[('2023-03', 'COMPRA TARJ')]
+    assert np.isclose(fila['variacion_anio_pct'], fila['variacion_anio'] / abs(mensual[('2023-03', 'COMPRA TARJ')]))
+    # El primer año no tiene referencia interanual y la nómina no es gasto
+    assert variaciones.loc['2022-05', 'variacion_anio'].isna().all()
+    assert 'NOMINA EMPRESA' not in variaciones.index.get_level_values('categoria')
+
+
+def test_solo_se_recalculan_los_meses_tocados(tmp_path):
+    df = _movimientos()
+    series = SeriesData(directorio_cache=tmp_path)
+    assert len(series.procesar(df)) == 36
+
+    # Una carga nueva que toca marzo de 2024 y abre un mes nuevo
+    nuevos = pd.DataFrame({'Fecha Operación': pd.to_datetime(['2024-03-31', '2025-01-02']),
+                           'Concepto': ['COMPRA TARJ ZARA', 'COMPRA TARJ ZARA'], 'Importe': [-5_000, -7_000],
+                           'Saldo': [0, 0], 'Cuenta_Id': 1})
+    ampliado = pd.concat([nuevos, df], ignore_index=True)
+    recargada = SeriesData(directorio_cache=tmp_path)
+    assert recargada.procesar(ampliado) == ['2024-03', '2025-01']
+    assert recargada.procesar(ampliado.sample(frac=1, random_state=0)) == []
+
+    # Solo con los movimientos de los meses cargados también vale
+    marzo = ampliado[ampliado['Fecha Operación'].dt.strftime('%Y-%m') == '2024-03']
+    assert SeriesData(directorio_cache=tmp_path).procesar(marzo) == []
+
+    completa = SeriesData()
+    completa.actualizar(ampliado)
+    guardada = SeriesData(directorio_cache=tmp_path)
+    assert guardada.cargar_estado()
+    pd.testing.assert_frame_equal(guardada.ingresos_gastos('mes'), completa.ingresos_gastos('mes'))
+    pd.testing.assert_frame_equal(guardada.variaciones_categoria(), completa.variaciones_categoria())
+
+
+def test_movimientos_del_repositorio():
+    df = ingestar(DATOS, loader=LoadData(COLUMNAS), configuracion=RuntimeConfig(modo='memoria'))
+    series = SeriesData()
+    series.actualizar(df)
+    meses = series.ingresos_gastos('mes')
+    abril = df[df['Fecha Operación'].dt.strftime('%Y-%m') == '2025-04']
+    assert meses.loc['2025-04-01', 'gastos'] == abril['Importe'].clip(upper=0).sum()
+    assert meses.loc['2025-04-01', 'movimientos'] == len(abril)
+    assert len(series.saldo_acumulado()) == (df['Fecha Operación'].max() - df['Fecha Operación'].min()).days + 1
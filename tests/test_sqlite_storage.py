@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Pruebas del almacén SQLite (carga y consultas sin servidor de base de datos).
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+
+import pandas as pd
+import pytest
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config.sqlite_storage import SQLiteStorage
+from config.storage import abrir_almacen
+from etl.anomaly_data import AnomalyData
+from etl.DB_Gastos import (cargar_cuentas, cargar_directorio, cargar_movimientos, crear_tablas, huellas_archivos,
+                           pendientes_de_carga)
+from etl.load_data import LoadData
+from etl.pipeline import COLUMNAS, crear_cargador, guardar_cuentas, ingestar
+from etl.runtime_config import RuntimeConfig
+from viz.analisis_abril import cargar_gastos_mes
+
+DATOS = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+@pytest.fixture
+def movimientos():
+    loader = LoadData(COLUMNAS, incluir_origen=True)
+    return ingestar(DATOS, loader=loader, configuracion=RuntimeConfig(modo='memoria')), loader
+
+
+def test_carga_y_recarga_sin_duplicar(tmp_path, movimientos):
+    df, loader = movimientos
+    ruta = tmp_path / 'gastos.sqlite'
+    with abrir_almacen(RuntimeConfig(motor_bd='sqlite', ruta_sqlite=str(ruta))) as almacen:
+        assert isinstance(almacen, SQLiteStorage)
+        crear_tablas(almacen)
+        assert len(cargar_movimientos(df, 'gastos_2025', almacen, loader, filas_por_lote=7)) == len(df)
+        assert almacen.connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        indices = {fila[1] for fila in almacen.connection.execute("PRAGMA index_list(gastos_2025)")}
+        assert {'idx_gastos_2025_fecha', 'idx_gastos_2025_concepto'} <= indices
+
+    # Al reabrir el fichero, las cuentas se conservan y nada se vuelve a insertar
+    with SQLiteStorage(ruta) as almacen:
+        assert cargar_cuentas(almacen) == loader.cuentas
+        assert cargar_movimientos(df, 'gastos_2025', almacen, loader).empty
+        # Tampoco una reexportación con los conceptos algo cambiados (duplicados difusos)
+        variante = df.assign(Concepto=df['Concepto'].str.replace('.', ' ', regex=False) + ' ES')
+        assert cargar_movimientos(variante[variante['Importe'] != 0], 'gastos_2025', almacen, loader).empty
+        assert almacen.connection.execute("SELECT COUNT(*) FROM gastos_2025").fetchone()[0] == len(df)
+
+
+def test_cargar_directorio_puntua_lo_insertado_en_su_cache(tmp_path):
+    configuracion = RuntimeConfig(motor_bd='sqlite', ruta_sqlite=str(tmp_path / 'gastos.sqlite'), modo='memoria',
+                                  directorio_cache=str(tmp_path / 'config'))
+    with abrir_almacen(configuracion) as almacen:
+        assert cargar_directorio(almacen, DATOS, configuracion=configuracion, directorio_cache=tmp_path / 'cli')
+        insertados = almacen.connection.execute("SELECT COUNT(*) FROM gastos_2025").fetchone()[0]
+        # Una segunda carga no inserta nada y no vuelve a puntuar
+        assert cargar_directorio(almacen, DATOS, configuracion=configuracion, directorio_cache=tmp_path / 'cli')
+
+    anomalias = AnomalyData(directorio_cache=tmp_path / 'cli')
+    assert anomalias.cargar_estado()
+    assert len(anomalias.puntuadas) == insertados
+    assert not AnomalyData(directorio_cache=tmp_path / 'config').cargar_estado()
+
+    # Sin directorio explícito se usa el de la configuración
+    with SQLiteStorage() as almacen:
+        assert cargar_directorio(almacen, DATOS, configuracion=configuracion)
+    assert AnomalyData(directorio_cache=tmp_path / 'config').cargar_estado()
+
+
+def test_ingest_y_load_comparten_las_claves_de_cuenta(tmp_path):
+    datos, cache = tmp_path / 'datos', tmp_path / 'cache'
+    datos.mkdir()
+    shutil.copy(os.path.join(DATOS, 'gastos_abril.csv'), datos)
+    configuracion = RuntimeConfig(motor_bd='sqlite', ruta_sqlite=str(tmp_path / 'gastos.sqlite'), modo='memoria',
+                                  directorio_cache=str(cache))
+    with abrir_almacen(configuracion) as almacen:
+        assert cargar_directorio(almacen, datos, configuracion=configuracion)
+        assert cargar_cuentas(almacen) == {'ES4400812708010006216235': 1}
+
+    # Otra cuenta cuyo fichero va antes por nombre: la ingesta sin base de datos
+    # respeta la clave que ya tiene la primera y da la siguiente a la nueva
+    with open(os.path.join(DATOS, 'gastos_mayo.csv'), encoding='utf-8') as f:
+        texto = f.read().replace('ES44 0081 2708 0100 0621 6235', 'ES11 2222 3333 4444 5555 6666')
+    (datos / 'a_otra_cuenta.csv').write_text(texto, encoding='utf-8')
+    loader = crear_cargador(cache)
+    df = ingestar(datos, loader=loader, configuracion=configuracion)
+    guardar_cuentas(loader)
+    assert df.groupby('Archivo')['Cuenta_Id'].unique().map(list).to_dict() == {
+        'a_otra_cuenta.csv': [2], 'gastos_abril.csv': [1]}
+
+    with abrir_almacen(configuracion) as almacen:
+        assert cargar_directorio(almacen, datos, configuracion=configuracion)
+        assert cargar_cuentas(almacen) == loader.cuentas
+
+
+def test_periodos_y_agregados_en_centimos(movimientos):
+    df, loader = movimientos
+    with SQLiteStorage() as almacen:
+        crear_tablas(almacen)
+        cargar_movimientos(df, 'gastos_2025', almacen, loader)
+
+        fechas = df['Fecha Operación']
+        abril = df[(fechas >= '2025-04-01') & (fechas < '2025-05-01')]
+        gastos = cargar_gastos_mes(almacen, 'abril')
+        assert len(gastos) == len(abril)
+        assert int(gastos['importe_centimos'].sum()) == int(abril['Importe'].sum())
+        assert str(gastos['fecha_operacion'].dtype).startswith('datetime64')
+
+        por_mes = almacen.totals('2025-01-01', '2026-01-01', by='mes')
+        esperado = df.groupby(fechas.dt.to_period('M'))['Importe'].agg(['size', 'sum'])
+        assert por_mes['movimientos'].tolist() == esperado['size'].tolist()
+        assert por_mes['total'].tolist() == esperado['sum'].tolist()
+        assert (por_mes['ingresos'] + por_mes['gastos']).tolist() == por_mes['total'].tolist()
+
+        por_concepto = almacen.totals('2025-01-01', '2026-01-01', by='concepto')
+        assert por_concepto['movimientos'].sum() == len(df)
+        with pytest.raises(ValueError):
+            almacen.totals('2025-01-01', '2026-01-01', by='semana')
+
+
+def test_carga_por_lotes_se_reanuda_tras_un_fallo(tmp_path, movimientos, monkeypatch):
+    df, loader = movimientos
+    ruta = tmp_path / 'gastos.sqlite'
+    with SQLiteStorage(ruta) as almacen:
+        crear_tablas(almacen)
+        insertar = almacen.insert_batch
+        lotes = []
+
+        def insertar_y_fallar(tabla, lote, punto_control):
+            if len(lotes) == 5:
+                raise sqlite3.OperationalError('disk I/O error')
+            lotes.append(punto_control)
+            return insertar(tabla, lote, punto_control)
+
+        monkeypatch.setattr(almacen, 'insert_batch', insertar_y_fallar)
+        with pytest.raises(RuntimeError):
+            cargar_movimientos(df, 'gastos_2025', almacen, loader, filas_por_lote=20)
+        confirmadas = sum(p[-1] for p in lotes)
+        assert almacen.count_movements('gastos_2025') == confirmadas < len(df)
+
+    # Al volver a ejecutar se sigue desde el último lote confirmado de cada fichero
+    with SQLiteStorage(ruta) as almacen:
+        nuevos = cargar_movimientos(df, 'gastos_2025', almacen, loader, filas_por_lote=20)
+        assert len(nuevos) == len(df) - confirmadas
+        assert almacen.count_movements('gastos_2025') == len(df)
+
+        control = almacen.checkpoints('gastos_2025').set_index('archivo')
+        assert control['filas'].to_dict() == df.groupby('Archivo')['Archivo'].size().to_dict()
+        lotes_por_archivo = almacen.connection.execute(
+            "SELECT archivo, COUNT(*), MAX(lote) FROM cargas_control GROUP BY archivo").fetchall()
+        assert all(n == maximo for _, n, maximo in lotes_por_archivo)
+
+        # Lo confirmado no se vuelve a leer; una exportación distinta con el
+        # mismo nombre no hereda los puntos de control
+        assert pendientes_de_carga(df, 'gastos_2025', almacen, huellas_archivos(df)).empty
+        cambiada = df[df['Archivo'] == 'gastos_mayo.csv'].iloc[:-1]
+        assert len(pendientes_de_carga(cambiada, 'gastos_2025', almacen, huellas_archivos(cambiada))) == len(cambiada)
+        assert cargar_movimientos(cambiada, 'gastos_2025', almacen, loader).empty
+
+
+def test_carga_por_lotes_con_otra_cuenta_escribiendo(tmp_path, movimientos, monkeypatch):
+    df, loader = movimientos
+    ruta = tmp_path / 'gastos.sqlite'
+    with SQLiteStorage(ruta) as almacen:
+        crear_tablas(almacen)
+        with almacen.connection:
+            almacen.connection.execute("INSERT INTO cuentas (id, iban) VALUES (9, 'ES00')")
+        insertar, contar = almacen.insert_batch, almacen.count_movements
+        recuentos = []
+
+        def insertar_y_escribir_otra(tabla, lote, punto_control):
+            # Otra carga (watch) escribe movimientos de otra cuenta entre lotes
+            otra = sqlite3.connect(ruta)
+            with otra:
+                otra.execute(f"INSERT INTO {tabla} (Fecha_Operacion, Importe, Cuenta_Id) VALUES ('2025-04-15', -100, 9)")
+            otra.close()
+            return insertar(tabla, lote, punto_control)
+
+        def contar_acotado(tabla, *args, **kwargs):
+            recuentos.append(args or kwargs)
+            return contar(tabla, *args, **kwargs)
+
+        monkeypatch.setattr(almacen, 'insert_batch', insertar_y_escribir_otra)
+        monkeypatch.setattr(almacen, 'count_movements', contar_acotado)
+        assert len(cargar_movimientos(df, 'gastos_2025', almacen, loader, filas_por_lote=20)) == len(df)
+        assert pendientes_de_carga(df, 'gastos_2025', almacen, huellas_archivos(df)).empty
+        # Solo se cuentan las cuentas y fechas cargadas, nunca la tabla entera
+        assert recuentos and all(recuentos)
+        cuentas = sorted(int(c) for c in df['Cuenta_Id'].unique())
+        fechas = pd.to_datetime(df['Fecha Operación'])
+        assert contar('gastos_2025', cuentas, fechas.min(), fechas.max()) == len(df)
+        assert contar('gastos_2025') > len(df)
+
+
+def test_carga_inicial_por_lotes_sin_indices(tmp_path, movimientos, monkeypatch):
+    import config.sqlite_storage as sqlite_storage
+
+    df, loader = movimientos
+    monkeypatch.setattr(sqlite_storage, 'FILAS_RECONSTRUIR_INDICES', 10)
+    with SQLiteStorage(tmp_path / 'gastos.sqlite') as almacen:
+        crear_tablas(almacen)
+
+        def indices():
+            return {fila[1] for fila in almacen.connection.execute("PRAGMA index_list(gastos_2025)")}
+
+        todos, durante = indices(), []
+        insertar = almacen.insert_batch
+
+        def insertar_y_fallar(tabla, lote, punto_control):
+            durante.append(indices())
+            if len(durante) == 5:
+                raise sqlite3.OperationalError('disk I/O error')
+            return insertar(tabla, lote, punto_control)
+
+        # Los índices se quitan una vez para todos los lotes y vuelven aunque la carga falle
+        monkeypatch.setattr(almacen, 'insert_batch', insertar_y_fallar)
+        with pytest.raises(RuntimeError):
+            cargar_movimientos(df, 'gastos_2025', almacen, loader, filas_por_lote=20)
+        assert durante and all(not (i & todos) for i in durante)
+        assert indices() == todos
+
+        # Al reanudar, la tabla ya no está vacía y lo pendiente es poco: con índices
+        monkeypatch.setattr(almacen, 'insert_batch', insertar)
+        monkeypatch.setattr(sqlite_storage, 'FILAS_RECONSTRUIR_INDICES', 10_000)
+        assert len(cargar_movimientos(df, 'gastos_2025', almacen, loader, filas_por_lote=20)) < len(df)
+        assert almacen.count_movements('gastos_2025') == len(df)
+        assert indices() == todos
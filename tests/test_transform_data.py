@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Pruebas de las transformaciones de TransformData.
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl.transform_data import TransformData
+
+COLUMNAS = ['Fecha Operación', 'Concepto', 'Fecha Valor', 'Importe', 'Saldo', 'Referencia 1', 'Referencia 2']
+
+
+def _exportacion_concatenada() -> pd.DataFrame:
+    """Dos exportaciones leídas con header=None y concatenadas, con su preámbulo."""
+    def exportacion(filas):
+        preambulo = [
+            ['Consulta de movimientos', '', '', '', '', '', ''],
+            ['19/06/2025 16:06:07', '', '', '', '', '', ''],
+            ['', '', '', '', '', '', ''],
+            ['Cuenta: ', 'ES00 0000 0000 0000 0000 0000', '', '', '', '', ''],
+            ['Divisa: ', 'EUR', '', '', '', '', ''],
+            ['Titular:', 'TITULAR PRUEBA', '', '', '', '', ''],
+            ['Selección:', 'Desde 01/04/2025 hasta 30/04/2025', '', '', '', '', ''],
+            [None] * 7,
+            ['F. Operativa', 'Concepto', 'F. Valor', 'Importe', 'Saldo', 'Referencia 1', 'Referencia 2'],
+        ]
+        return pd.DataFrame(preambulo + filas, columns=COLUMNAS)
+
+    abril = exportacion([
+        ['30/04/2025', 'PAGO BIZUM PRUEBA', '30/04/2025', '-20.00', '4,859.01', '', ''],
+        ['29/04/2025', 'TRANSFERENCIA DE PRUEBA', '29/04/2025', '1,200.00', '4,879.01', '', ''],
+    ])
+    mayo = exportacion([
+        ['02/05/2025', 'COMPRA TARJ. PRUEBA', '03/05/2025', 'texto_invalido', '4,800.00', '', ''],
+        ['01/05/2025', 'ADEUDO RECIBO PRUEBA', '01/05/2025', '-59.01', '4,800.00', '', ''],
+    ])
+    return pd.concat([abril, mayo], ignore_index=True)
+
+
+def test_limpiar_filas_basura_en_todo_el_dataframe():
+    """Cabeceras, preámbulo y filas vacías se detectan en cualquier posición."""
+    transformer = TransformData()
+    df = _exportacion_concatenada()
+
+    df_limpio, conteos = transformer.limpiar_filas_basura(df)
+
+    assert conteos == {'vacia': 4, 'preambulo': 12, 'cabecera': 2, 'importe_invalido': 1}
+    assert list(df_limpio['Concepto']) == ['PAGO BIZUM PRUEBA', 'TRANSFERENCIA DE PRUEBA', 'ADEUDO RECIBO PRUEBA']
+    # El DataFrame original no se modifica
+    assert len(df) == 22
+
+
+def test_limpiar_dataframe_para_carga_sin_basura():
+    """Un DataFrame ya limpio se devuelve con todas sus filas."""
+    transformer = TransformData()
+    df = pd.DataFrame({'Concepto': ['Netflix', 'Spotify'], 'Importe': [15.99, 9.99]})
+
+    assert len(transformer.limpiar_dataframe_para_carga(df)) == 2
+
+
+def test_eliminar_duplicados_por_cuenta():
+    """El mismo movimiento en dos cuentas distintas no es un duplicado."""
+    transformer = TransformData()
+    df = pd.DataFrame({
+        'Concepto': ['RECIBO LUZ', 'RECIBO LUZ', 'RECIBO LUZ'],
+        'Importe': [-40.0, -40.0, -40.0],
+        'Cuenta_Id': [1, 2, 1],
+    })
+
+    assert len(transformer.eliminar_duplicados(df)) == 2
+    assert list(transformer.filtrar_por_cuenta(df, 2).index) == [1]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Pruebas del demonio que vigila el directorio de exportaciones.
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+# Agregar el directorio src al path para importar nuestros módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from etl.watch_folder import VigilanteInotify, VigilanteSondeo, WatchFolder, crear_vigilante
+
+
+def _daemon(directorio, cache, vigilante, cargadas, espera=0.2):
+    return WatchFolder(directorio,
+                       procesar=lambda ruta: ruta.read_text(encoding='utf-8'),
+                       cargar=lambda ruta, contenido: cargadas.append((ruta.name, contenido)) or True,
+                       directorio_cache=cache,
+                       max_workers=2,
+                       espera_estabilidad=espera,
+                       vigilante=vigilante)
+
+
+def _vueltas(daemon, segundos):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        daemon.ciclo(timeout=0.05)
+
+
+@pytest.mark.parametrize('vigilante', ['sondeo', 'inotify'])
+def test_carga_solo_exportaciones_nuevas_o_cambiadas(tmp_path, vigilante):
+    if vigilante == 'inotify' and not sys.platform.startswith('linux'):
+        pytest.skip("inotify solo existe en Linux")
+    datos, cache = tmp_path / 'data', tmp_path / 'cache'
+    datos.mkdir()
+    (datos / 'enero.csv').write_text('enero', encoding='utf-8')
+    (datos / 'notas.md').write_text('no es una exportación', encoding='utf-8')
+
+    cargadas = []
+    crear = (lambda: VigilanteSondeo(datos, intervalo=0.05)) if vigilante == 'sondeo' else (lambda: VigilanteInotify(datos))
+    daemon = _daemon(datos, cache, crear(), cargadas)
+    _vueltas(daemon, 0.5)
+    assert cargadas == [('enero.csv', 'enero')]
+
+    (datos / 'febrero.csv').write_text('febrero', encoding='utf-8')
+    (datos / 'enero.csv').write_text('enero corregido', encoding='utf-8')
+    _vueltas(daemon, 0.6)
+    daemon.cerrar()
+    assert sorted(cargadas[1:]) == [('enero.csv', 'enero corregido'), ('febrero.csv', 'febrero')]
+
+    # Al arrancar de nuevo, lo ya cargado (mismo SHA-1) no se vuelve a procesar
+    cargadas.clear()
+    daemon = _daemon(datos, cache, crear(), cargadas)
+    _vueltas(daemon, 0.4)
+    daemon.cerrar()
+    assert cargadas == []
+
+
+def test_no_procesa_ficheros_a_medio_escribir(tmp_path):
+    """Un fichero que sigue creciendo no se carga hasta que deja de cambiar."""
+    cargadas = []
+    daemon = _daemon(tmp_path, tmp_path / 'cache', crear_vigilante(tmp_path, sondeo=True, intervalo=0.05),
+                     cargadas, espera=0.3)
+    ruta = tmp_path / 'marzo.csv'
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for parte in range(6):
+            f.write(f'parte {parte};')
+            f.flush()
+            _vueltas(daemon, 0.1)
+    assert cargadas == []
+
+    _vueltas(daemon, 0.6)
+    daemon.cerrar()
+    assert cargadas == [('marzo.csv', ''.join(f'parte {parte};' for parte in range(6)))]
+
+
+def test_fallo_al_procesar_no_se_registra(tmp_path):
+    (tmp_path / 'abril.csv').write_text('abril', encoding='utf-8')
+
+    def procesar(ruta):
+        raise ValueError("exportación corrupta")
+
+    daemon = WatchFolder(tmp_path, procesar, lambda ruta, df: True, directorio_cache=tmp_path / 'cache',
+                         espera_estabilidad=0.1, vigilante=VigilanteSondeo(tmp_path, intervalo=0.05))
+    _vueltas(daemon, 0.4)
+    daemon.cerrar()
+    assert daemon.procesados == {}